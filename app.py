@@ -4,13 +4,35 @@ Med-GPT Professional Medical AI Platform
 Production-ready medical decision support interface
 """
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import streamlit as st
-from sentence_transformers import SentenceTransformer
-from ingest_documents import initialize_vector_store, enhanced_rag_query
+from ingest_documents import (
+    enhanced_rag_query_stream,
+    retrieve_chunks,
+    answer_from_chunks,
+)
+from ollama_client import get_client_stats, get_recent_calls
+from model_warmup import AVAILABLE_MODELS, WarmupManager
+from deadline import Deadline
+from singleflight import get_coalescing_stats
+from generation_scheduler import PRIORITY_COMPARE, get_scheduler_stats
+from model_health import get_model_health
+from metric_worker import metric_worker
+from compare_cache import compare_cache, compare_key
+from corpus_catalog import catalog_from_collection, load_catalog
+from tracing import percentile
+from pipeline_metrics import CACHE_LOOKUPS, start_metrics_server
+from memory_guard import LEVEL_HARD, LEVEL_OK, memory_guard
+from rag_warmup import RagWarmup
+from service_client import (
+    remote_catalog,
+    remote_rag_query,
+    remote_rag_query_stream,
+    is_ready,
+    service_enabled,
+)
 from ui_metrics import (
-    compute_answer_relevance,
-    compute_faithfulness,
-    compute_context_coverage,
     get_quality_badge,
     get_coverage_badge,
 )
@@ -91,6 +113,30 @@ st.markdown(
         border: 1px solid var(--success);
     }
     
+    .status-warm {
+        background: rgba(0, 230, 118, 0.15);
+        color: var(--success);
+        border: 1px solid var(--success);
+    }
+    
+    .status-loading {
+        background: rgba(255, 213, 79, 0.15);
+        color: var(--warning);
+        border: 1px solid var(--warning);
+    }
+    
+    .status-cold {
+        background: rgba(144, 202, 249, 0.1);
+        color: var(--text-secondary);
+        border: 1px solid var(--text-secondary);
+    }
+    
+    .status-error {
+        background: rgba(255, 82, 82, 0.15);
+        color: var(--error);
+        border: 1px solid var(--error);
+    }
+    
     .model-badge {
         display: inline-block;
         padding: 0.35rem 0.9rem;
@@ -297,6 +343,8 @@ if "initialized" not in st.session_state:
     st.session_state.processing = False
     st.session_state.selected_model = "phi"
     st.session_state.compare_mode = False
+    st.session_state.compare_refresh = False
+    st.session_state.stage_timings = {}
 
 
 # ==============================================================================
@@ -304,42 +352,425 @@ if "initialized" not in st.session_state:
 # ==============================================================================
 @st.cache_resource
 def load_rag():
-    """Load RAG system components."""
-    model = SentenceTransformer("all-MiniLM-L6-v2")
-    _, collection = initialize_vector_store()
-    return model, collection
+    """
+    Start loading RAG system components in the background (once per
+    process): embedding model, collection and one dummy query.
+    """
+    return RagWarmup().start()
+
+
+@st.cache_resource
+def start_metrics_endpoint():
+    """Serve Prometheus metrics for this process (once per process)."""
+    return start_metrics_server()
+
+
+@st.cache_resource
+def get_warmup_manager():
+    """Start background preloading of all Ollama models (once per process)."""
+    manager = WarmupManager()
+    manager.preload(AVAILABLE_MODELS)
+    return manager
+
+
+def get_corpus_catalog(collection):
+    """
+    Corpus catalog written by ingestion (or reported by the RAG service
+    in thin-client mode); falls back to a metadata-only scan of the
+    collection if the catalog file is missing.
+    """
+    if service_enabled():
+        try:
+            return remote_catalog()
+        except Exception:
+            return {"version": "unknown", "total_chunks": 0, "documents": {}}
+
+    catalog = load_catalog()
+    if catalog is not None:
+        return catalog
+    try:
+        return scan_collection_catalog(collection, collection.count())
+    except Exception:
+        return {"version": "unknown", "total_chunks": 0, "documents": {}}
+
+
+@st.cache_data(show_spinner=False)
+def scan_collection_catalog(_collection, chunk_count):
+    """Metadata-only collection scan, redone only when the chunk count changes."""
+    return catalog_from_collection(_collection)
+
+
+memory_guard.register_evictor("catalog_scan", scan_collection_catalog.clear)
+
+
+def get_corpus_version(collection):
+    """Identifier that changes whenever the indexed corpus changes."""
+    return get_corpus_catalog(collection).get("version", "unknown")
 
 
 def get_indexed_documents(collection):
     """Get list of unique indexed documents."""
+    return sorted(get_corpus_catalog(collection)["documents"])
+
+
+# ==============================================================================
+# RENDERING HELPERS
+# ==============================================================================
+def render_user_message(content):
+    """Render a user chat bubble."""
+    st.markdown(
+        f"""
+    <div style="text-align: right; margin: 1rem 0;">
+        <div style="display: inline-block; background: rgba(33, 150, 243, 0.15); 
+                    border-radius: 16px; padding: 0.75rem 1.25rem; max-width: 70%;
+                    border: 1px solid rgba(33, 150, 243, 0.3);">
+            <p style="margin: 0; color: #e3f2fd; font-size: 1rem;">{content}</p>
+        </div>
+    </div>
+    """,
+        unsafe_allow_html=True,
+    )
+
+
+def answer_card_html(content):
+    """HTML for the main answer card."""
+    return f"""
+    <div class="answer-card">
+        <div class="question-header">📋 Medical Response</div>
+        <div class="answer-text">{content}</div>
+    </div>
+    """
+
+
+def render_metric_cards(metrics):
+    """Relevance, faithfulness and coverage cards for one answer."""
+    relevance = metrics["relevance"]
+    faithfulness = metrics["faithfulness"]
+    coverage = metrics["coverage"]
+
+    # Display metrics in horizontal cards
+    col1, col2, col3 = st.columns(3)
+
+    with col1:
+        rel_emoji, rel_label, _ = get_quality_badge(relevance)
+        st.markdown(
+            f"""
+        <div class="metric-card">
+            <div class="metric-label">🎯 Relevance</div>
+            <div class="metric-value">{relevance:.2f}</div>
+            <div class="metric-badge badge-{rel_label.lower()}">{rel_emoji} {rel_label}</div>
+        </div>
+        """,
+            unsafe_allow_html=True,
+        )
+
+    with col2:
+        faith_emoji, faith_label, _ = get_quality_badge(faithfulness)
+        st.markdown(
+            f"""
+        <div class="metric-card">
+            <div class="metric-label">✓ Faithfulness</div>
+            <div class="metric-value">{faithfulness:.2f}</div>
+            <div class="metric-badge badge-{faith_label.lower()}">{faith_emoji} {faith_label}</div>
+        </div>
+        """,
+            unsafe_allow_html=True,
+        )
+
+    with col3:
+        cov_emoji, cov_label, _ = get_coverage_badge(coverage)
+        st.markdown(
+            f"""
+        <div class="metric-card">
+            <div class="metric-label">📊 Coverage</div>
+            <div class="metric-value">{coverage:.2f}</div>
+            <div class="metric-badge badge-{cov_label.lower()}">{cov_emoji} {cov_label}</div>
+        </div>
+        """,
+            unsafe_allow_html=True,
+        )
+
+
+# Stage order for the sidebar latency panel; other spans are listed after
+STAGE_ORDER = ["encode", "retrieve", "ollama_queue", "generate", "metrics", "total"]
+
+# Recent samples kept per stage for the session percentiles
+STAGE_SAMPLES = 200
+
+
+def record_stage_timings(timings, **extra):
+    """Add one query's per-stage milliseconds to the session latency panel."""
+    samples = st.session_state.setdefault("stage_timings", {})
+    for stage, ms in {**(timings or {}), **extra}.items():
+        if ms is None:
+            continue
+        values = samples.setdefault(stage, [])
+        values.append(ms)
+        del values[:-STAGE_SAMPLES]
+
+
+def render_stage_latency():
+    """Session p50/p95 per traced stage."""
+    samples = st.session_state.get("stage_timings") or {}
+    if not samples:
+        return
+
+    stages = [s for s in STAGE_ORDER if s in samples] + sorted(
+        s for s in samples if s not in STAGE_ORDER
+    )
+    rows = ["| Stage | p50 | p95 | n |", "|---|---|---|---|"]
+    for stage in stages:
+        values = samples[stage]
+        rows.append(
+            f"| {stage} | {percentile(values, 50):.0f} ms | "
+            f"{percentile(values, 95):.0f} ms | {len(values)} |"
+        )
+
+    with st.expander("⏱️ Stage latency", expanded=False):
+        st.markdown("\n".join(rows))
+        st.caption("_Session percentiles; full traces in the trace log_")
+
+
+@st.fragment(run_every=0.5)
+def render_pending_metrics(meta, answer, key):
+    """
+    Placeholder that polls the background worker for an answer's metrics.
+    Once they arrive they are stored in meta and the app reruns, so the
+    strip is rendered statically and this fragment stops polling.
+    """
+    metrics = metric_worker.result(key)
+    if metrics is None:
+        if not metric_worker.pending(key):
+            # The result was dropped (memory pressure or LRU eviction)
+            # before it was shown: score the answer again
+            metric_worker.submit(
+                meta["user_query"], answer, meta["sources"], st.session_state.model
+            )
+        st.caption("⏳ _Computing quality metrics..._")
+        return
+    record_stage_timings(metrics.get("timings"), metrics=metrics.get("elapsed_ms"))
+    meta["metrics"] = metrics
+    st.rerun()
+
+
+def render_comparison_card(result, is_best):
+    """Expander with one model's compare-mode answer and scores."""
+    with st.expander(
+        f"{'🏆 ' if is_best else ''}**{result['model'].upper()}** - Combined Score: {result['combined_score']:.2f}",
+        expanded=is_best,
+    ):
+        # Answer
+        st.markdown(
+            f"""
+        <div class="{'comparison-card best-model-glow' if is_best else 'comparison-card'}">
+            <div class="answer-text">{result['answer']}</div>
+        </div>
+        """,
+            unsafe_allow_html=True,
+        )
+
+        # Metrics in 4 columns
+        col1, col2, col3, col4 = st.columns(4)
+
+        with col1:
+            rel_emoji, rel_label, _ = get_quality_badge(result["relevance"])
+            st.metric(
+                "Relevance",
+                f"{result['relevance']:.2f}",
+                f"{rel_emoji} {rel_label}",
+            )
+
+        with col2:
+            faith_emoji, faith_label, _ = get_quality_badge(result["faithfulness"])
+            st.metric(
+                "Faithfulness",
+                f"{result['faithfulness']:.2f}",
+                f"{faith_emoji} {faith_label}",
+            )
+
+        with col3:
+            cov_emoji, cov_label, _ = get_coverage_badge(result["coverage"])
+            st.metric(
+                "Coverage",
+                f"{result['coverage']:.2f}",
+                f"{cov_emoji} {cov_label}",
+            )
+
+        with col4:
+            st.metric("Confidence", f"{result['confidence']}%")
+
+        gen = result.get("generation_stats") or {}
+        speed = (
+            f" · {gen['tokens_per_sec']:.1f} tok/s, "
+            f"prompt eval {gen['prompt_eval_ms'] / 1000:.2f}s"
+            if gen
+            else ""
+        )
+        st.caption(f"📚 Retrieved {len(result['sources'])} chunks{speed}")
+        if result.get("answered_by", result["model"]) != result["model"]:
+            st.caption(
+                f"↪️ {result['model']} unavailable, answered by "
+                f"{result['answered_by']}"
+            )
+
+
+def is_cacheable_comparison(result):
+    """Only complete answers are cached; errors and cut-off answers are retried."""
+    return (
+        "answered_by" in result
+        and not result.get("error")
+        and not result.get("partial")
+        and result["answered_by"] == result["model"]
+    )
+
+
+def best_model_banner(comparison_results, best_model, models):
+    """Markdown line naming the current best model in compare mode."""
+    return (
+        f"🏆 **Best so far:** {best_model.upper()} "
+        f"({comparison_results[best_model]['combined_score']:.2f}) · "
+        f"{len(comparison_results)}/{len(models)} models done"
+    )
+
+
+def run_comparison_model(
+    question, retrieved_chunks, model_name, embedding_model, retrieval_error=None
+):
+    """
+    Generate and score one model's answer for compare mode.
+    Runs on a worker thread, so it must not call Streamlit.
+    """
     try:
-        results = collection.get()
-        if results and results["metadatas"]:
-            doc_names = set()
-            for metadata in results["metadatas"]:
-                if "document_name" in metadata:
-                    doc_names.add(metadata["document_name"])
-            return sorted(list(doc_names))
-        return []
-    except Exception:
-        return []
+        if retrieval_error is not None:
+            raise retrieval_error
+
+        if service_enabled():
+            result = remote_rag_query(
+                question,
+                ollama_model=model_name,
+                top_k=7,
+                similarity_threshold=0.2,
+                priority=PRIORITY_COMPARE,
+            )
+        else:
+            result = answer_from_chunks(
+                question,
+                retrieved_chunks,
+                ollama_model=model_name,
+                priority=PRIORITY_COMPARE,
+            )
+
+        answer = result.get("answer", "")
+        sources = result.get("retrieved_chunks", [])
+        metrics = result.get("metrics") or metric_worker.compute(
+            question, answer, sources, embedding_model
+        )
+
+        return {
+            "model": model_name,
+            "answered_by": result.get("answered_by", model_name),
+            "partial": result.get("partial", False),
+            "error": result.get("error"),
+            "generation_stats": result.get("generation_stats") or {},
+            "answer": answer,
+            "confidence": result.get("confidence", 0),
+            "relevance": metrics["relevance"],
+            "faithfulness": metrics["faithfulness"],
+            "coverage": metrics["coverage"],
+            "combined_score": (
+                metrics["relevance"] + metrics["faithfulness"] + metrics["coverage"]
+            )
+            / 3,
+            "sources": sources,
+        }
+
+    except Exception as e:
+        return {
+            "model": model_name,
+            "answer": f"Error: {str(e)}",
+            "error": str(e),
+            "confidence": 0,
+            "relevance": 0,
+            "faithfulness": 0,
+            "coverage": 0,
+            "combined_score": 0,
+            "sources": [],
+        }
 
 
 # ==============================================================================
 # INITIALIZE SYSTEM
 # ==============================================================================
+# The page renders right away; the embedding model and collection load
+# on a background thread and the chat input unlocks once they are warm
+rag_warmup = None if service_enabled() else load_rag()
+start_metrics_endpoint()
+
 if not st.session_state.initialized:
-    with st.spinner("🔄 Initializing Med-GPT system..."):
-        model, collection = load_rag()
-        st.session_state.model = model
-        st.session_state.collection = collection
+    if service_enabled():
+        # Thin client: the RAG service owns the model and collection
+        st.session_state.initialized = is_ready()
+    elif rag_warmup.ready():
+        st.session_state.model = rag_warmup.model
+        st.session_state.collection = rag_warmup.collection
         st.session_state.initialized = True
 
+
+@st.fragment(run_every=0.5)
+def render_readiness():
+    """Loading notice that triggers a full rerun once warm-up finishes."""
+    if rag_warmup is None:
+        if is_ready():
+            st.rerun()
+        else:
+            st.info("🔄 Waiting for the Med-GPT service to finish loading...")
+        return
+
+    status = rag_warmup.status()
+    if status["state"] == "ready":
+        st.rerun()
+    elif status["state"] == "error":
+        st.error(f"❌ Failed to initialize Med-GPT: {status['error']}")
+    else:
+        st.info(
+            f"🔄 Initializing Med-GPT system... " f"({status['elapsed_ms'] / 1000:.1f}s)"
+        )
+
+
 # ==============================================================================
 # PROFESSIONAL HEADER BAR
 # ==============================================================================
-st.markdown(
-    f"""
+MODEL_STATE_BADGES = {
+    "warm": ("status-warm", "● WARM"),
+    "loading": ("status-loading", "◌ LOADING MODEL"),
+    "cold": ("status-cold", "○ COLD"),
+    "error": ("status-error", "✗ MODEL UNAVAILABLE"),
+}
+
+warmup_manager = get_warmup_manager()
+any_loading = any(
+    status["state"] == "loading" for status in warmup_manager.statuses().values()
+)
+
+
+# Re-render every few seconds while a model is loading so the badge turns warm
+@st.fragment(run_every=2 if any_loading else None)
+def render_header():
+    """Header bar with the selected model and its warm-up state."""
+    warmup_manager.refresh(min_interval=10)
+
+    active_model = st.session_state.get(
+        "model_selector", st.session_state.selected_model
+    )
+    model_status = warmup_manager.status(active_model)
+    badge_class, badge_text = MODEL_STATE_BADGES.get(
+        model_status["state"], MODEL_STATE_BADGES["cold"]
+    )
+    if model_status.get("load_ms"):
+        badge_text += f" · loaded in {model_status['load_ms'] / 1000:.1f}s"
+
+    st.markdown(
+        f"""
 <div class="header-container">
     <div style="display: flex; justify-content: space-between; align-items: center;">
         <div>
@@ -348,13 +779,17 @@ st.markdown(
         </div>
         <div>
             <span class="status-badge status-online">● ONLINE</span>
-            <span class="model-badge">🧠 {st.session_state.selected_model.upper()}</span>
+            <span class="status-badge {badge_class}">{badge_text}</span>
+            <span class="model-badge">🧠 {active_model.upper()}</span>
         </div>
     </div>
 </div>
 """,
-    unsafe_allow_html=True,
-)
+        unsafe_allow_html=True,
+    )
+
+
+render_header()
 
 # ==============================================================================
 # SIDEBAR - MODEL SELECTION & CONTROLS
@@ -362,23 +797,102 @@ st.markdown(
 with st.sidebar:
     st.markdown("### ⚙️ Configuration")
 
-    # Model selector
-    available_models = ["phi", "tinyllama", "gemma:2b"]
+    # Model selector (warms the newly selected model in the background)
+    available_models = AVAILABLE_MODELS
     st.session_state.selected_model = st.selectbox(
         "🧠 Select Model",
         available_models,
         index=available_models.index(st.session_state.selected_model),
         help="Choose the Ollama model for answer generation",
+        key="model_selector",
+        on_change=lambda: warmup_manager.warm(st.session_state.model_selector),
     )
 
     st.markdown("---")
 
     # System info
     st.markdown("### 📊 System Information")
-    st.info(f"**Embedding Model:** all-MiniLM-L6-v2")
+    catalog = get_corpus_catalog(st.session_state.collection)
+    st.info(
+        f"**Embedding Model:** {catalog.get('embedding_model', 'all-MiniLM-L6-v2')}"
+    )
     st.info(f"**Knowledge Base:** WHO Medical Guidelines")
     st.info(f"**Retrieval:** Top-7 semantic chunks")
 
+    corpus_summary = (
+        f"📚 **Corpus:** {len(catalog['documents'])} documents · "
+        f"{catalog['total_chunks']} chunks"
+    )
+    if catalog.get("index_size_bytes"):
+        corpus_summary += f" · {catalog['index_size_bytes'] / 1e6:.1f} MB index"
+    st.caption(corpus_summary)
+
+    client_stats = get_client_stats()
+    if client_stats["requests"]:
+        st.caption(
+            f"🔌 **Ollama connections:** {client_stats['reused_connections']} reused / "
+            f"{client_stats['new_connections']} new · "
+            f"avg connect {client_stats['avg_connect_ms']:.1f} ms · "
+            f"saved ~{client_stats['connect_ms_saved']:.0f} ms"
+        )
+        with st.expander("🔌 Recent Ollama calls", expanded=False):
+            rows = [
+                "| Connection | Connect | Retries | Elapsed |",
+                "|---|---|---|---|",
+            ]
+            for call in reversed(get_recent_calls(10)):
+                rows.append(
+                    f"| {'reused' if call['reused_connection'] else 'new'} | "
+                    f"{call['connect_ms']:.1f} ms | {call['retries']} | "
+                    f"{call['elapsed_ms']:.0f} ms |"
+                )
+            st.markdown("\n".join(rows))
+
+    queue_stats = get_scheduler_stats()
+    queue_classes = queue_stats["classes"]
+    if any(c["admitted"] or c["rejected"] for c in queue_classes.values()):
+        st.caption(
+            f"🚦 **Ollama queue:** {queue_stats['active']}/{queue_stats['max_concurrency']} busy · "
+            + " · ".join(
+                f"{name} {c['queue_depth']} waiting, p95 {c['p95_wait_ms'] / 1000:.1f}s"
+                + (f", {c['rejected']} rejected" if c["rejected"] else "")
+                for name, c in queue_classes.items()
+            )
+        )
+
+    unhealthy = {
+        name: health
+        for name, health in get_model_health().items()
+        if health["state"] != "closed"
+    }
+    for name, health in unhealthy.items():
+        st.warning(
+            f"⚡ **{name}** circuit {health['state'].replace('_', '-')}: "
+            f"{health['error_rate']:.0%} errors, {health['slow_rate']:.0%} slow"
+        )
+
+    flight_stats = get_coalescing_stats()
+    if flight_stats["coalesced"]:
+        st.caption(
+            f"🔗 **Coalesced generations:** {flight_stats['coalesced']} "
+            f"shared {flight_stats['leaders']} upstream calls"
+        )
+
+    memory = memory_guard.stats()
+    if memory["rss_mb"] is not None:
+        memory_caption = f"🧮 **Memory:** {memory['rss_mb']:.0f} MB RSS"
+        if memory["budget_mb"]:
+            memory_caption += f" of {memory['budget_mb']:.0f} MB budget"
+        st.caption(memory_caption)
+    if memory["level"] != LEVEL_OK:
+        st.warning(
+            "🧮 Memory is "
+            + ("at its limit" if memory["level"] == LEVEL_HARD else "running low")
+            + f": caches were evicted {memory['evictions']} times"
+        )
+
+    render_stage_latency()
+
     st.markdown("---")
 
     # Session controls
@@ -419,33 +933,14 @@ with st.sidebar:
 for msg in st.session_state.messages:
     if msg["role"] == "user":
         # User message
-        st.markdown(
-            f"""
-        <div style="text-align: right; margin: 1rem 0;">
-            <div style="display: inline-block; background: rgba(33, 150, 243, 0.15); 
-                        border-radius: 16px; padding: 0.75rem 1.25rem; max-width: 70%;
-                        border: 1px solid rgba(33, 150, 243, 0.3);">
-                <p style="margin: 0; color: #e3f2fd; font-size: 1rem;">{msg["content"]}</p>
-            </div>
-        </div>
-        """,
-            unsafe_allow_html=True,
-        )
+        render_user_message(msg["content"])
 
     elif msg["role"] == "assistant":
         # Assistant message with professional card layout
         meta = msg.get("meta", {})
 
         # Main answer card
-        st.markdown(
-            f"""
-        <div class="answer-card">
-            <div class="question-header">📋 Medical Response</div>
-            <div class="answer-text">{msg["content"]}</div>
-        </div>
-        """,
-            unsafe_allow_html=True,
-        )
+        st.markdown(answer_card_html(msg["content"]), unsafe_allow_html=True)
 
         # Confidence bar
         if meta.get("confidence") is not None:
@@ -455,64 +950,50 @@ for msg in st.session_state.messages:
                 "_Confidence based on semantic similarity with retrieved guidelines_"
             )
 
-        # Metrics strip (horizontal cards)
-        if meta.get("sources") and meta.get("user_query"):
-            st.markdown("<br>", unsafe_allow_html=True)
-
-            # Compute metrics
-            relevance = compute_answer_relevance(
-                meta.get("user_query", ""), msg["content"], st.session_state.model
+        # Latency
+        if meta.get("ttft_ms") is not None:
+            latency = (
+                f"⚡ First token in {meta['ttft_ms'] / 1000:.2f}s · "
+                f"full answer in {meta.get('total_ms', 0) / 1000:.2f}s"
             )
+            gen = meta.get("generation_stats") or {}
+            if gen:
+                latency += (
+                    f" · {gen['tokens_per_sec']:.1f} tok/s · "
+                    f"prompt {gen['prompt_tokens']} tok in "
+                    f"{gen['prompt_eval_ms'] / 1000:.2f}s"
+                )
+                if gen["load_ms"] >= 100:
+                    latency += f" · model load {gen['load_ms'] / 1000:.2f}s"
+            st.caption(latency)
 
-            faithfulness = compute_faithfulness(
-                msg["content"], meta["sources"], st.session_state.model
+        if meta.get("fallback_from"):
+            st.caption(
+                f"↪️ _Answered by **{meta['answered_by']}** because "
+                f"**{meta['fallback_from']}** is currently overloaded_"
             )
 
-            coverage = compute_context_coverage(
-                msg["content"], meta["sources"], st.session_state.model
+        if meta.get("partial"):
+            st.caption(
+                "⏱️ _Partial answer: the response time budget ran out before the model finished_"
             )
 
-            # Display metrics in horizontal cards
-            col1, col2, col3 = st.columns(3)
-
-            with col1:
-                rel_emoji, rel_label, _ = get_quality_badge(relevance)
-                st.markdown(
-                    f"""
-                <div class="metric-card">
-                    <div class="metric-label">🎯 Relevance</div>
-                    <div class="metric-value">{relevance:.2f}</div>
-                    <div class="metric-badge badge-{rel_label.lower()}">{rel_emoji} {rel_label}</div>
-                </div>
-                """,
-                    unsafe_allow_html=True,
-                )
-
-            with col2:
-                faith_emoji, faith_label, _ = get_quality_badge(faithfulness)
-                st.markdown(
-                    f"""
-                <div class="metric-card">
-                    <div class="metric-label">✓ Faithfulness</div>
-                    <div class="metric-value">{faithfulness:.2f}</div>
-                    <div class="metric-badge badge-{faith_label.lower()}">{faith_emoji} {faith_label}</div>
-                </div>
-                """,
-                    unsafe_allow_html=True,
-                )
+        # Metrics strip (horizontal cards)
+        if meta.get("sources") and meta.get("user_query"):
+            st.markdown("<br>", unsafe_allow_html=True)
 
-            with col3:
-                cov_emoji, cov_label, _ = get_coverage_badge(coverage)
-                st.markdown(
-                    f"""
-                <div class="metric-card">
-                    <div class="metric-label">📊 Coverage</div>
-                    <div class="metric-value">{coverage:.2f}</div>
-                    <div class="metric-badge badge-{cov_label.lower()}">{cov_emoji} {cov_label}</div>
-                </div>
-                """,
-                    unsafe_allow_html=True,
+            # Metrics are scored by the background worker; until they
+            # arrive the strip is a fragment that polls for them
+            if meta.get("metrics"):
+                render_metric_cards(meta["metrics"])
+            else:
+                key = metric_worker.submit(
+                    meta["user_query"],
+                    msg["content"],
+                    meta["sources"],
+                    st.session_state.model,
                 )
+                render_pending_metrics(meta, msg["content"], key)
 
         # Evidence panel (collapsible)
         if meta.get("sources"):
@@ -583,208 +1064,276 @@ if st.session_state.compare_mode and len(st.session_state.messages) > 0:
         st.markdown("### 🔄 Multi-Model Comparison")
         st.caption(f"**Question:** {last_user_msg}")
 
-        available_models = ["phi", "tinyllama", "gemma:2b"]
-        comparison_results = []
+        available_models = AVAILABLE_MODELS
+        comparison_results = {}
 
-        # Run all models sequentially
+        best_placeholder = st.empty()
         progress_bar = st.progress(0)
-        status_text = st.empty()
+        card_placeholders = {}
+        for model_name in available_models:
+            card_placeholders[model_name] = st.empty()
+            card_placeholders[model_name].caption(f"⚙️ Running {model_name}...")
+
+        # Reuse results from earlier reruns or other sessions unless the
+        # user asked for a fresh comparison
+        corpus_version = get_corpus_version(st.session_state.collection)
+        cache_keys = {
+            model_name: compare_key(
+                last_user_msg,
+                model_name,
+                corpus_version,
+                top_k=7,
+                similarity_threshold=0.2,
+            )
+            for model_name in available_models
+        }
+        refresh = st.session_state.get("compare_refresh", False)
+        st.session_state.compare_refresh = False
+
+        best_model = None
+        pending_models = []
+        for model_name in available_models:
+            cached = None if refresh else compare_cache.get(cache_keys[model_name])
+            if cached is None:
+                pending_models.append(model_name)
+            else:
+                comparison_results[model_name] = cached
+            CACHE_LOOKUPS.inc(
+                cache="compare", result="miss" if cached is None else "hit"
+            )
 
-        for i, model_name in enumerate(available_models):
-            status_text.text(f"⚙️ Running {model_name}...")
+        if comparison_results:
+            best_model = max(
+                comparison_results.values(), key=lambda x: x["combined_score"]
+            )["model"]
+            for model_name, result in comparison_results.items():
+                with card_placeholders[model_name].container():
+                    render_comparison_card(result, model_name == best_model)
+            best_placeholder.markdown(
+                best_model_banner(comparison_results, best_model, available_models)
+            )
+            progress_bar.progress(len(comparison_results) / len(available_models))
 
+        # Retrieve once; every model answers from the same chunks
+        # (in thin-client mode the service retrieves per request)
+        shared_chunks = []
+        retrieval_error = None
+        if pending_models and not service_enabled():
             try:
-                result = enhanced_rag_query(
+                shared_chunks = retrieve_chunks(
                     st.session_state.collection,
                     last_user_msg,
                     st.session_state.model,
                     top_k=7,
                     similarity_threshold=0.2,
-                    ollama_model=model_name,
-                )
-
-                answer = result.get("answer", "")
-                sources = result.get("retrieved_chunks", [])
-                confidence = result.get("confidence", 0)
-
-                # Compute metrics
-                relevance = compute_answer_relevance(
-                    last_user_msg, answer, st.session_state.model
-                )
-                faithfulness = compute_faithfulness(
-                    answer, sources, st.session_state.model
-                )
-                coverage = compute_context_coverage(
-                    answer, sources, st.session_state.model
-                )
-                combined_score = (relevance + faithfulness + coverage) / 3
-
-                comparison_results.append(
-                    {
-                        "model": model_name,
-                        "answer": answer,
-                        "confidence": confidence,
-                        "relevance": relevance,
-                        "faithfulness": faithfulness,
-                        "coverage": coverage,
-                        "combined_score": combined_score,
-                        "sources": sources,
-                    }
                 )
-
             except Exception as e:
-                comparison_results.append(
-                    {
-                        "model": model_name,
-                        "answer": f"Error: {str(e)}",
-                        "confidence": 0,
-                        "relevance": 0,
-                        "faithfulness": 0,
-                        "coverage": 0,
-                        "combined_score": 0,
-                        "sources": [],
-                    }
+                retrieval_error = e
+
+        # Generations run concurrently; the scheduler keeps them within
+        # the Ollama concurrency limit at compare priority
+        with ThreadPoolExecutor(
+            max_workers=max(1, len(pending_models)),
+            thread_name_prefix="medgpt-compare",
+        ) as compare_pool:
+            futures = [
+                compare_pool.submit(
+                    run_comparison_model,
+                    last_user_msg,
+                    shared_chunks,
+                    model_name,
+                    st.session_state.model,
+                    retrieval_error,
                 )
-
-            progress_bar.progress((i + 1) / len(available_models))
-
-        status_text.empty()
-        progress_bar.empty()
-
-        # Find best model
-        best_model = max(comparison_results, key=lambda x: x["combined_score"])
-
-        # Display results
-        for result in comparison_results:
-            is_best = result["model"] == best_model["model"]
-
-            with st.expander(
-                f"{'🏆 ' if is_best else ''}**{result['model'].upper()}** - Combined Score: {result['combined_score']:.2f}",
-                expanded=is_best,
-            ):
-                # Answer
-                st.markdown(
-                    f"""
-                <div class="{'comparison-card best-model-glow' if is_best else 'comparison-card'}">
-                    <div class="answer-text">{result['answer']}</div>
-                </div>
-                """,
-                    unsafe_allow_html=True,
+                for model_name in pending_models
+            ]
+
+            for future in as_completed(futures):
+                result = future.result()
+                comparison_results[result["model"]] = result
+                if is_cacheable_comparison(result):
+                    compare_cache.put(cache_keys[result["model"]], result)
+
+                previous_best = best_model
+                best_model = max(
+                    comparison_results.values(), key=lambda x: x["combined_score"]
+                )["model"]
+
+                best_placeholder.markdown(
+                    best_model_banner(comparison_results, best_model, available_models)
                 )
 
-                # Metrics in 4 columns
-                col1, col2, col3, col4 = st.columns(4)
+                # Redraw the finished card and, if the lead changed, the old leader
+                for model_name in {result["model"], previous_best, best_model}:
+                    if model_name in comparison_results:
+                        with card_placeholders[model_name].container():
+                            render_comparison_card(
+                                comparison_results[model_name],
+                                model_name == best_model,
+                            )
 
-                with col1:
-                    rel_emoji, rel_label, _ = get_quality_badge(result["relevance"])
-                    st.metric(
-                        "Relevance",
-                        f"{result['relevance']:.2f}",
-                        f"{rel_emoji} {rel_label}",
-                    )
+                progress_bar.progress(len(comparison_results) / len(available_models))
 
-                with col2:
-                    faith_emoji, faith_label, _ = get_quality_badge(
-                        result["faithfulness"]
-                    )
-                    st.metric(
-                        "Faithfulness",
-                        f"{result['faithfulness']:.2f}",
-                        f"{faith_emoji} {faith_label}",
-                    )
+        progress_bar.empty()
 
-                with col3:
-                    cov_emoji, cov_label, _ = get_coverage_badge(result["coverage"])
-                    st.metric(
-                        "Coverage",
-                        f"{result['coverage']:.2f}",
-                        f"{cov_emoji} {cov_label}",
-                    )
+        if pending_models:
+            st.caption(
+                f"🗂️ {len(available_models) - len(pending_models)} of "
+                f"{len(available_models)} results reused from cache"
+            )
+        else:
+            st.caption("🗂️ All results reused from cache")
 
-                with col4:
-                    st.metric("Confidence", f"{result['confidence']}%")
+        col_refresh, col_close = st.columns(2)
 
-                st.caption(f"📚 Retrieved {len(result['sources'])} chunks")
+        with col_refresh:
+            if st.button("🔁 Re-run Comparison", use_container_width=True):
+                st.session_state.compare_refresh = True
+                st.rerun()
 
         # Close button
-        if st.button("✖ Close Comparison", use_container_width=True):
-            st.session_state.compare_mode = False
-            st.rerun()
+        with col_close:
+            if st.button("✖ Close Comparison", use_container_width=True):
+                st.session_state.compare_mode = False
+                st.rerun()
 
 # ==============================================================================
 # CHAT INPUT (FIXED BOTTOM)
 # ==============================================================================
+if not st.session_state.initialized:
+    render_readiness()
+
 query = st.chat_input(
-    "Ask a medical question (e.g., How is severe malaria treated according to WHO?)"
+    "Ask a medical question (e.g., How is severe malaria treated according to WHO?)",
+    disabled=not st.session_state.initialized,
 )
 
 if query and not st.session_state.processing:
     st.session_state.processing = True
 
+    # Under memory pressure shared caches are evicted; this session's
+    # history is trimmed to the last exchange as well
+    if memory_guard.check("query") != LEVEL_OK:
+        st.session_state.messages = st.session_state.messages[-2:]
+
     # Store user message
     st.session_state.messages.append({"role": "user", "content": query})
 
-    # Generate answer
-    with st.spinner("🔄 Generating evidence-based answer..."):
-        try:
-            result = enhanced_rag_query(
+    render_user_message(query)
+
+    # Generate answer, rendering tokens into the answer card as they arrive
+    answer_placeholder = st.empty()
+    answer_placeholder.markdown(
+        answer_card_html("🔄 Retrieving WHO guideline evidence..."),
+        unsafe_allow_html=True,
+    )
+
+    try:
+        result = {}
+        streamed_answer = ""
+        deadline = Deadline()
+
+        if service_enabled():
+            query_events = remote_rag_query_stream(
+                query,
+                deadline=deadline,
+                ollama_model=st.session_state.selected_model,
+                top_k=7,
+                similarity_threshold=0.2,
+            )
+        else:
+            query_events = enhanced_rag_query_stream(
                 st.session_state.collection,
                 query,
                 st.session_state.model,
                 top_k=7,
                 similarity_threshold=0.2,
                 ollama_model=st.session_state.selected_model,
+                deadline=deadline,
             )
 
-            answer = result.get("answer", "")
-
-            # Check if answer is valid
-            is_empty = not answer or answer.strip() == ""
-            is_timeout = "took too long to respond" in answer.lower()
-            is_error = "error" in answer.lower() and len(answer) < 100
-
-            if is_empty or is_timeout or is_error:
-                # Failed answer
-                st.session_state.messages.append(
-                    {
-                        "role": "assistant",
-                        "content": "⚠️ Unable to generate a complete answer. Please try rephrasing your question or check if the Ollama service is running.",
-                        "meta": {
-                            "confidence": None,
-                            "sources": [],
-                            "user_query": query,
-                        },
-                    }
+        for event in query_events:
+            if event["type"] == "token":
+                streamed_answer += event["text"]
+                answer_placeholder.markdown(
+                    answer_card_html(streamed_answer + " ▌"),
+                    unsafe_allow_html=True,
                 )
             else:
-                # Valid answer
-                st.session_state.messages.append(
-                    {
-                        "role": "assistant",
-                        "content": answer,
-                        "meta": {
-                            "confidence": result.get("confidence", 0),
-                            "sources": result.get("retrieved_chunks", []),
-                            "user_query": query,
-                        },
-                    }
+                result = event["result"]
+
+        answer = result.get("answer", "")
+
+        # Check if answer is valid
+        is_empty = not answer or answer.strip() == ""
+
+        if is_empty or result.get("error"):
+            # Failed answer
+            st.session_state.messages.append(
+                {
+                    "role": "assistant",
+                    "content": "⚠️ Unable to generate a complete answer. Please try rephrasing your question or check if the Ollama service is running.",
+                    "meta": {
+                        "confidence": None,
+                        "sources": [],
+                        "user_query": query,
+                    },
+                }
+            )
+        else:
+            # Score the answer off the request path; the metric strip
+            # fills in when the worker finishes (the RAG service returns
+            # metrics with the result)
+            if not result.get("metrics"):
+                metric_worker.submit(
+                    query,
+                    answer,
+                    result.get("retrieved_chunks", []),
+                    st.session_state.model,
                 )
 
-            # Limit conversation memory
-            if len(st.session_state.messages) > 6:
-                st.session_state.messages = st.session_state.messages[-6:]
+            record_stage_timings(
+                result.get("timings"),
+                total=result.get("total_ms"),
+                metrics=(result.get("metrics") or {}).get("elapsed_ms"),
+            )
 
-        except Exception as e:
+            # Valid answer
             st.session_state.messages.append(
                 {
                     "role": "assistant",
-                    "content": f"⚠️ Error generating answer: {str(e)}",
-                    "meta": {},
+                    "content": answer,
+                    "meta": {
+                        "confidence": result.get("confidence", 0),
+                        "sources": result.get("retrieved_chunks", []),
+                        "user_query": query,
+                        "ttft_ms": result.get("ttft_ms"),
+                        "total_ms": result.get("total_ms"),
+                        "partial": result.get("partial", False),
+                        "answered_by": result.get("answered_by"),
+                        "fallback_from": result.get("fallback_from"),
+                        "generation_stats": result.get("generation_stats"),
+                        "metrics": result.get("metrics"),
+                        "deadline": result.get("deadline") or deadline.to_dict(),
+                    },
                 }
             )
 
-            if len(st.session_state.messages) > 6:
-                st.session_state.messages = st.session_state.messages[-6:]
+        # Limit conversation memory
+        if len(st.session_state.messages) > 6:
+            st.session_state.messages = st.session_state.messages[-6:]
+
+    except Exception as e:
+        st.session_state.messages.append(
+            {
+                "role": "assistant",
+                "content": f"⚠️ Error generating answer: {str(e)}",
+                "meta": {},
+            }
+        )
+
+        if len(st.session_state.messages) > 6:
+            st.session_state.messages = st.session_state.messages[-6:]
 
     st.session_state.processing = False
     st.rerun()
@@ -0,0 +1,439 @@
+"""
+Asyncio RAG Pipeline for Med-GPT
+================================
+Async variants of the RAG query functions in ingest_documents.py, so one
+process can overlap many users' LLM waits with other users' retrieval.
+
+Ollama is called through a pooled httpx.AsyncClient; the CPU-bound query
+encoding and the blocking ChromaDB query run on thread pools. Everything
+else is shared with the sync path: generations are admitted by the same
+generation scheduler (including the host-wide slots), the circuit
+breaker picks the answering model, the deadline sizes num_predict and
+cuts the stream short, and results, traces and Prometheus metrics are
+built by the same helpers. Identical concurrent requests are not
+coalesced here; that stays a feature of the threaded path.
+
+Usage:
+    result = await async_enhanced_rag_query(collection, query, model)
+
+    # From synchronous code
+    results = run_rag_queries(collection, model, jobs, concurrency=8)
+"""
+
+import asyncio
+import json
+import os
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+import ollama_client
+from ollama_client import OLLAMA_URL
+from generation_scheduler import PRIORITY_INTERACTIVE, SchedulerRejected, scheduler
+from model_health import health_tracker
+from ingest_documents import (
+    GENERATION_OPTIONS,
+    TIMEOUT_MESSAGE,
+    build_rag_prompt,
+    deadline_stage,
+    default_deadline,
+    encode_query,
+    finish_answer,
+    plan_stream,
+    query_collection,
+    record_stream_rate,
+)
+from pipeline_metrics import RETRIEVAL_SECONDS
+from tracing import span, trace
+
+
+# ===============================
+# CONFIGURATION
+# ===============================
+
+ENCODE_WORKERS = int(os.environ.get("MEDGPT_ENCODE_WORKERS", "2"))
+DB_WORKERS = int(os.environ.get("MEDGPT_DB_WORKERS", "4"))
+
+# Threads blocked in scheduler.acquire() on behalf of waiting tasks
+SLOT_WAITERS = int(os.environ.get("MEDGPT_SLOT_WAITERS", "64"))
+
+_encode_executor = ThreadPoolExecutor(
+    max_workers=ENCODE_WORKERS, thread_name_prefix="medgpt-encode"
+)
+_db_executor = ThreadPoolExecutor(
+    max_workers=DB_WORKERS, thread_name_prefix="medgpt-db"
+)
+_slot_executor = ThreadPoolExecutor(
+    max_workers=SLOT_WAITERS, thread_name_prefix="medgpt-slot"
+)
+
+
+# ===============================
+# ASYNC OLLAMA CLIENT
+# ===============================
+
+# httpx clients are bound to the event loop that created them
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """Get the pooled httpx.AsyncClient for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+
+    if client is None:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=ollama_client.POOL_SIZE,
+                max_keepalive_connections=ollama_client.POOL_SIZE,
+            ),
+            headers={"Connection": "keep-alive"},
+        )
+        _clients[loop] = client
+
+    return client
+
+
+async def close_async_client():
+    """Close the httpx client bound to the running event loop."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def _open_stream(url, payload, timeout):
+    """
+    Send a streaming POST. Like ollama_client.post(), only errors raised
+    before the request reached Ollama are retried.
+    """
+    client = get_async_client()
+    request = client.build_request(
+        "POST",
+        url,
+        json=payload,
+        timeout=httpx.Timeout(timeout[1], connect=timeout[0]),
+    )
+    retries = 0
+
+    while True:
+        try:
+            return await client.send(request, stream=True)
+        except (httpx.ConnectError, httpx.ConnectTimeout):
+            if retries >= ollama_client.MAX_RETRIES:
+                raise
+            await asyncio.sleep(ollama_client.backoff_delay(retries))
+            retries += 1
+
+
+async def acquire_slot(priority=PRIORITY_INTERACTIVE, timeout=None):
+    """
+    Wait for a generation slot without blocking the event loop.
+
+    scheduler.acquire() blocks, so it runs on a waiter thread. If the
+    awaiting task is cancelled the wait carries on, and a slot that is
+    granted afterwards is released straight away instead of leaking.
+
+    Returns:
+        float: Seconds spent waiting in the queue
+
+    Raises:
+        SchedulerRejected: If the class queue is full or the wait expired
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(_slot_executor, scheduler.acquire, priority, timeout)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+
+        def release_if_granted(done):
+            if not done.cancelled() and done.exception() is None:
+                scheduler.release(priority)
+
+        future.add_done_callback(release_if_granted)
+        raise
+
+
+# ===============================
+# ASYNC GENERATION
+# ===============================
+
+
+async def async_stream_ollama(
+    prompt,
+    model,
+    ollama_url=OLLAMA_URL,
+    timeout=None,
+    options=None,
+    deadline=None,
+    priority=PRIORITY_INTERACTIVE,
+    info=None,
+):
+    """
+    Async equivalent of ingest_documents.call_ollama_stream(), without
+    request coalescing. Errors land in info["error"], never in the tokens.
+    """
+    info = {} if info is None else info
+    info.update({"partial": False, "done": False, "tokens": 0, "error": None})
+    timeout = timeout or (ollama_client.CONNECT_TIMEOUT, ollama_client.READ_TIMEOUT)
+
+    try:
+        queue_timeout = deadline.remaining() if deadline is not None else None
+        info["queue_wait_ms"] = await acquire_slot(priority, queue_timeout) * 1000
+    except SchedulerRejected as e:
+        info["error"] = f"Error: Ollama is busy, {priority} request not admitted ({e})."
+        return
+
+    def fail(message):
+        # Keep a partial answer rather than discarding it
+        if info["tokens"]:
+            info["partial"] = True
+        else:
+            info["error"] = message
+
+    start = time.monotonic()
+    recorded = False
+
+    try:
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": True,
+            "options": {**GENERATION_OPTIONS, **(options or {})},
+            "keep_alive": ollama_client.KEEP_ALIVE,
+        }
+
+        response = await _open_stream(ollama_url, payload, timeout)
+        try:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                token = chunk.get("response", "")
+                if not recorded and (token or chunk.get("done")):
+                    # Model health is judged on time to first token
+                    health_tracker.record(
+                        model, ok=True, latency=time.monotonic() - start
+                    )
+                    recorded = True
+                if token:
+                    info["tokens"] += 1
+                    yield token
+                if chunk.get("done"):
+                    info["done"] = True
+                    info["stats"] = chunk
+                    break
+                if deadline is not None and deadline.expired():
+                    # Out of budget: keep what was generated so far
+                    fail(TIMEOUT_MESSAGE)
+                    break
+        finally:
+            await response.aclose()
+
+    except httpx.TimeoutException:
+        if not recorded:
+            health_tracker.record(model, ok=False, latency=time.monotonic() - start)
+        fail(TIMEOUT_MESSAGE)
+
+    except httpx.HTTPError as e:
+        if not recorded:
+            health_tracker.record(model, ok=False, latency=time.monotonic() - start)
+        fail(f"Error connecting to Ollama: {e}")
+
+    except Exception as e:
+        fail(f"Error calling Ollama: {e}")
+
+    finally:
+        scheduler.release(priority)
+
+
+async def async_generate_within_deadline(
+    prompt,
+    model,
+    deadline,
+    ollama_url=OLLAMA_URL,
+    info=None,
+    priority=PRIORITY_INTERACTIVE,
+    allow_fallback=True,
+):
+    """
+    Async equivalent of ingest_documents.generate_within_deadline():
+    same model choice, generation sizing and decode-rate feedback.
+
+    Yields:
+        str: Response tokens
+    """
+    info = {} if info is None else info
+    plan = plan_stream(model, deadline, info, allow_fallback)
+    if plan is None:
+        return
+    model, num_predict, read_timeout = plan
+
+    start = time.monotonic()
+    first_token_at = None
+
+    async for token in async_stream_ollama(
+        prompt,
+        model,
+        ollama_url,
+        timeout=(ollama_client.CONNECT_TIMEOUT, read_timeout),
+        options={"num_predict": num_predict},
+        deadline=deadline,
+        priority=priority,
+        info=info,
+    ):
+        if first_token_at is None:
+            first_token_at = time.monotonic()
+        yield token
+
+    record_stream_rate(model, info, start, first_token_at)
+
+
+# ===============================
+# ASYNC RAG QUERY
+# ===============================
+
+
+async def async_retrieve_chunks(
+    collection, query, model, top_k=7, similarity_threshold=0.05, deadline=None
+):
+    """
+    Async equivalent of ingest_documents.retrieve_chunks().
+    Encoding and the ChromaDB query run on separate thread pools.
+    """
+    loop = asyncio.get_running_loop()
+
+    with deadline_stage(deadline, "encode"), span("encode"):
+        query_embedding = await loop.run_in_executor(
+            _encode_executor, encode_query, model, query
+        )
+    with deadline_stage(deadline, "retrieve"), span("retrieve", top_k=top_k):
+        return await loop.run_in_executor(
+            _db_executor,
+            query_collection,
+            collection,
+            query_embedding,
+            top_k,
+            similarity_threshold,
+        )
+
+
+async def async_rag_query_stream(
+    collection,
+    query,
+    model,
+    top_k=7,
+    similarity_threshold=0.05,
+    ollama_model="phi",
+    deadline=None,
+    priority=PRIORITY_INTERACTIVE,
+    ollama_url=OLLAMA_URL,
+):
+    """
+    Async equivalent of ingest_documents.enhanced_rag_query_stream().
+    Yields the same token events followed by one result event.
+    """
+    deadline = default_deadline(deadline, priority)
+    start = time.perf_counter()
+
+    with trace("rag_query", model=ollama_model, priority=priority):
+        retrieved_chunks = await async_retrieve_chunks(
+            collection, query, model, top_k, similarity_threshold, deadline
+        )
+        RETRIEVAL_SECONDS.observe(time.perf_counter() - start)
+
+        with span("prompt"):
+            prompt = build_rag_prompt(query, retrieved_chunks)
+
+        tokens = []
+        ttft_ms = None
+        info = {}
+        generation_start = time.perf_counter()
+
+        with deadline_stage(deadline, "generate"), span(
+            "generate", model=ollama_model
+        ) as record:
+            async for token in async_generate_within_deadline(
+                prompt,
+                ollama_model,
+                deadline,
+                ollama_url=ollama_url,
+                info=info,
+                priority=priority,
+            ):
+                if ttft_ms is None:
+                    ttft_ms = (time.perf_counter() - start) * 1000
+                tokens.append(token)
+                yield {"type": "token", "text": token}
+            record["answered_by"] = info.get("model", ollama_model)
+            record["tokens"] = len(tokens)
+
+        result = finish_answer(
+            tokens,
+            info,
+            retrieved_chunks,
+            ollama_model,
+            deadline,
+            start,
+            ttft_ms,
+            time.perf_counter() - generation_start,
+        )
+        yield {"type": "result", "result": result}
+
+
+async def async_enhanced_rag_query(collection, query, model, **kwargs):
+    """
+    Async equivalent of ingest_documents.enhanced_rag_query().
+    Takes the same keyword arguments and returns the same result dictionary.
+    """
+    result = {}
+    async for event in async_rag_query_stream(collection, query, model, **kwargs):
+        if event["type"] == "result":
+            result = event["result"]
+    return result
+
+
+async def async_run_rag_queries(collection, model, jobs, concurrency=8, **kwargs):
+    """
+    Run many RAG queries concurrently on one event loop.
+
+    Args:
+        collection: ChromaDB collection
+        model: SentenceTransformer model for embeddings
+        jobs: Iterable of (query, ollama_model) pairs
+        concurrency: Maximum queries in flight at once (generations are
+                     still admitted by the scheduler)
+        **kwargs: Passed through to async_enhanced_rag_query()
+
+    Returns:
+        list: Result dictionaries (or the raised exception) in job order
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(query, ollama_model):
+        async with semaphore:
+            return await async_enhanced_rag_query(
+                collection, query, model, ollama_model=ollama_model, **kwargs
+            )
+
+    try:
+        return await asyncio.gather(
+            *(run_one(query, ollama_model) for query, ollama_model in jobs),
+            return_exceptions=True,
+        )
+    finally:
+        await close_async_client()
+
+
+# ===============================
+# SYNC WRAPPER
+# ===============================
+
+
+def run_rag_queries(collection, model, jobs, concurrency=8, **kwargs):
+    """Synchronous wrapper around async_run_rag_queries()."""
+    return asyncio.run(
+        async_run_rag_queries(collection, model, jobs, concurrency, **kwargs)
+    )
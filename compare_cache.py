@@ -0,0 +1,105 @@
+"""
+Compare-Mode Result Cache for Med-GPT
+=====================================
+Keeps "Compare All Models" results per (question, model, corpus version,
+retrieval settings) so Streamlit reruns and other sessions asking the
+same question reuse them instead of regenerating every answer.
+
+Entries are evicted least-recently-used once the cache is full, and
+expire after a time-to-live so answers do not outlive model updates
+indefinitely. Re-indexing the corpus changes the corpus version, which
+makes older entries unreachable.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from memory_guard import memory_guard
+
+
+# ===============================
+# CONFIGURATION
+# ===============================
+
+MAX_ENTRIES = int(os.environ.get("MEDGPT_COMPARE_CACHE_SIZE", "128"))
+TTL_SECONDS = float(os.environ.get("MEDGPT_COMPARE_CACHE_TTL", "86400"))
+
+
+def compare_key(question, model, corpus_version, **retrieval_params):
+    """Cache key for one model's answer to a question on a given corpus."""
+    raw = json.dumps(
+        [question.strip(), model, corpus_version, retrieval_params], sort_keys=True
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# ===============================
+# CACHE
+# ===============================
+
+
+class CompareCache:
+    """
+    Bounded LRU cache of compare-mode results.
+
+    Usage:
+        key = compare_key(question, "phi", corpus_version, top_k=7)
+        result = compare_cache.get(key)
+        if result is None:
+            result = run_model(...)
+            compare_cache.put(key, result)
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl_seconds=TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (stored_at, result)
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key):
+        """Cached result, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[1]
+
+    def put(self, key, result):
+        """Store a result, evicting the least recently used beyond the limit."""
+        with self._lock:
+            self._entries[key] = (time.time(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, keys=None):
+        """Drop the given keys, or everything when keys is None."""
+        with self._lock:
+            if keys is None:
+                self._entries.clear()
+            else:
+                for key in keys:
+                    self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries)}
+
+
+# Shared across every Streamlit session in this process
+compare_cache = CompareCache()
+memory_guard.register_evictor("compare_cache", compare_cache.invalidate)
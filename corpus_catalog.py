@@ -0,0 +1,177 @@
+"""
+Corpus Catalog for Med-GPT
+==========================
+Small JSON catalog of the indexed corpus, written by ingestion next to
+the ChromaDB store. It records per-document chunk counts, page counts,
+ingest time and content hash, plus the index size and embedding model,
+so the UI can describe the corpus without scanning the collection.
+
+Layout of catalog.json:
+    {
+        "version": "<hash of document hashes and chunk counts>",
+        "updated_at": "2024-01-01T00:00:00+00:00",
+        "embedding_model": "all-MiniLM-L6-v2",
+        "embedding_dim": 384,
+        "total_chunks": 1234,
+        "index_size_bytes": 5678901,
+        "documents": {
+            "who_malaria.pdf": {"pages": 10, "chunks": 42, "sha256": "...",
+                                "size_bytes": 12345, "ingested_at": "..."}
+        }
+    }
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+# ===============================
+# CONFIGURATION
+# ===============================
+
+CATALOG_FILENAME = "catalog.json"
+DEFAULT_PERSIST_DIRECTORY = "data/chroma_db"
+
+
+def catalog_path(persist_directory=DEFAULT_PERSIST_DIRECTORY):
+    return Path(persist_directory) / CATALOG_FILENAME
+
+
+def file_sha256(path):
+    """Content hash of a file, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def directory_size(path):
+    """Total size in bytes of every file under a directory."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+# ===============================
+# READ / WRITE
+# ===============================
+
+
+def load_catalog(persist_directory=DEFAULT_PERSIST_DIRECTORY):
+    """
+    Load the catalog written by ingestion.
+
+    Returns:
+        dict: Catalog, or None if it is missing or unreadable
+    """
+    try:
+        with open(catalog_path(persist_directory), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Error reading corpus catalog: {e}")
+        return None
+
+
+def save_catalog(catalog, persist_directory=DEFAULT_PERSIST_DIRECTORY):
+    """Write the catalog atomically so readers never see a partial file."""
+    path = catalog_path(persist_directory)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(catalog, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def document_entry(pdf_path, pages, chunks):
+    """Catalog record for one ingested PDF."""
+    return {
+        "pages": pages,
+        "chunks": chunks,
+        "sha256": file_sha256(pdf_path),
+        "size_bytes": os.path.getsize(pdf_path),
+        "ingested_at": _now(),
+    }
+
+
+def corpus_version(documents):
+    """Fingerprint that changes whenever any document or its chunking changes."""
+    raw = json.dumps(
+        sorted((name, doc["sha256"], doc["chunks"]) for name, doc in documents.items())
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def update_catalog(
+    documents,
+    collection,
+    embedding_model,
+    embedding_dim=None,
+    persist_directory=DEFAULT_PERSIST_DIRECTORY,
+):
+    """
+    Merge newly ingested documents into the catalog and refresh index stats.
+
+    Args:
+        documents: {document_name: document_entry(...)} for this ingestion run
+        collection: ChromaDB collection the chunks were stored in
+        embedding_model: Name of the SentenceTransformer model used
+        embedding_dim: Embedding vector size
+        persist_directory: ChromaDB persist directory (catalog lives there)
+
+    Returns:
+        dict: The saved catalog
+    """
+    catalog = load_catalog(persist_directory) or {"documents": {}}
+    catalog["documents"].update(documents)
+
+    catalog["version"] = corpus_version(catalog["documents"])
+    catalog["updated_at"] = _now()
+    catalog["embedding_model"] = embedding_model
+    if embedding_dim is not None:
+        catalog["embedding_dim"] = embedding_dim
+    catalog["total_chunks"] = collection.count()
+    catalog["index_size_bytes"] = directory_size(persist_directory)
+
+    save_catalog(catalog, persist_directory)
+    return catalog
+
+
+# ===============================
+# FALLBACK
+# ===============================
+
+
+def catalog_from_collection(collection):
+    """
+    Build a minimal catalog from chunk metadata when no catalog file exists.
+    Fetches metadata only (no documents or embeddings); page counts and
+    hashes are unknown.
+    """
+    documents = {}
+    results = collection.get(include=["metadatas"])
+    for metadata in results.get("metadatas") or []:
+        name = (metadata or {}).get("document_name")
+        if name:
+            documents.setdefault(name, {"chunks": 0})
+            documents[name]["chunks"] += 1
+
+    return {
+        "version": f"{collection.name}:{collection.count()}",
+        "total_chunks": sum(doc["chunks"] for doc in documents.values()),
+        "documents": documents,
+    }
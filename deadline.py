@@ -0,0 +1,152 @@
+"""
+Request Deadlines for Med-GPT
+=============================
+A Deadline carries one query's end-to-end time budget through every
+pipeline stage (encode, retrieve, generate, metrics). Each stage can see
+how much budget is left, and generation sizes num_predict and its
+timeout from that budget instead of using fixed limits.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+# ===============================
+# CONFIGURATION
+# ===============================
+
+DEFAULT_QUERY_BUDGET = float(os.environ.get("MEDGPT_QUERY_BUDGET", "45"))
+
+# Budget kept back after generation for the metric stage
+METRICS_RESERVE = 1.5
+
+MIN_PREDICT = 32
+MAX_PREDICT = 384
+PREDICT_STEP = 32
+
+# Starting estimates until a model has been observed
+DEFAULT_DECODE_RATE = 8.0  # tokens/sec
+DEFAULT_PROMPT_LATENCY = 2.0  # seconds before the first token
+
+
+# ===============================
+# DEADLINE
+# ===============================
+
+
+class Deadline:
+    """
+    End-to-end time budget for a single query.
+
+    Usage:
+        deadline = Deadline(30)
+        with deadline.stage("retrieve"):
+            ...
+        deadline.remaining()  # seconds left
+    """
+
+    def __init__(self, budget_s=None):
+        self.budget_s = DEFAULT_QUERY_BUDGET if budget_s is None else budget_s
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + self.budget_s
+        self.stages = []
+
+    def remaining(self):
+        """Seconds left before the deadline (never negative)."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def elapsed(self):
+        """Seconds since the deadline was created."""
+        return time.monotonic() - self.started_at
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    @contextmanager
+    def stage(self, name):
+        """Record the budget available to a stage and how long it took."""
+        record = {"stage": name, "budget_ms": self.remaining() * 1000}
+        start = time.monotonic()
+        try:
+            yield record
+        finally:
+            record["elapsed_ms"] = (time.monotonic() - start) * 1000
+            record["exceeded"] = self.expired()
+            self.stages.append(record)
+
+    def to_dict(self):
+        """Summary for the RAG result dictionary."""
+        return {
+            "budget_ms": self.budget_s * 1000,
+            "elapsed_ms": self.elapsed() * 1000,
+            "remaining_ms": self.remaining() * 1000,
+            "stages": list(self.stages),
+        }
+
+
+# ===============================
+# ADAPTIVE GENERATION BUDGET
+# ===============================
+
+_rates_lock = threading.Lock()
+_decode_rates = {}
+_prompt_latencies = {}
+
+# Weight of the newest observation in the moving averages
+EWMA_ALPHA = 0.3
+
+
+def record_generation(model, eval_count, eval_seconds, prompt_seconds=None):
+    """
+    Update a model's decode-rate and prompt-latency estimates.
+
+    Args:
+        model: Ollama model name
+        eval_count: Tokens generated
+        eval_seconds: Time spent generating them
+        prompt_seconds: Time before the first token (prompt eval + load)
+    """
+    with _rates_lock:
+        if eval_count and eval_seconds > 0:
+            rate = eval_count / eval_seconds
+            previous = _decode_rates.get(model, rate)
+            _decode_rates[model] = (1 - EWMA_ALPHA) * previous + EWMA_ALPHA * rate
+
+        if prompt_seconds is not None:
+            previous = _prompt_latencies.get(model, prompt_seconds)
+            _prompt_latencies[model] = (
+                1 - EWMA_ALPHA
+            ) * previous + EWMA_ALPHA * prompt_seconds
+
+
+def plan_generation(deadline, model, max_tokens=MAX_PREDICT, reserve_s=METRICS_RESERVE):
+    """
+    Size a generation to fit the remaining budget.
+
+    Args:
+        deadline: Deadline for the query
+        model: Ollama model name
+        max_tokens: Upper bound on num_predict
+        reserve_s: Seconds to keep back for later stages
+
+    Returns:
+        tuple: (num_predict, read_timeout_seconds)
+    """
+    with _rates_lock:
+        rate = _decode_rates.get(model, DEFAULT_DECODE_RATE)
+        prompt_latency = _prompt_latencies.get(model, DEFAULT_PROMPT_LATENCY)
+
+    available = deadline.remaining() - reserve_s
+    decode_time = max(0.0, available - prompt_latency)
+    num_predict = int(min(max_tokens, max(MIN_PREDICT, rate * decode_time)))
+    if num_predict < max_tokens:
+        # Round down to a step so concurrent identical questions produce
+        # identical options and can be coalesced
+        num_predict = max(MIN_PREDICT, num_predict - num_predict % PREDICT_STEP)
+
+    # Never wait on a silent socket past the deadline itself
+    read_timeout = max(1.0, deadline.remaining())
+
+    return num_predict, read_timeout
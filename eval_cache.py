@@ -0,0 +1,303 @@
+"""
+Evaluation Result Cache for Med-GPT
+===================================
+Content-addressed store of evaluation cells, so re-running
+evaluate_models.py after adding a model or a few questions only
+evaluates the new cells.
+
+A cell is keyed by everything its answer depends on:
+    question, Ollama model, generation options (Ollama options plus
+    retrieval settings and embedding model), a hash of the rendered
+    prompt template, and the corpus/index version.
+Changing any of them produces a different key, so stale entries are
+never served; they simply stop being reachable (see `prune`).
+
+Each entry is one JSON file, results/eval_cache/<key[:2]>/<key>.json,
+holding the answer, retrieved chunks and metrics.
+
+Usage:
+    python eval_cache.py stats
+    python eval_cache.py list [--model phi]
+    python eval_cache.py show <key prefix>
+    python eval_cache.py invalidate [--model phi] [--question "malaria"] [--all]
+    python eval_cache.py prune          # drop entries for an older prompt
+                                        # template or corpus version
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+from corpus_catalog import load_catalog
+
+
+# ===============================
+# CONFIGURATION
+# ===============================
+
+CACHE_DIR = Path(os.environ.get("MEDGPT_EVAL_CACHE_DIR", "results/eval_cache"))
+
+# Stand-ins used to render the prompt template for hashing
+_TEMPLATE_QUERY = "<<QUESTION>>"
+_TEMPLATE_CHUNK = {
+    "document_name": "<<DOCUMENT>>",
+    "chunk_index": 0,
+    "text": "<<CONTEXT>>",
+    "similarity": 1.0,
+}
+
+
+# ===============================
+# KEYS
+# ===============================
+
+
+def _digest(value):
+    raw = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def prompt_template_hash():
+    """Hash of the RAG prompt as rendered for placeholder inputs."""
+    from ingest_documents import build_rag_prompt
+
+    return _digest(
+        [
+            build_rag_prompt(_TEMPLATE_QUERY, []),
+            build_rag_prompt(_TEMPLATE_QUERY, [_TEMPLATE_CHUNK]),
+        ]
+    )[:16]
+
+
+def current_corpus_version(collection=None):
+    """Corpus version from the catalog, else from a collection scan."""
+    catalog = load_catalog()
+    if catalog is None:
+        from corpus_catalog import catalog_from_collection
+
+        if collection is None:
+            from ingest_documents import initialize_vector_store
+
+            _, collection = initialize_vector_store()
+        catalog = catalog_from_collection(collection)
+    return catalog.get("version", "unknown")
+
+
+def cache_components(question, model, generation_options, prompt_hash, corpus_version):
+    """Everything an evaluation cell depends on, as stored with the entry."""
+    return {
+        "question": question.strip(),
+        "model": model,
+        "generation_options": generation_options,
+        "prompt_hash": prompt_hash,
+        "corpus_version": corpus_version,
+    }
+
+
+def cache_key(components):
+    return _digest(components)
+
+
+# ===============================
+# CACHE
+# ===============================
+
+
+class EvalCache:
+    """
+    Directory of content-addressed evaluation results.
+
+    Usage:
+        components = cache_components(question, "phi", options, prompt_hash, version)
+        result = eval_cache.get(components)
+        if result is None:
+            result = evaluate(...)
+            eval_cache.put(components, result)
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+
+    def _path(self, key):
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, components):
+        """Cached result for these components, or None."""
+        path = self._path(cache_key(components))
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)["result"]
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable cache entry {path}: {e}")
+            return None
+
+    def put(self, components, result):
+        """Store a result atomically; returns its key."""
+        key = cache_key(components)
+        path = self._path(key)
+        entry = {
+            "key": key,
+            "components": components,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "result": result,
+        }
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".json.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, default=float)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing cache entry {path}: {e}")
+        return key
+
+    def entries(self):
+        """Yield every stored entry (key, components, created_at, result)."""
+        if not self.cache_dir.exists():
+            return
+        for path in sorted(self.cache_dir.glob("*/*.json")):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable cache entry {path}: {e}")
+                continue
+            entry["path"] = str(path)
+            yield entry
+
+    def invalidate(self, predicate=None):
+        """
+        Delete entries matching predicate(entry), or all when None.
+
+        Returns:
+            int: Entries removed
+        """
+        removed = 0
+        for entry in list(self.entries()):
+            if predicate is None or predicate(entry):
+                try:
+                    os.remove(entry["path"])
+                    removed += 1
+                except OSError as e:
+                    print(f"Error removing {entry['path']}: {e}")
+        return removed
+
+    def stats(self):
+        entries = list(self.entries())
+        by_model = {}
+        for entry in entries:
+            model = entry["components"]["model"]
+            by_model[model] = by_model.get(model, 0) + 1
+        return {
+            "entries": len(entries),
+            "size_bytes": sum(os.path.getsize(e["path"]) for e in entries),
+            "by_model": by_model,
+            "corpus_versions": sorted(
+                {e["components"]["corpus_version"] for e in entries}
+            ),
+            "prompt_hashes": sorted({e["components"]["prompt_hash"] for e in entries}),
+        }
+
+
+eval_cache = EvalCache()
+
+
+# ===============================
+# COMMAND LINE
+# ===============================
+
+
+def _matches(args):
+    def predicate(entry):
+        components = entry["components"]
+        if args.model and components["model"] != args.model:
+            return False
+        if (
+            args.question
+            and args.question.lower() not in components["question"].lower()
+        ):
+            return False
+        if args.corpus_version and components["corpus_version"] != args.corpus_version:
+            return False
+        return True
+
+    return predicate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the evaluation cache")
+    parser.add_argument("--cache-dir", default=str(CACHE_DIR))
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("stats", help="Entry counts by model and version")
+
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument("--model")
+    filters.add_argument("--question", help="Substring of the question")
+    filters.add_argument("--corpus-version")
+
+    commands.add_parser("list", parents=[filters], help="List cached cells")
+
+    show = commands.add_parser("show", help="Print one entry")
+    show.add_argument("key", help="Key or unique key prefix")
+
+    invalidate = commands.add_parser(
+        "invalidate", parents=[filters], help="Delete matching entries"
+    )
+    invalidate.add_argument("--all", action="store_true", help="Delete everything")
+
+    commands.add_parser(
+        "prune",
+        help="Delete entries for another prompt template or corpus version",
+    )
+
+    args = parser.parse_args()
+    cache = EvalCache(args.cache_dir)
+
+    if args.command == "stats":
+        print(json.dumps(cache.stats(), indent=2))
+
+    elif args.command == "list":
+        predicate = _matches(args)
+        for entry in cache.entries():
+            if predicate(entry):
+                components = entry["components"]
+                print(
+                    f"{entry['key'][:12]}  {components['model']:<12} "
+                    f"{components['corpus_version'][:12]:<12} "
+                    f"{components['question'][:60]}"
+                )
+
+    elif args.command == "show":
+        found = [e for e in cache.entries() if e["key"].startswith(args.key)]
+        if len(found) != 1:
+            print(f"{len(found)} entries match {args.key!r}")
+        else:
+            print(json.dumps(found[0], indent=2))
+
+    elif args.command == "invalidate":
+        if not (args.all or args.model or args.question or args.corpus_version):
+            parser.error("invalidate needs a filter or --all")
+        removed = cache.invalidate(None if args.all else _matches(args))
+        print(f"Removed {removed} entries")
+
+    elif args.command == "prune":
+        prompt_hash = prompt_template_hash()
+        corpus_version = current_corpus_version()
+        removed = cache.invalidate(
+            lambda e: e["components"]["prompt_hash"] != prompt_hash
+            or e["components"]["corpus_version"] != corpus_version
+        )
+        print(
+            f"Removed {removed} entries "
+            f"(current prompt {prompt_hash}, corpus {corpus_version})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -5,25 +5,49 @@ Evaluates multiple Ollama models on medical RAG tasks with automatic metrics.
 
 Usage:
     python evaluate_models.py
+    python evaluate_models.py --concurrency 6  # cells in flight at once
+    python evaluate_models.py --fresh     # ignore earlier partial runs
 
 Output:
+    - results/evaluation_log.jsonl (one line per finished cell; resumable)
+    - results/eval_cache/ (answers reused by later runs; see eval_cache.py)
     - results/evaluation_results.csv
     - results/evaluation_results.json
     - results/model_statistics.csv
+
+Generations share the host-wide Ollama slots with the Streamlit app and
+rag_service.py (MEDGPT_OLLAMA_CONCURRENCY, see generation_scheduler.py),
+and batch work never takes the slot reserved for interactive use. Raise
+MEDGPT_OLLAMA_CONCURRENCY to match Ollama's OLLAMA_NUM_PARALLEL for more
+cells to generate at once.
+
+pandas, scipy and sentence_transformers are imported inside the
+functions that need them, so importing this module stays cheap.
 """
 
 import os
 import json
-import pandas as pd
-import numpy as np
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-from scipy import stats
 
 # Import existing RAG pipeline
-from ingest_documents import initialize_vector_store, enhanced_rag_query
+from ingest_documents import (
+    GENERATION_OPTIONS,
+    initialize_vector_store,
+    retrieve_chunks,
+    answer_from_chunks,
+)
+from eval_cache import (
+    cache_components,
+    current_corpus_version,
+    eval_cache,
+    prompt_template_hash,
+)
+from ui_metrics import compute_all_metrics
+from generation_scheduler import PRIORITY_BATCH, scheduler
 
 
 # ===============================
@@ -48,205 +72,294 @@ EVALUATION_QUESTIONS = [
 OUTPUT_DIR = Path("results")
 OUTPUT_DIR.mkdir(exist_ok=True)
 
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+# Retrieval settings shared by every model
+RETRIEVAL_TOP_K = 7
+RETRIEVAL_THRESHOLD = 0.2
+
+# Every finished cell is appended here; reruns resume from it
+RESULTS_LOG = OUTPUT_DIR / "evaluation_log.jsonl"
+
+# (model, question) cells evaluated at once; this process's scheduler is
+# sized to match (see configure_scheduler)
+EVAL_CONCURRENCY = int(os.environ.get("MEDGPT_EVAL_CONCURRENCY", "3"))
+
+# Seconds a cell may wait for a host-wide generation slot before it is
+# recorded as failed; cells queue behind the UI and each other
+EVAL_SLOT_WAIT = 600
+
 
 # ===============================
-# EVALUATION METRICS
+# EVALUATION PIPELINE
 # ===============================
 
 
-def compute_answer_relevance(question, answer, model):
+def retrieve_question(question, collection, embedding_model):
     """
-    Compute relevance score between question and answer.
-    Uses cosine similarity of embeddings.
+    Retrieval phase for one question (independent of the Ollama model).
+
+    Returns:
+        dict: chunks, retrieval_ms and error (None on success)
     """
+    start = time.perf_counter()
     try:
-        question_emb = model.encode([question])[0]
-        answer_emb = model.encode([answer])[0]
-
-        similarity = cosine_similarity(
-            question_emb.reshape(1, -1), answer_emb.reshape(1, -1)
-        )[0][0]
-
-        return float(similarity)
+        chunks = retrieve_chunks(
+            collection,
+            question,
+            embedding_model,
+            top_k=RETRIEVAL_TOP_K,
+            similarity_threshold=RETRIEVAL_THRESHOLD,
+        )
+        error = None
     except Exception as e:
-        print(f"Error computing relevance: {e}")
-        return 0.0
+        chunks, error = [], str(e)
+    return {
+        "chunks": chunks,
+        "retrieval_ms": (time.perf_counter() - start) * 1000,
+        "error": error,
+    }
 
 
-def compute_faithfulness(answer, retrieved_chunks, model):
+def evaluate_cell(model_name, question, retrieval, embedding_model):
     """
-    Compute faithfulness score between answer and retrieved context.
-    Uses cosine similarity of embeddings.
+    Generation phase for one (model, question) cell, reusing the
+    question's retrieval.
+    Returns a result dictionary; failures are recorded with error=True.
     """
     try:
-        if not retrieved_chunks:
-            return 0.0
+        if retrieval["error"]:
+            raise RuntimeError(f"Retrieval failed: {retrieval['error']}")
+
+        # Generate with this model from the shared chunks
+        rag_result = answer_from_chunks(
+            question,
+            retrieval["chunks"],
+            ollama_model=model_name,
+            priority=PRIORITY_BATCH,
+            # Rows are grouped by model, so never answer with another one
+            allow_fallback=False,
+        )
+        if rag_result.get("error"):
+            raise RuntimeError(rag_result["error"])
 
-        # Combine retrieved chunks into context
-        context = " ".join([chunk["text"] for chunk in retrieved_chunks])
+        answer = rag_result.get("answer", "")
+        retrieved_chunks = rag_result.get("retrieved_chunks", [])
+        confidence = rag_result.get("confidence", 0)
 
-        answer_emb = model.encode([answer])[0]
-        context_emb = model.encode([context])[0]
+        # Same scores the UI shows (ui_metrics), one batched encode per cell
+        metrics = compute_all_metrics(
+            question, answer, retrieved_chunks, embedding_model
+        )
 
-        similarity = cosine_similarity(
-            answer_emb.reshape(1, -1), context_emb.reshape(1, -1)
-        )[0][0]
+        return {
+            "question": question,
+            "model": model_name,
+            "answered_by": rag_result.get("answered_by", model_name),
+            "partial": rag_result.get("partial", False),
+            "num_predict": rag_result.get("num_predict"),
+            "answer": answer,
+            "num_retrieved_chunks": len(retrieved_chunks),
+            "retrieved_chunks": json.dumps(
+                [
+                    {
+                        "document": chunk["document_name"],
+                        "chunk_index": chunk["chunk_index"],
+                        "similarity": chunk["similarity"],
+                        "text_preview": chunk["text"][:200],
+                    }
+                    for chunk in retrieved_chunks
+                ]
+            ),
+            "confidence": confidence,
+            "relevance_score": metrics["relevance"],
+            "faithfulness_score": metrics["faithfulness"],
+            "coverage_score": metrics["coverage"],
+            "human_score": None,  # To be filled manually
+            "error": False,
+            "timestamp": datetime.now().isoformat(),
+        }
 
-        return float(similarity)
     except Exception as e:
-        print(f"Error computing faithfulness: {e}")
-        return 0.0
-
-
-def compute_context_coverage(answer, retrieved_chunks, model, threshold=0.65):
-    """
-    Compute context coverage score - how many retrieved chunks are reflected in the answer.
+        return {
+            "question": question,
+            "model": model_name,
+            "answered_by": None,
+            "partial": False,
+            "num_predict": None,
+            "answer": f"ERROR: {str(e)}",
+            "num_retrieved_chunks": 0,
+            "retrieved_chunks": "[]",
+            "confidence": 0,
+            "relevance_score": 0.0,
+            "faithfulness_score": 0.0,
+            "coverage_score": 0.0,
+            "human_score": None,
+            "error": True,
+            "timestamp": datetime.now().isoformat(),
+        }
 
-    Args:
-        answer: Generated answer string
-        retrieved_chunks: List of retrieved chunk dictionaries
-        model: SentenceTransformer model
-        threshold: Similarity threshold to consider a chunk as "used" (default: 0.65)
 
-    Returns:
-        float: Coverage score (0.0 to 1.0) - ratio of used chunks to total chunks
-    """
-    try:
-        if not answer or len(answer.strip()) < 10:
-            return 0.0
+def print_cell_result(result):
+    if result["error"]:
+        print(f"  ✗ Error: {result['answer'][len('ERROR: '):]}")
+        return
+    print(f"  ✓ Answer generated ({len(result['answer'])} chars)")
+    print(f"  ✓ Relevance: {result['relevance_score']:.3f}")
+    print(f"  ✓ Faithfulness: {result['faithfulness_score']:.3f}")
+    print(f"  ✓ Coverage: {result['coverage_score']:.3f}")
 
-        if not retrieved_chunks:
-            return 0.0
 
-        # Embed the answer once
-        answer_emb = model.encode([answer])[0]
+# ===============================
+# RESUMABLE RESULTS LOG
+# ===============================
 
-        # Count how many chunks are semantically reflected in the answer
-        used_chunks = 0
 
-        for chunk in retrieved_chunks:
-            chunk_text = chunk.get("text", "")
+def load_results_log(log_path=RESULTS_LOG):
+    """
+    Read completed cells from the results log.
 
-            if not chunk_text:
+    Returns:
+        dict: {(model, question): result}; the last entry for a cell wins
+    """
+    completed = {}
+    if not Path(log_path).exists():
+        return completed
+
+    # Drop a torn final line left by a crash mid-write, so the next
+    # appended result starts on a line of its own
+    data = Path(log_path).read_bytes()
+    if data and not data.endswith(b"\n"):
+        with open(log_path, "r+b") as f:
+            f.truncate(data.rfind(b"\n") + 1)
+
+    with open(log_path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
                 continue
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Skipping unreadable line {line_number} in {log_path}")
+                continue
+            completed[(result["model"], result["question"])] = result
 
-            # Embed the chunk
-            chunk_emb = model.encode([chunk_text])[0]
-
-            # Compute similarity
-            similarity = cosine_similarity(
-                answer_emb.reshape(1, -1), chunk_emb.reshape(1, -1)
-            )[0][0]
-
-            # Check if chunk is "used" (exceeds threshold)
-            if similarity >= threshold:
-                used_chunks += 1
+    return completed
 
-        # Calculate coverage ratio
-        coverage = used_chunks / len(retrieved_chunks)
 
-        return float(coverage)
+def append_result(log_path, result, lock):
+    """Durably append one cell's result to the log."""
+    line = json.dumps(result, default=float) + "\n"
+    with lock:
+        with open(log_path, "a", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
 
-    except Exception as e:
-        print(f"Error computing context coverage: {e}")
-        return 0.0
 
+def retrieve_questions(questions, collection, embedding_model):
+    """
+    Retrieval phase: retrieve once per question for every model to share.
 
-# ===============================
-# EVALUATION PIPELINE
-# ===============================
+    Returns:
+        dict: {question: retrieve_question() result}
+    """
+    retrievals = {}
+    for i, question in enumerate(questions, 1):
+        retrievals[question] = retrieve_question(question, collection, embedding_model)
+        print(
+            f"  Retrieved {i}/{len(questions)}: "
+            f"{len(retrievals[question]['chunks'])} chunks in "
+            f"{retrievals[question]['retrieval_ms']:.0f} ms"
+        )
+    return retrievals
 
 
-def evaluate_single_model(model_name, questions, collection, embedding_model):
+def is_cacheable_cell(result, components):
     """
-    Evaluate a single Ollama model on all questions.
-    Returns list of result dictionaries.
+    Only complete answers from the named model, generated with the options
+    in the cache key, are cached; errors, cut-off and fallback answers are
+    evaluated again on the next run.
     """
-    print(f"\n{'='*60}")
-    print(f"Evaluating model: {model_name}")
-    print(f"{'='*60}")
-
-    results = []
+    return (
+        not result["error"]
+        and not result.get("partial")
+        and result.get("answered_by") == components["model"]
+        and result.get("num_predict")
+        == components["generation_options"]["ollama"]["num_predict"]
+    )
 
-    for i, question in enumerate(questions, 1):
-        print(f"\nQuestion {i}/{len(questions)}: {question[:60]}...")
-
-        try:
-            # Run RAG query with specific model
-            rag_result = enhanced_rag_query(
-                collection=collection,
-                query=question,
-                model=embedding_model,
-                top_k=7,
-                similarity_threshold=0.2,
-            )
 
-            answer = rag_result.get("answer", "")
-            retrieved_chunks = rag_result.get("retrieved_chunks", [])
-            confidence = rag_result.get("confidence", 0)
+def configure_scheduler(concurrency):
+    """
+    Size this process's scheduler for an evaluation run.
 
-            # Compute automatic metrics
-            relevance_score = compute_answer_relevance(
-                question, answer, embedding_model
-            )
+    Only batch work runs here, so every cell gets an in-process slot and
+    the in-process reservation for interactive requests is dropped. The
+    host-wide slots still hold one back for the UI and rag_service.
+    """
+    scheduler.configure(
+        max_concurrency=max(1, concurrency),
+        batch_reserved_slots=0,
+        max_queue_depth={PRIORITY_BATCH: max(1, concurrency)},
+        max_wait={PRIORITY_BATCH: EVAL_SLOT_WAIT},
+    )
+
+
+def run_cells(
+    cells,
+    retrievals,
+    embedding_model,
+    concurrency=EVAL_CONCURRENCY,
+    log_path=None,
+    cache_keys=None,
+):
+    """
+    Generation phase: evaluate (model, question) cells concurrently.
 
-            faithfulness_score = compute_faithfulness(
-                answer, retrieved_chunks, embedding_model
-            )
+    Args:
+        cells: List of (model_name, question) pairs
+        retrievals: Output of retrieve_questions() covering every question
+        concurrency: Cells evaluated at once; the process scheduler is
+                     sized to match
+        log_path: Results log each finished cell is appended to
+        cache_keys: Optional {cell: cache_components()}; complete
+                    results are stored in the evaluation cache
 
-            coverage_score = compute_context_coverage(
-                answer, retrieved_chunks, embedding_model
-            )
+    Returns:
+        list: Result dictionaries in completion order
+    """
+    lock = threading.Lock()
+    results = []
 
-            # Store result
-            result = {
-                "question": question,
-                "model": model_name,
-                "answer": answer,
-                "num_retrieved_chunks": len(retrieved_chunks),
-                "retrieved_chunks": json.dumps(
-                    [
-                        {
-                            "document": chunk["document_name"],
-                            "chunk_index": chunk["chunk_index"],
-                            "similarity": chunk["similarity"],
-                            "text_preview": chunk["text"][:200],
-                        }
-                        for chunk in retrieved_chunks
-                    ]
-                ),
-                "confidence": confidence,
-                "relevance_score": relevance_score,
-                "faithfulness_score": faithfulness_score,
-                "coverage_score": coverage_score,
-                "human_score": None,  # To be filled manually
-                "timestamp": datetime.now().isoformat(),
-            }
+    configure_scheduler(concurrency)
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, concurrency), thread_name_prefix="medgpt-eval"
+    ) as executor:
+        futures = {
+            executor.submit(
+                evaluate_cell,
+                model_name,
+                question,
+                retrievals[question],
+                embedding_model,
+            ): (model_name, question)
+            for model_name, question in cells
+        }
 
+        for done, future in enumerate(as_completed(futures), 1):
+            model_name, question = futures[future]
+            result = future.result()
+            if log_path is not None:
+                append_result(log_path, result, lock)
+            components = (cache_keys or {}).get((model_name, question))
+            if components is not None and is_cacheable_cell(result, components):
+                eval_cache.put(components, result)
             results.append(result)
 
-            print(f"  ✓ Answer generated ({len(answer)} chars)")
-            print(f"  ✓ Relevance: {relevance_score:.3f}")
-            print(f"  ✓ Faithfulness: {faithfulness_score:.3f}")
-            print(f"  ✓ Coverage: {coverage_score:.3f}")
-
-        except Exception as e:
-            print(f"  ✗ Error: {e}")
-            results.append(
-                {
-                    "question": question,
-                    "model": model_name,
-                    "answer": f"ERROR: {str(e)}",
-                    "num_retrieved_chunks": 0,
-                    "retrieved_chunks": "[]",
-                    "confidence": 0,
-                    "relevance_score": 0.0,
-                    "faithfulness_score": 0.0,
-                    "coverage_score": 0.0,
-                    "human_score": None,
-                    "timestamp": datetime.now().isoformat(),
-                }
-            )
+            print(f"\n[{done}/{len(cells)}] {model_name}: {question[:60]}...")
+            print_cell_result(result)
 
     return results
 
@@ -255,6 +368,8 @@ def compute_model_statistics(df):
     """
     Compute aggregated statistics per model.
     """
+    import pandas as pd
+
     stats_list = []
 
     for model in df["model"].unique():
@@ -287,6 +402,8 @@ def compute_statistical_significance(df):
     """
     Compute paired t-test between models for relevance and faithfulness.
     """
+    from scipy import stats
+
     print("\n" + "=" * 60)
     print("STATISTICAL SIGNIFICANCE TESTS (Paired t-test)")
     print("=" * 60)
@@ -329,34 +446,125 @@ def compute_statistical_significance(df):
 # ===============================
 
 
-def run_evaluation():
+def evaluation_options():
+    """Settings every answer depends on besides question, model and corpus."""
+    return {
+        # Evaluation passes no deadline, so these are the options sent
+        "ollama": dict(GENERATION_OPTIONS),
+        "embedding_model": EMBEDDING_MODEL,
+        "top_k": RETRIEVAL_TOP_K,
+        "similarity_threshold": RETRIEVAL_THRESHOLD,
+    }
+
+
+def run_evaluation(concurrency=EVAL_CONCURRENCY, resume=True, use_cache=True):
     """
     Main evaluation pipeline.
+
+    Every finished (model, question) cell is appended to RESULTS_LOG, so
+    an interrupted run picks up where it stopped: only cells missing from
+    the log (or that failed) are evaluated again.
+
+    Cells evaluated in earlier runs with the same prompt template,
+    options and corpus are served from the evaluation cache
+    (eval_cache.py), so only new cells are generated.
+
+    Args:
+        concurrency: Cells evaluated at once
+        resume: Reuse completed cells from RESULTS_LOG (False starts over)
+        use_cache: Serve and store cells in the evaluation cache
     """
+    import pandas as pd
+    from sentence_transformers import SentenceTransformer
+
     print("=" * 60)
     print("Med-GPT Multi-Model Evaluation Pipeline")
     print("=" * 60)
     print(f"Models: {', '.join(MODELS)}")
     print(f"Questions: {len(EVALUATION_QUESTIONS)}")
+    print(f"Concurrency: {concurrency}")
     print(f"Output directory: {OUTPUT_DIR}")
 
-    # Initialize RAG system
-    print("\nInitializing RAG system...")
-    embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
-    _, collection = initialize_vector_store()
-    print("✓ RAG system ready")
-
-    # Evaluate all models
-    all_results = []
-
-    for model_name in MODELS:
-        model_results = evaluate_single_model(
-            model_name=model_name,
-            questions=EVALUATION_QUESTIONS,
-            collection=collection,
-            embedding_model=embedding_model,
+    if not resume and RESULTS_LOG.exists():
+        RESULTS_LOG.unlink()
+    completed = load_results_log(RESULTS_LOG)
+
+    cells = [
+        (model_name, question)
+        for model_name in MODELS
+        for question in EVALUATION_QUESTIONS
+    ]
+    missing = [
+        cell for cell in cells if cell not in completed or completed[cell].get("error")
+    ]
+    print(
+        f"Cells: {len(cells)} total, {len(cells) - len(missing)} already in {RESULTS_LOG}"
+    )
+
+    collection = None
+    cache_keys = None
+    if missing and use_cache:
+        _, collection = initialize_vector_store()
+        prompt_hash = prompt_template_hash()
+        corpus_version = current_corpus_version(collection)
+        options = evaluation_options()
+        cache_keys = {
+            (model_name, question): cache_components(
+                question, model_name, options, prompt_hash, corpus_version
+            )
+            for model_name, question in missing
+        }
+
+        lock = threading.Lock()
+        uncached = []
+        for cell in missing:
+            cached = eval_cache.get(cache_keys[cell])
+            if cached is None:
+                uncached.append(cell)
+            else:
+                completed[cell] = cached
+                append_result(RESULTS_LOG, cached, lock)
+        print(
+            f"🗂️ Evaluation cache: {len(missing) - len(uncached)} cells reused, "
+            f"{len(uncached)} to evaluate "
+            f"(prompt {prompt_hash}, corpus {corpus_version})"
+        )
+        missing = uncached
+
+    if missing:
+        # Initialize RAG system
+        print("\nInitializing RAG system...")
+        embedding_model = SentenceTransformer(EMBEDDING_MODEL)
+        if collection is None:
+            _, collection = initialize_vector_store()
+        print("✓ RAG system ready")
+
+        # Retrieval does not depend on the Ollama model: run it once per
+        # question, then let every model generate from the same chunks
+        questions = list(dict.fromkeys(question for _, question in missing))
+        print(f"\nRetrieving context for {len(questions)} questions...")
+        retrievals = retrieve_questions(questions, collection, embedding_model)
+
+        for result in run_cells(
+            missing, retrievals, embedding_model, concurrency, RESULTS_LOG, cache_keys
+        ):
+            completed[(result["model"], result["question"])] = result
+
+        # Per-model retrieval would have repeated each question's retrieval
+        # once for every additional model
+        retrieval_ms = sum(r["retrieval_ms"] for r in retrievals.values())
+        saved_ms = (
+            sum(retrievals[question]["retrieval_ms"] for _, question in missing)
+            - retrieval_ms
         )
-        all_results.extend(model_results)
+        print(
+            f"\n♻️ Shared retrieval: {len(questions)} retrievals for "
+            f"{len(missing)} cells ({retrieval_ms / 1000:.1f}s), "
+            f"saved ~{saved_ms / 1000:.1f}s versus retrieving per model"
+        )
+
+    # Results in model / question order, whatever order cells finished in
+    all_results = [completed[cell] for cell in cells]
 
     # Create DataFrame
     df = pd.DataFrame(all_results)
@@ -399,4 +607,30 @@ def run_evaluation():
 
 
 if __name__ == "__main__":
-    run_evaluation()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Med-GPT multi-model evaluation")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=EVAL_CONCURRENCY,
+        help="(model, question) cells evaluated at once; generations are "
+        "still bounded by MEDGPT_OLLAMA_CONCURRENCY across Med-GPT processes",
+    )
+    parser.add_argument(
+        "--fresh",
+        action="store_true",
+        help=f"Discard {RESULTS_LOG} and evaluate every cell again",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Neither reuse nor store results in the evaluation cache",
+    )
+    args = parser.parse_args()
+
+    run_evaluation(
+        concurrency=args.concurrency,
+        resume=not args.fresh,
+        use_cache=not args.no_cache,
+    )
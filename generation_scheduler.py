@@ -0,0 +1,345 @@
+"""
+Ollama Generation Scheduler for Med-GPT
+=======================================
+Bounded-concurrency admission queue in front of the Ollama server.
+
+Every upstream generation takes a slot. When all slots are busy, waiters
+are admitted strictly by priority class (interactive > compare > batch)
+and then in arrival order. Batch work can never take the last slot, and
+it is rejected once its queue is full or it has waited too long, so
+evaluation runs cannot starve clinicians using the live UI.
+
+The Streamlit app, rag_service.py and evaluate_models.py each run their
+own scheduler, so admitted generations also take one of the host-wide
+lock-file slots in SLOT_DIR (see SharedSlots). Together the processes
+never run more than MAX_CONCURRENCY generations, and batch work in any
+of them never takes the reserved slot.
+"""
+
+import heapq
+import itertools
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: slots are per process only
+    fcntl = None
+
+from tracing import percentile
+
+
+# ===============================
+# CONFIGURATION
+# ===============================
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_COMPARE = "compare"
+PRIORITY_BATCH = "batch"
+
+# Lower rank is served first
+PRIORITY_RANK = {PRIORITY_INTERACTIVE: 0, PRIORITY_COMPARE: 1, PRIORITY_BATCH: 2}
+
+MAX_CONCURRENCY = int(os.environ.get("MEDGPT_OLLAMA_CONCURRENCY", "2"))
+
+# Waiters allowed per class before new arrivals are rejected
+MAX_QUEUE_DEPTH = {PRIORITY_INTERACTIVE: 32, PRIORITY_COMPARE: 12, PRIORITY_BATCH: 4}
+
+# Seconds a waiter may queue before giving up
+MAX_WAIT = {PRIORITY_INTERACTIVE: 60, PRIORITY_COMPARE: 45, PRIORITY_BATCH: 20}
+
+# Slots held back from batch work so interactive requests can always start
+BATCH_RESERVED_SLOTS = 1
+
+# Lock files shared by every Med-GPT process on the host; set
+# MEDGPT_SLOT_DIR to an empty string to limit each process separately
+SLOT_DIR = os.environ.get(
+    "MEDGPT_SLOT_DIR", os.path.join(tempfile.gettempdir(), "medgpt-ollama-slots")
+)
+
+# Seconds between attempts to take a shared slot
+SLOT_POLL_INTERVAL = 0.05
+
+
+class SchedulerRejected(Exception):
+    """Raised when a generation is not admitted (queue full or wait expired)."""
+
+
+# ===============================
+# CROSS-PROCESS SLOTS
+# ===============================
+
+
+class SharedSlots:
+    """
+    Host-wide generation slots, one flock()ed lock file per slot.
+
+    Batch work may only take slots after the first `reserved` ones.
+    Locks are dropped by the OS when a process exits, so a crashed
+    process never leaks a slot.
+    """
+
+    def __init__(self, directory, count, reserved=BATCH_RESERVED_SLOTS):
+        self.directory = Path(directory)
+        self.count = count
+        self.reserved = reserved if count > reserved else 0
+
+        self._lock = threading.Lock()
+        self._files = {}  # slot index -> open lock file
+        self._held = {priority: [] for priority in PRIORITY_RANK}
+
+    def _candidates(self, priority):
+        if priority == PRIORITY_BATCH:
+            return range(self.reserved, self.count)
+        # Reserved slots first, leaving the others free for batch work
+        return range(self.count)
+
+    def _file(self, index):
+        if index not in self._files:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._files[index] = open(self.directory / f"slot-{index}.lock", "a+b")
+        return self._files[index]
+
+    def try_acquire(self, priority):
+        """Take a free slot without waiting; returns whether one was taken."""
+        with self._lock:
+            taken = {index for held in self._held.values() for index in held}
+            for index in self._candidates(priority):
+                if index in taken:
+                    continue
+                try:
+                    fcntl.flock(self._file(index), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                self._held[priority].append(index)
+                return True
+        return False
+
+    def acquire(self, priority, timeout):
+        """Poll for a slot for up to timeout seconds; returns whether one was taken."""
+        give_up = time.monotonic() + timeout
+        while not self.try_acquire(priority):
+            if time.monotonic() >= give_up:
+                return False
+            time.sleep(SLOT_POLL_INTERVAL)
+        return True
+
+    def release(self, priority):
+        with self._lock:
+            index = self._held[priority].pop()
+            fcntl.flock(self._files[index], fcntl.LOCK_UN)
+
+    def held(self):
+        with self._lock:
+            return sum(len(held) for held in self._held.values())
+
+
+# ===============================
+# SCHEDULER
+# ===============================
+
+
+class GenerationScheduler:
+    """
+    Priority-aware concurrency limiter.
+
+    With shared=SharedSlots(...), every admitted request also takes a
+    host-wide slot before it starts; the wait for it counts against the
+    same timeout.
+
+    Usage:
+        with scheduler.slot("compare", timeout=10):
+            call_upstream()
+    """
+
+    def __init__(
+        self,
+        max_concurrency=MAX_CONCURRENCY,
+        max_queue_depth=None,
+        max_wait=None,
+        batch_reserved_slots=BATCH_RESERVED_SLOTS,
+        shared=None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue_depth = dict(max_queue_depth or MAX_QUEUE_DEPTH)
+        self.max_wait = dict(max_wait or MAX_WAIT)
+        self.batch_reserved_slots = batch_reserved_slots
+        self.shared = shared
+
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = []  # heap of (rank, seq)
+        self._seq = itertools.count()
+
+        self._depth = {priority: 0 for priority in PRIORITY_RANK}
+        self._admitted = {priority: 0 for priority in PRIORITY_RANK}
+        self._rejected = {priority: 0 for priority in PRIORITY_RANK}
+        self._waits = {priority: deque(maxlen=500) for priority in PRIORITY_RANK}
+
+    def configure(
+        self,
+        max_concurrency=None,
+        batch_reserved_slots=None,
+        max_queue_depth=None,
+        max_wait=None,
+    ):
+        """
+        Resize the scheduler in place (e.g. for a batch-only process).
+        max_queue_depth and max_wait are merged into the current settings.
+        Host-wide shared slots are not affected.
+        """
+        with self._cond:
+            if max_concurrency is not None:
+                self.max_concurrency = max_concurrency
+            if batch_reserved_slots is not None:
+                self.batch_reserved_slots = batch_reserved_slots
+            self.max_queue_depth.update(max_queue_depth or {})
+            self.max_wait.update(max_wait or {})
+            self._cond.notify_all()
+
+    def slot_limit(self, priority):
+        """Slots a priority class may occupy at once."""
+        if (
+            priority == PRIORITY_BATCH
+            and self.max_concurrency > self.batch_reserved_slots
+        ):
+            return self.max_concurrency - self.batch_reserved_slots
+        return self.max_concurrency
+
+    def acquire(self, priority=PRIORITY_INTERACTIVE, timeout=None):
+        """
+        Wait for a generation slot.
+
+        Args:
+            priority: interactive, compare or batch
+            timeout: Maximum seconds to queue (capped at MAX_WAIT for the class)
+
+        Returns:
+            float: Seconds spent waiting in the queue
+
+        Raises:
+            SchedulerRejected: If the class queue is full or the wait expired
+        """
+        if priority not in PRIORITY_RANK:
+            raise ValueError(f"Unknown priority: {priority}")
+
+        max_wait = self.max_wait[priority]
+        timeout = max_wait if timeout is None else min(timeout, max_wait)
+        entry = (PRIORITY_RANK[priority], next(self._seq))
+        start = time.monotonic()
+
+        with self._cond:
+            if self._depth[priority] >= self.max_queue_depth[priority]:
+                self._rejected[priority] += 1
+                raise SchedulerRejected(f"{priority} queue is full")
+
+            heapq.heappush(self._waiting, entry)
+            self._depth[priority] += 1
+
+            slot_limit = self.slot_limit(priority)
+
+            def admissible():
+                return self._waiting[0] == entry and self._active < slot_limit
+
+            admitted = self._cond.wait_for(admissible, timeout=timeout)
+
+            self._waiting.remove(entry)
+            heapq.heapify(self._waiting)
+            self._depth[priority] -= 1
+
+            if not admitted:
+                self._rejected[priority] += 1
+                self._cond.notify_all()
+                raise SchedulerRejected(
+                    f"{priority} request waited {timeout:.0f}s without a slot"
+                )
+
+            self._active += 1
+            # The next waiter in line may also fit
+            self._cond.notify_all()
+
+        remaining = max(0.0, timeout - (time.monotonic() - start))
+        if self.shared is not None and not self.shared.acquire(priority, remaining):
+            with self._cond:
+                self._active -= 1
+                self._rejected[priority] += 1
+                self._cond.notify_all()
+            raise SchedulerRejected(
+                f"{priority} request waited {timeout:.0f}s without a shared slot"
+            )
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._admitted[priority] += 1
+            self._waits[priority].append(waited)
+        return waited
+
+    def release(self, priority=PRIORITY_INTERACTIVE):
+        """Return a slot taken by acquire() for the same priority."""
+        if self.shared is not None:
+            self.shared.release(priority)
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority=PRIORITY_INTERACTIVE, timeout=None):
+        """Context manager around acquire()/release()."""
+        waited = self.acquire(priority, timeout)
+        try:
+            yield waited
+        finally:
+            self.release(priority)
+
+    def stats(self):
+        """
+        Queue-depth and wait-time metrics per priority class.
+
+        Returns:
+            dict: active slots, limit, and per-class depth, admitted,
+                  rejected, p50/p95 wait in milliseconds
+        """
+        with self._cond:
+            classes = {}
+            for priority in PRIORITY_RANK:
+                waits = list(self._waits[priority])
+                classes[priority] = {
+                    "queue_depth": self._depth[priority],
+                    "admitted": self._admitted[priority],
+                    "rejected": self._rejected[priority],
+                    "p50_wait_ms": percentile(waits, 50) * 1000,
+                    "p95_wait_ms": percentile(waits, 95) * 1000,
+                }
+            stats = {
+                "active": self._active,
+                "max_concurrency": self.max_concurrency,
+                "classes": classes,
+            }
+        if self.shared is not None:
+            stats["shared"] = {
+                "slots": self.shared.count,
+                "held_by_process": self.shared.held(),
+                "directory": str(self.shared.directory),
+            }
+        return stats
+
+
+def shared_slots():
+    """Host-wide slots for the process scheduler, or None if disabled."""
+    if not SLOT_DIR or fcntl is None:
+        return None
+    return SharedSlots(SLOT_DIR, MAX_CONCURRENCY, BATCH_RESERVED_SLOTS)
+
+
+# Shared scheduler for every Ollama generation in this process
+scheduler = GenerationScheduler(shared=shared_slots())
+
+
+def get_scheduler_stats():
+    """Queue metrics for the shared generation scheduler."""
+    return scheduler.stats()
@@ -4,31 +4,69 @@ Document Ingestion Script for RAG System
 This script loads PDF files from a local folder, extracts text content,
 splits it into chunks, generates embeddings, stores them in ChromaDB,
 and exposes RAG query utilities for Streamlit.
+
+PyPDF2, sentence_transformers and chromadb are imported where they are
+used, so importing this module for its query utilities stays cheap.
+
+Run with --profile (or MEDGPT_PROFILE=ingest) to profile ingestion;
+MEDGPT_PROFILE=query profiles a sample of queries (see profiling.py).
 """
 
 import os
+import time
+from contextlib import nullcontext
 from pathlib import Path
-from PyPDF2 import PdfReader
-from sentence_transformers import SentenceTransformer
-import chromadb
 import requests
 
+import ollama_client
+from ollama_client import OLLAMA_URL
+from deadline import Deadline, plan_generation, record_generation
+from singleflight import generation_flights, make_key
+from generation_scheduler import PRIORITY_INTERACTIVE, SchedulerRejected, scheduler
+from model_health import CircuitOpen, health_tracker
+from corpus_catalog import document_entry, update_catalog
+from tracing import current_trace, span, trace
+from profiling import maybe_profile, profile_run
+from memory_guard import MemoryBudgetExceeded, memory_guard
+from pipeline_metrics import (
+    CONFIDENCE,
+    FALLBACKS,
+    GENERATION_SECONDS,
+    QUERIES,
+    RETRIEVAL_SECONDS,
+    TIME_TO_FIRST_TOKEN_SECONDS,
+    TIMEOUTS,
+)
+
 
 # ===============================
 # PDF INGESTION PIPELINE
 # ===============================
 
+# Texts encoded / chunks written per batch; the memory guard halves
+# these under memory pressure and rejects new batches at its hard limit
+ENCODE_BATCH_SIZE = 256
+STORE_BATCH_SIZE = 512
+
 
 def extract_text_from_pdf(pdf_path):
+    text, _ = read_pdf(pdf_path)
+    return text
+
+
+def read_pdf(pdf_path):
+    """Return (text, page_count) for a PDF; ("", 0) if it cannot be read."""
+    from PyPDF2 import PdfReader
+
     try:
         reader = PdfReader(pdf_path)
         text = ""
         for page in reader.pages:
             text += page.extract_text()
-        return text
+        return text, len(reader.pages)
     except Exception as e:
         print(f"Error reading {pdf_path}: {str(e)}")
-        return ""
+        return "", 0
 
 
 def chunk_text(text, chunk_size=500, overlap=100):
@@ -52,12 +90,21 @@ def chunk_text(text, chunk_size=500, overlap=100):
 
 
 def generate_embeddings(chunks, model_name="all-MiniLM-L6-v2"):
+    from sentence_transformers import SentenceTransformer
+
     model = SentenceTransformer(model_name)
-    texts = [c["chunk_text"] for c in chunks]
-    embeddings = model.encode(texts, show_progress_bar=True)
 
-    for i, chunk in enumerate(chunks):
-        chunk["embedding_vector"] = embeddings[i]
+    start = 0
+    while start < len(chunks):
+        memory_guard.admit("embedding batch")
+        batch = chunks[start : start + memory_guard.batch_size(ENCODE_BATCH_SIZE)]
+        embeddings = model.encode([c["chunk_text"] for c in batch])
+
+        for chunk, embedding in zip(batch, embeddings):
+            chunk["embedding_vector"] = embedding
+
+        start += len(batch)
+        print(f"Embedded {start}/{len(chunks)} chunks")
 
     return chunks, model
 
@@ -65,12 +112,75 @@ def generate_embeddings(chunks, model_name="all-MiniLM-L6-v2"):
 def initialize_vector_store(
     collection_name="medical_docs", persist_directory="data/chroma_db"
 ):
+    import chromadb
+
     client = chromadb.PersistentClient(path=persist_directory)
     collection = client.get_or_create_collection(name=collection_name)
     return client, collection
 
 
 def store_embeddings(collection, chunks):
+    """
+    Write embedded chunks, replacing any earlier version of each document.
+
+    Chunks are upserted by ID (document name + chunk index), so a revised
+    PDF overwrites its old chunks; chunks beyond its new chunk count are
+    deleted once every batch has been written.
+    """
+    start = 0
+    while start < len(chunks):
+        memory_guard.admit("store batch")
+        batch = chunks[start : start + memory_guard.batch_size(STORE_BATCH_SIZE)]
+        _add_chunks(collection, batch)
+        start += len(batch)
+
+    _prune_stale_chunks(collection, chunks)
+
+
+def _prune_stale_chunks(collection, chunks):
+    chunk_counts = {}
+    for chunk in chunks:
+        name = chunk["document_name"]
+        chunk_counts[name] = max(chunk_counts.get(name, 0), chunk["chunk_index"] + 1)
+
+    for name, count in chunk_counts.items():
+        existing = collection.get(where={"document_name": name}, include=["metadatas"])
+        stale = [
+            chunk_id
+            for chunk_id, metadata in zip(existing["ids"], existing["metadatas"])
+            if metadata["chunk_index"] >= count
+        ]
+        if stale:
+            collection.delete(ids=stale)
+
+
+def index_documents(
+    collection,
+    chunks,
+    catalog_entries,
+    embedding_model="all-MiniLM-L6-v2",
+    embedding_dim=None,
+    persist_directory="data/chroma_db",
+):
+    """
+    Store embedded chunks, then record their documents in the corpus catalog.
+    The catalog is written only once every chunk is stored, so it never
+    describes a document version the collection does not hold.
+
+    Returns:
+        dict: The saved catalog
+    """
+    store_embeddings(collection, chunks)
+    return update_catalog(
+        catalog_entries,
+        collection,
+        embedding_model=embedding_model,
+        embedding_dim=embedding_dim,
+        persist_directory=persist_directory,
+    )
+
+
+def _add_chunks(collection, chunks):
     ids, embeddings, documents, metadatas = [], [], [], []
 
     for chunk in chunks:
@@ -88,12 +198,20 @@ def store_embeddings(collection, chunks):
             }
         )
 
-    collection.add(
+    collection.upsert(
         ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas
     )
 
 
-def ingest_documents(docs_folder="data/docs"):
+def ingest_documents(docs_folder="data/docs", catalog_entries=None):
+    """
+    Load and chunk every PDF in a folder.
+
+    Args:
+        docs_folder: Folder containing PDFs
+        catalog_entries: Optional dict filled with a corpus_catalog
+                         document entry per PDF (pages, chunks, hash)
+    """
     docs_path = Path(docs_folder)
     if not docs_path.exists():
         print(f"Folder not found: {docs_folder}")
@@ -107,9 +225,19 @@ def ingest_documents(docs_folder="data/docs"):
     all_chunks = []
 
     for pdf in pdf_files:
-        text = extract_text_from_pdf(pdf)
+        try:
+            memory_guard.admit(f"ingest of {pdf.name}")
+        except MemoryBudgetExceeded as e:
+            # Keep what was read so far; the rest can be ingested later
+            print(f"⚠️ {e}; skipping the remaining PDFs")
+            break
+
+        text, pages = read_pdf(pdf)
         chunks = chunk_text(text)
 
+        if catalog_entries is not None:
+            catalog_entries[pdf.name] = document_entry(pdf, pages, len(chunks))
+
         for idx, chunk in enumerate(chunks):
             all_chunks.append(
                 {"document_name": pdf.name, "chunk_index": idx, "chunk_text": chunk}
@@ -122,60 +250,374 @@ def ingest_documents(docs_folder="data/docs"):
 # OLLAMA CALL
 # ===============================
 
+GENERATION_OPTIONS = {"num_predict": 384, "temperature": 0.2, "top_p": 0.9}
+
+TIMEOUT_MESSAGE = "The model took too long to respond."
+
 
 def call_ollama(
-    prompt, model="tinyllama", ollama_url="http://localhost:11434/api/generate"
+    prompt,
+    model="tinyllama",
+    ollama_url=OLLAMA_URL,
+    timeout=None,
+    priority=PRIORITY_INTERACTIVE,
 ):
     """
     Call Ollama API with timeout protection and hard generation limits.
-    Returns graceful error message if timeout occurs.
+    Requests go through the pooled keep-alive session in ollama_client,
+    so repeated generations reuse the same TCP connection. Identical
+    requests already in flight share one upstream generation, and
+    upstream generations are admitted by the scheduler by priority
+    (interactive, compare or batch).
+
+    Returns:
+        dict: {
+            "response": answer text, or a graceful error message,
+            "model": model that served the request,
+            "ok": False when response is an error message,
+            "stats": ollama_client.generation_stats() of Ollama's counters,
+            "raw_stats": the counters as returned by Ollama
+        }
     """
+    try:
+        model, _ = health_tracker.choose(model)
+    except CircuitOpen as e:
+        return ollama_result(f"Error: {e}.", model, ok=False)
+
+    key = make_key(model, prompt, GENERATION_OPTIONS, ollama_url)
+    with span("ollama.generate", model=model):
+        return generation_flights.do(
+            key, lambda: _request_ollama(prompt, model, ollama_url, timeout, priority)
+        )
+
+
+def ollama_result(response, model, ok=True, counters=None):
+    """Structured call_ollama() result keeping Ollama's timing counters."""
+    counters = {
+        field: value
+        for field, value in (counters or {}).items()
+        if field.endswith(("_count", "_duration"))
+    }
+    return {
+        "response": response,
+        "model": model,
+        "ok": ok,
+        "stats": ollama_client.generation_stats(counters),
+        "raw_stats": counters,
+    }
+
+
+def _request_ollama(prompt, model, ollama_url, timeout, priority):
+    try:
+        scheduler.acquire(priority)
+    except SchedulerRejected as e:
+        return ollama_result(
+            f"Error: Ollama is busy, {priority} request not admitted ({e}).",
+            model,
+            ok=False,
+        )
+
+    start = time.monotonic()
     try:
         payload = {
             "model": model,
             "prompt": prompt,
             "stream": False,
-            "options": {"num_predict": 384, "temperature": 0.2, "top_p": 0.9},
+            "options": dict(GENERATION_OPTIONS),
+            "keep_alive": ollama_client.KEEP_ALIVE,
         }
 
-        response = requests.post(ollama_url, json=payload, timeout=30)
+        response, _ = ollama_client.post(ollama_url, payload, timeout=timeout)
         response.raise_for_status()
-        return response.json().get("response", "")
+        body = response.json()
+        health_tracker.record(model, ok=True, latency=time.monotonic() - start)
+        return ollama_result(body.get("response", ""), model, counters=body)
 
     except requests.exceptions.Timeout:
-        return "The model took too long to respond."
+        health_tracker.record(model, ok=False, latency=time.monotonic() - start)
+        TIMEOUTS.inc(model=model)
+        return ollama_result(TIMEOUT_MESSAGE, model, ok=False)
 
     except requests.exceptions.RequestException as e:
-        return f"Error connecting to Ollama: {str(e)}"
+        health_tracker.record(model, ok=False, latency=time.monotonic() - start)
+        return ollama_result(f"Error connecting to Ollama: {str(e)}", model, ok=False)
 
     except Exception as e:
-        return f"Error calling Ollama: {str(e)}"
-
+        return ollama_result(f"Error calling Ollama: {str(e)}", model, ok=False)
 
-# ===============================
-# ENHANCED RAG QUERY
-# ===============================
+    finally:
+        scheduler.release(priority)
 
 
-def enhanced_rag_query(
-    collection, query, model, top_k=7, similarity_threshold=0.05, ollama_model="phi"
+def call_ollama_stream(
+    prompt,
+    model="tinyllama",
+    ollama_url=OLLAMA_URL,
+    timeout=None,
+    options=None,
+    deadline=None,
+    info=None,
+    priority=PRIORITY_INTERACTIVE,
 ):
     """
-    Streamlit-safe RAG query with similarity filtering,
-    deterministic context construction, and confidence scoring.
+    Streaming variant of call_ollama().
+    Yields response tokens as Ollama produces them. Errors are never
+    yielded as tokens: the same graceful message call_ollama() returns
+    lands in info["error"]. The final counters land in info["stats"]
+    (raw) once the stream completes.
 
     Args:
-        collection: ChromaDB collection
-        query: User question
-        model: SentenceTransformer model for embeddings
-        top_k: Number of chunks to retrieve
-        similarity_threshold: Minimum similarity threshold
-        ollama_model: Ollama model name (phi, tinyllama, gemma:2b, etc.)
+        prompt: Prompt text
+        model: Ollama model name
+        ollama_url: Ollama generate endpoint
+        timeout: (connect, read) timeout passed to the HTTP client
+        options: Overrides merged into GENERATION_OPTIONS
+        deadline: Optional Deadline; the stream is cut off when it expires
+        info: Optional dict filled in with partial/done flags, the error
+              message (if any) and the final Ollama counters once the
+              stream ends
+        priority: Scheduler class (interactive, compare or batch)
+    """
+    info = {} if info is None else info
+    options = {**GENERATION_OPTIONS, **(options or {})}
+    key = make_key(model, prompt, options, ollama_url)
+
+    tokens = 0
+    for token in generation_flights.stream(
+        key,
+        lambda flight_info: _profiled_stream(
+            _stream_ollama(
+                prompt,
+                model,
+                ollama_url,
+                timeout,
+                options,
+                deadline,
+                priority,
+                flight_info,
+            )
+        ),
+        info=info,
+    ):
+        tokens += 1
+        yield token
+
+        # A coalesced stream follows the first caller's deadline, not ours
+        if deadline is not None and deadline.expired():
+            info.update({"partial": True, "tokens": tokens})
+            break
+
+
+def _profiled_stream(tokens):
+    """
+    Profile the upstream generation where it runs, on the singleflight
+    thread, so only the producer side is measured.
+    """
+    with maybe_profile("query", "query-generate"):
+        yield from tokens
+
+
+def _stream_ollama(
+    prompt, model, ollama_url, timeout, options, deadline, priority, info
+):
+    info.update({"partial": False, "done": False, "tokens": 0, "error": None})
+
+    try:
+        queue_timeout = deadline.remaining() if deadline is not None else None
+        info["queue_wait_ms"] = scheduler.acquire(priority, queue_timeout) * 1000
+    except SchedulerRejected as e:
+        info["error"] = f"Error: Ollama is busy, {priority} request not admitted ({e})."
+        return
+
+    def fail(message):
+        # Keep a partial answer rather than discarding it
+        if info["tokens"]:
+            info["partial"] = True
+        else:
+            info["error"] = message
+
+    start = time.monotonic()
+    recorded = False
+
+    try:
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": True,
+            "options": options,
+            "keep_alive": ollama_client.KEEP_ALIVE,
+        }
+
+        response, _ = ollama_client.post(
+            ollama_url, payload, timeout=timeout, stream=True
+        )
+        response.raise_for_status()
+
+        for chunk in ollama_client.iter_stream(response):
+            token = chunk.get("response", "")
+            if not recorded and (token or chunk.get("done")):
+                # Model health is judged on time to first token
+                health_tracker.record(model, ok=True, latency=time.monotonic() - start)
+                recorded = True
+            if token:
+                info["tokens"] += 1
+                yield token
+            if chunk.get("done"):
+                info["done"] = True
+                info["stats"] = chunk
+                break
+            if deadline is not None and deadline.expired():
+                # Out of budget: keep what was generated so far
+                fail(TIMEOUT_MESSAGE)
+                break
+
+    except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+        # requests reports a read timeout inside a stream as a ConnectionError
+        timed_out = isinstance(e, requests.exceptions.Timeout) or "timed out" in str(e)
+        if not recorded:
+            health_tracker.record(model, ok=False, latency=time.monotonic() - start)
+        fail(TIMEOUT_MESSAGE if timed_out else f"Error connecting to Ollama: {e}")
+
+    except requests.exceptions.RequestException as e:
+        if not recorded:
+            health_tracker.record(model, ok=False, latency=time.monotonic() - start)
+        fail(f"Error connecting to Ollama: {e}")
+
+    except Exception as e:
+        fail(f"Error calling Ollama: {e}")
+
+    finally:
+        scheduler.release(priority)
+
+
+def generate_within_deadline(
+    prompt,
+    model,
+    deadline,
+    ollama_url=OLLAMA_URL,
+    info=None,
+    priority=PRIORITY_INTERACTIVE,
+    allow_fallback=True,
+):
+    """
+    Stream a generation sized to the deadline's remaining budget.
+
+    num_predict and the read timeout come from deadline.plan_generation().
+    If the budget runs out mid-answer, the tokens produced so far are kept
+    and info["partial"] is set. With no deadline (batch and evaluation
+    callers) the fixed GENERATION_OPTIONS num_predict and the default read
+    timeout are used, so answers are never resized or cut short.
+
+    If the model's circuit breaker is open the request goes to its fallback
+    model (unless allow_fallback is False); info["model"] records which
+    model actually answered. Failures are reported in info["error"], never
+    as answer tokens.
+
+    Yields:
+        str: Response tokens
     """
+    info = {} if info is None else info
+    plan = plan_stream(model, deadline, info, allow_fallback)
+    if plan is None:
+        return
+    model, num_predict, read_timeout = plan
+
+    start = time.monotonic()
+    first_token_at = None
+
+    for token in call_ollama_stream(
+        prompt,
+        model=model,
+        ollama_url=ollama_url,
+        timeout=(ollama_client.CONNECT_TIMEOUT, read_timeout),
+        options={"num_predict": num_predict},
+        deadline=deadline,
+        info=info,
+        priority=priority,
+    ):
+        if first_token_at is None:
+            first_token_at = time.monotonic()
+        yield token
+
+    # Coalesced followers replay the leader's stream, so only the leader
+    # records the sample
+    if not info.get("coalesced"):
+        record_stream_rate(model, info, start, first_token_at)
+
+
+def plan_stream(model, deadline, info, allow_fallback=True):
+    """
+    Choose the answering model and size a generation to the deadline.
+
+    Fills info with model, requested_model, fallback, error and
+    num_predict.
+
+    Returns:
+        tuple: (model, num_predict, read_timeout), or None if the model's
+               circuit breaker is open (info["error"] says so)
+    """
+    info.update(
+        {"model": model, "requested_model": model, "fallback": False, "error": None}
+    )
+
+    try:
+        model, fell_back = health_tracker.choose(model, allow_fallback)
+    except CircuitOpen as e:
+        info["circuit_open"] = True
+        info["error"] = f"Error: {e}."
+        return None
+
+    info.update({"model": model, "fallback": fell_back})
+    if deadline is None:
+        num_predict = GENERATION_OPTIONS["num_predict"]
+        read_timeout = ollama_client.READ_TIMEOUT
+    else:
+        num_predict, read_timeout = plan_generation(deadline, model)
+    info["num_predict"] = num_predict
+    return model, num_predict, read_timeout
+
+
+def record_stream_rate(model, info, start, first_token_at):
+    """
+    Feed a finished stream's observed speed back into future budgets.
+    Ollama's counters are used when the stream completed; otherwise the
+    rate is estimated from the tokens received (monotonic timestamps).
+    """
+    stats = info.get("stats", {})
+    if stats.get("eval_count") and stats.get("eval_duration"):
+        record_generation(
+            model,
+            stats["eval_count"],
+            stats["eval_duration"] / 1e9,
+            (stats.get("prompt_eval_duration", 0) + stats.get("load_duration", 0))
+            / 1e9,
+        )
+    elif first_token_at is not None and info["tokens"] > 1:
+        record_generation(
+            model,
+            info["tokens"],
+            time.monotonic() - first_token_at,
+            first_token_at - start,
+        )
+
+
+# ===============================
+# ENHANCED RAG QUERY
+# ===============================
+
+
+def encode_query(model, query):
+    """Embed a single query string with the SentenceTransformer model."""
+    return model.encode([query])[0].tolist()
 
-    # 1. Encode query
-    query_embedding = model.encode([query])[0].tolist()
 
+def query_collection(collection, query_embedding, top_k=7, similarity_threshold=0.05):
+    """
+    Query ChromaDB with a precomputed embedding.
+
+    Returns:
+        list: Chunk dictionaries with document_name, chunk_index, text, similarity
+    """
     results = collection.query(query_embeddings=[query_embedding], n_results=top_k)
 
     retrieved_chunks = []
@@ -193,11 +635,35 @@ def enhanced_rag_query(
                 }
             )
 
+    return retrieved_chunks
+
+
+def retrieve_chunks(collection, query, model, top_k=7, similarity_threshold=0.05):
+    """
+    Encode the query and return retrieved chunks above the similarity threshold.
+
+    Returns:
+        list: Chunk dictionaries with document_name, chunk_index, text, similarity
+    """
+    start = time.perf_counter()
+    query_embedding = encode_query(model, query)
+    retrieved_chunks = query_collection(
+        collection, query_embedding, top_k, similarity_threshold
+    )
+    RETRIEVAL_SECONDS.observe(time.perf_counter() - start)
+    return retrieved_chunks
+
+
+def build_rag_prompt(query, retrieved_chunks):
+    """
+    Build the Ollama prompt for a query.
+    Uses the general medical fallback prompt when nothing was retrieved.
+    """
     # ------------------------------------------------------------------
-    # 2️⃣ NO CONTEXT → GENERAL MEDICAL FALLBACK
+    # NO CONTEXT → GENERAL MEDICAL FALLBACK
     # ------------------------------------------------------------------
     if not retrieved_chunks:
-        prompt = f"""
+        return f"""
 You are a medical assistant.
 
 Give a GENERAL medical explanation.
@@ -208,25 +674,17 @@ Question:
 
 Answer briefly (3-5 lines):
 """
-        answer = call_ollama(prompt, model=ollama_model)
-
-        return {
-            "answer": answer.strip(),
-            "confidence": 10,
-            "retrieved_chunks": [],
-            "insufficient_context": True,
-        }
 
     # ------------------------------------------------------------------
-    # 3️⃣ BUILD CONTEXT (TOP 1–2 CHUNKS ONLY)
+    # BUILD CONTEXT (TOP 1–2 CHUNKS ONLY)
     # ------------------------------------------------------------------
     context_parts = [chunk["text"][:500] for chunk in retrieved_chunks[:2]]
     context = "\n\n".join(context_parts)
 
     # ------------------------------------------------------------------
-    # 4️⃣ GUIDELINE-GROUNDED PROMPT
+    # GUIDELINE-GROUNDED PROMPT
     # ------------------------------------------------------------------
-    prompt = f"""
+    return f"""
 You are a medical assistant answering strictly from WHO guideline excerpts.
 
 Context:
@@ -242,11 +700,25 @@ Instructions:
 
 Answer:
 """
-    answer = call_ollama(prompt, model=ollama_model).strip()
 
-    # ------------------------------------------------------------------
-    # 5️⃣ CONFIDENCE + SAFETY LOGIC
-    # ------------------------------------------------------------------
+
+def finalize_rag_result(answer, retrieved_chunks):
+    """
+    Apply confidence and safety logic to a generated answer.
+
+    Returns:
+        dict: answer, confidence, retrieved_chunks, insufficient_context
+    """
+    answer = answer.strip()
+
+    if not retrieved_chunks:
+        return {
+            "answer": answer,
+            "confidence": 10,
+            "retrieved_chunks": [],
+            "insufficient_context": True,
+        }
+
     avg_similarity = sum(c["similarity"] for c in retrieved_chunks) / len(
         retrieved_chunks
     )
@@ -270,17 +742,350 @@ Answer:
     }
 
 
+def enhanced_rag_query(
+    collection,
+    query,
+    model,
+    top_k=7,
+    similarity_threshold=0.05,
+    ollama_model="phi",
+    deadline=None,
+    priority=PRIORITY_INTERACTIVE,
+    ollama_url=OLLAMA_URL,
+):
+    """
+    Streamlit-safe RAG query with similarity filtering,
+    deterministic context construction, and confidence scoring.
+
+    Args:
+        collection: ChromaDB collection
+        query: User question
+        model: SentenceTransformer model for embeddings
+        top_k: Number of chunks to retrieve
+        similarity_threshold: Minimum similarity threshold
+        ollama_model: Ollama model name (phi, tinyllama, gemma:2b, etc.)
+        deadline: Deadline for the whole query (default: DEFAULT_QUERY_BUDGET
+            for interactive queries, none for compare and batch)
+        priority: Scheduler class for generation (interactive, compare, batch)
+        ollama_url: Ollama generate endpoint
+    """
+    result = {}
+    for event in enhanced_rag_query_stream(
+        collection,
+        query,
+        model,
+        top_k=top_k,
+        similarity_threshold=similarity_threshold,
+        ollama_model=ollama_model,
+        deadline=deadline,
+        priority=priority,
+        ollama_url=ollama_url,
+    ):
+        if event["type"] == "result":
+            result = event["result"]
+
+    return result
+
+
+def enhanced_rag_query_stream(
+    collection,
+    query,
+    model,
+    top_k=7,
+    similarity_threshold=0.05,
+    ollama_model="phi",
+    deadline=None,
+    priority=PRIORITY_INTERACTIVE,
+    ollama_url=OLLAMA_URL,
+):
+    """
+    Streaming variant of enhanced_rag_query().
+
+    Yields event dictionaries:
+        {"type": "token", "text": str}     for every generated token
+        {"type": "result", "result": dict} once, after generation finishes
+
+    The final result has the same keys as enhanced_rag_query() plus
+    ttft_ms (query start to first token), total_ms, partial (answer cut
+    short by the deadline), error (generation failure message, also used
+    as the answer; None on success), generation_stats (Ollama's decode speed,
+    prompt-eval cost and load time; empty if the stream was cut short),
+    deadline (per-stage budget breakdown), timings (milliseconds per
+    traced stage) and trace_id (entry in the trace log).
+    """
+    deadline = default_deadline(deadline, priority)
+    start = time.perf_counter()
+
+    with trace("rag_query", model=ollama_model, priority=priority):
+        # Profiled separately from generation: a profile left open across
+        # the yields below would measure the consumer (Streamlit rendering)
+        with maybe_profile("query", "query-retrieve"):
+            with deadline_stage(deadline, "encode"), span("encode"):
+                query_embedding = encode_query(model, query)
+
+            with deadline_stage(deadline, "retrieve"), span("retrieve", top_k=top_k):
+                retrieved_chunks = query_collection(
+                    collection, query_embedding, top_k, similarity_threshold
+                )
+        RETRIEVAL_SECONDS.observe(time.perf_counter() - start)
+
+        yield from _answer_events(
+            query,
+            retrieved_chunks,
+            ollama_model,
+            deadline,
+            priority,
+            start,
+            ollama_url=ollama_url,
+        )
+
+
+def answer_from_chunks(
+    query,
+    retrieved_chunks,
+    ollama_model="phi",
+    deadline=None,
+    priority=PRIORITY_INTERACTIVE,
+    allow_fallback=True,
+    ollama_url=OLLAMA_URL,
+):
+    """
+    Generate an answer for chunks that were already retrieved.
+
+    Lets several models share one retrieval (compare mode, evaluation).
+    Returns the same result dictionary as enhanced_rag_query(); ttft_ms
+    and total_ms are measured from this call.
+
+    Args:
+        query: User question
+        retrieved_chunks: Output of retrieve_chunks()
+        ollama_model: Ollama model name
+        deadline: Deadline for the generation (default: DEFAULT_QUERY_BUDGET
+            for interactive queries, none for compare and batch)
+        priority: Scheduler class for generation (interactive, compare, batch)
+        allow_fallback: Answer with the fallback model while ollama_model's
+                        circuit breaker is open (False: return an error)
+        ollama_url: Ollama generate endpoint
+    """
+    result = {}
+    with trace("rag_answer", model=ollama_model, priority=priority):
+        for event in _answer_events(
+            query,
+            retrieved_chunks,
+            ollama_model,
+            default_deadline(deadline, priority),
+            priority,
+            time.perf_counter(),
+            allow_fallback,
+            ollama_url,
+        ):
+            if event["type"] == "result":
+                result = event["result"]
+
+    return result
+
+
+def default_deadline(deadline, priority):
+    """Interactive queries get the default budget; other callers wait."""
+    if deadline is None and priority == PRIORITY_INTERACTIVE:
+        return Deadline()
+    return deadline
+
+
+def deadline_stage(deadline, name):
+    """Budget stage of a deadline, or a no-op without one."""
+    return deadline.stage(name) if deadline is not None else nullcontext()
+
+
+def _answer_events(
+    query,
+    retrieved_chunks,
+    ollama_model,
+    deadline,
+    priority,
+    start,
+    allow_fallback=True,
+    ollama_url=OLLAMA_URL,
+):
+    with span("prompt"):
+        prompt = build_rag_prompt(query, retrieved_chunks)
+
+    tokens = []
+    ttft_ms = None
+    info = {}
+    generation_start = time.perf_counter()
+
+    with deadline_stage(deadline, "generate"), span(
+        "generate", model=ollama_model
+    ) as record:
+        for token in generate_within_deadline(
+            prompt,
+            ollama_model,
+            deadline,
+            ollama_url=ollama_url,
+            info=info,
+            priority=priority,
+            allow_fallback=allow_fallback,
+        ):
+            if ttft_ms is None:
+                ttft_ms = (time.perf_counter() - start) * 1000
+            tokens.append(token)
+            yield {"type": "token", "text": token}
+        record["answered_by"] = info.get("model", ollama_model)
+        record["tokens"] = len(tokens)
+
+    result = finish_answer(
+        tokens,
+        info,
+        retrieved_chunks,
+        ollama_model,
+        deadline,
+        start,
+        ttft_ms,
+        time.perf_counter() - generation_start,
+    )
+    yield {"type": "result", "result": result}
+
+
+def finish_answer(
+    tokens,
+    info,
+    retrieved_chunks,
+    ollama_model,
+    deadline,
+    start,
+    ttft_ms,
+    generation_seconds,
+):
+    """
+    Assemble the result dictionary for a finished generation and record
+    its query metrics.
+
+    Args:
+        tokens: Answer tokens as streamed
+        info: Info dict filled in by generate_within_deadline()
+        retrieved_chunks: Chunks the prompt was built from
+        ollama_model: Model that was asked for
+        deadline: Deadline of the query, or None
+        start: perf_counter() value at query start
+        ttft_ms: Milliseconds from query start to the first token
+        generation_seconds: Time spent in generation
+
+    Returns:
+        dict: The enhanced_rag_query() result
+    """
+    with span("finalize"):
+        if info.get("error"):
+            result = {
+                "answer": info["error"],
+                "confidence": 0,
+                "retrieved_chunks": retrieved_chunks,
+                "insufficient_context": False,
+            }
+        else:
+            result = finalize_rag_result("".join(tokens), retrieved_chunks)
+    result["error"] = info.get("error")
+    result["ttft_ms"] = ttft_ms
+    result["total_ms"] = (time.perf_counter() - start) * 1000
+    result["partial"] = info.get("partial", False)
+    result["num_predict"] = info.get("num_predict")
+    result["answered_by"] = info.get("model", ollama_model)
+    result["fallback_from"] = ollama_model if info.get("fallback") else None
+    result["generation_stats"] = ollama_client.generation_stats(info.get("stats"))
+    result["deadline"] = deadline.to_dict() if deadline is not None else None
+
+    # Per-stage durations in milliseconds for this query
+    query_trace = current_trace()
+    result["timings"] = query_trace.timings() if query_trace else {}
+    if info.get("queue_wait_ms") is not None:
+        result["timings"]["ollama_queue"] = info["queue_wait_ms"]
+    result["trace_id"] = query_trace.trace_id if query_trace else None
+
+    _record_query_metrics(result, generation_seconds)
+    return result
+
+
+def _record_query_metrics(result, generation_seconds):
+    """Update the Prometheus counters and histograms for one answered query."""
+    model = result["answered_by"]
+    timed_out = result["error"] == TIMEOUT_MESSAGE
+
+    if timed_out:
+        outcome = "timeout"
+    elif result["error"]:
+        outcome = "error"
+    elif result["partial"]:
+        outcome = "partial"
+    elif result["insufficient_context"]:
+        outcome = "insufficient_context"
+    else:
+        outcome = "answered"
+    QUERIES.inc(model=model, outcome=outcome)
+
+    if timed_out or result["partial"]:
+        TIMEOUTS.inc(model=model)
+    if result["insufficient_context"]:
+        FALLBACKS.inc(reason="insufficient_context")
+    if result["fallback_from"]:
+        FALLBACKS.inc(reason="model_fallback")
+
+    GENERATION_SECONDS.observe(generation_seconds, model=model)
+    if result["ttft_ms"] is not None:
+        TIME_TO_FIRST_TOKEN_SECONDS.observe(result["ttft_ms"] / 1000, model=model)
+    CONFIDENCE.observe(result["confidence"])
+
+
 # ===============================
 # INGESTION ENTRY POINT
 # ===============================
 
 if __name__ == "__main__":
-    chunks = ingest_documents("data/docs")
+    import argparse
 
-    if chunks:
-        chunks, model = generate_embeddings(chunks)
-        _, collection = initialize_vector_store()
-        store_embeddings(collection, chunks)
-        print("✅ Ingestion complete.")
-    else:
-        print("❌ No documents ingested.")
+    parser = argparse.ArgumentParser(description="Ingest PDFs into ChromaDB")
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Write cProfile, collapsed-stack and tracemalloc output to profiles/",
+    )
+    args = parser.parse_args()
+
+    profiler = profile_run("ingest") if args.profile else maybe_profile("ingest")
+    with profiler:
+        catalog_entries = {}
+        try:
+            with memory_guard.stage("read"):
+                chunks = ingest_documents("data/docs", catalog_entries=catalog_entries)
+
+            if chunks:
+                with memory_guard.stage("embed"):
+                    chunks, model = generate_embeddings(chunks)
+                with memory_guard.stage("store"):
+                    _, collection = initialize_vector_store()
+                    catalog = index_documents(
+                        collection,
+                        chunks,
+                        catalog_entries,
+                        embedding_dim=model.get_sentence_embedding_dimension(),
+                    )
+                print(
+                    f"🗂️ Catalog: {len(catalog['documents'])} documents, "
+                    f"{catalog['total_chunks']} chunks"
+                )
+                print("✅ Ingestion complete.")
+            else:
+                print("❌ No documents ingested.")
+        except MemoryBudgetExceeded as e:
+            print(f"❌ Ingestion stopped: {e}")
+
+        for stage, record in memory_guard.stats()["stages"].items():
+            if "rss_mb" in record:
+                print(
+                    f"   {stage}: RSS {record['rss_mb']:.0f} MB "
+                    f"({record['rss_delta_mb']:+.0f} MB)"
+                    + (
+                        f", traced peak {record['traced_peak_mb']:.0f} MB"
+                        if "traced_peak_mb" in record
+                        else ""
+                    )
+                )
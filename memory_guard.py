@@ -0,0 +1,226 @@
+"""
+Memory Budget Guard for Med-GPT
+===============================
+Watches the process RSS (the embedding model, the Chroma index, ingestion
+chunk lists and session histories all share a box with Ollama) and acts
+before the OOM killer does:
+
+    below SOFT_LIMIT of the budget   nothing
+    above SOFT_LIMIT                 registered caches are evicted and
+                                     batch sizes shrink
+    above HARD_LIMIT                 new ingest batches are rejected with
+                                     MemoryBudgetExceeded
+
+Per-stage RSS (and tracemalloc peaks when MEDGPT_MEMORY_TRACEMALLOC=1)
+is recorded for every `with memory_guard.stage(...)` block.
+
+Configuration:
+    MEDGPT_MEMORY_BUDGET_MB=6000     budget for this process (0 = monitor only)
+"""
+
+import gc
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+# ===============================
+# CONFIGURATION
+# ===============================
+
+MEMORY_BUDGET_MB = int(os.environ.get("MEDGPT_MEMORY_BUDGET_MB", "0"))
+SOFT_LIMIT = float(os.environ.get("MEDGPT_MEMORY_SOFT_LIMIT", "0.80"))
+HARD_LIMIT = float(os.environ.get("MEDGPT_MEMORY_HARD_LIMIT", "0.95"))
+
+# Trace Python allocations per stage (adds allocation overhead)
+TRACEMALLOC = os.environ.get("MEDGPT_MEMORY_TRACEMALLOC", "") == "1"
+
+# Minimum seconds between cache evictions while under pressure
+EVICT_INTERVAL = 5.0
+
+LEVEL_OK = "ok"
+LEVEL_SOFT = "soft"
+LEVEL_HARD = "hard"
+
+MB = 1024 * 1024
+
+
+class MemoryBudgetExceeded(RuntimeError):
+    """Raised when work is refused because memory is at the hard limit."""
+
+
+def rss_bytes():
+    """Current resident set size of this process, or None if unknown."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+
+        # Peak rather than current RSS, but the best available off Linux
+        # (kilobytes on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+    except (ImportError, AttributeError, OSError):
+        return None
+
+
+# ===============================
+# MEMORY GUARD
+# ===============================
+
+
+class MemoryGuard:
+    """
+    RSS budget with cache eviction, batch shrinking and admission control.
+
+    Usage:
+        memory_guard.register_evictor("compare_cache", compare_cache.invalidate)
+
+        with memory_guard.stage("embed"):
+            size = memory_guard.batch_size(64)
+            memory_guard.admit("embed")  # raises MemoryBudgetExceeded
+    """
+
+    def __init__(
+        self, budget_mb=MEMORY_BUDGET_MB, soft_limit=SOFT_LIMIT, hard_limit=HARD_LIMIT
+    ):
+        self.budget_bytes = budget_mb * MB
+        self.soft_limit = soft_limit
+        self.hard_limit = hard_limit
+        self._lock = threading.Lock()
+        self._evictors = {}
+        self._last_eviction = 0.0
+        self._stats = {"evictions": 0, "rejected": 0, "shrunk_batches": 0}
+        self.stages = {}  # stage -> last measurement
+
+    def register_evictor(self, name, evict):
+        """Register a callable that frees a cache (re-registering replaces it)."""
+        with self._lock:
+            self._evictors[name] = evict
+
+    def usage(self):
+        """RSS as a fraction of the budget (None without a budget or RSS)."""
+        rss = rss_bytes()
+        if not self.budget_bytes or rss is None:
+            return None
+        return rss / self.budget_bytes
+
+    def level(self):
+        usage = self.usage()
+        if usage is None or usage < self.soft_limit:
+            return LEVEL_OK
+        if usage < self.hard_limit:
+            return LEVEL_SOFT
+        return LEVEL_HARD
+
+    def check(self, stage=None):
+        """
+        Evict caches if memory is above the soft limit.
+
+        Returns:
+            str: Pressure level after any eviction (ok, soft, hard)
+        """
+        if self.level() == LEVEL_OK:
+            return LEVEL_OK
+
+        with self._lock:
+            due = time.monotonic() - self._last_eviction >= EVICT_INTERVAL
+            if due:
+                self._last_eviction = time.monotonic()
+        if due:
+            self.evict(reason=stage)
+        return self.level()
+
+    def evict(self, reason=None):
+        """Run every registered evictor and collect garbage."""
+        with self._lock:
+            evictors = list(self._evictors.items())
+            self._stats["evictions"] += 1
+
+        rss_before = rss_bytes()
+        for name, evict in evictors:
+            try:
+                evict()
+            except Exception as e:
+                print(f"Error evicting {name}: {e}")
+        gc.collect()
+        rss_after = rss_bytes()
+
+        if rss_before is not None and rss_after is not None:
+            print(
+                f"⚠️ Memory pressure{f' in {reason}' if reason else ''}: evicted "
+                f"{len(evictors)} caches, RSS {rss_before / MB:.0f} -> "
+                f"{rss_after / MB:.0f} MB (budget {self.budget_bytes / MB:.0f} MB)"
+            )
+
+    def batch_size(self, default, minimum=1):
+        """Batch size for the current pressure: default, half, or minimum."""
+        level = self.check()
+        if level == LEVEL_OK:
+            return default
+        with self._lock:
+            self._stats["shrunk_batches"] += 1
+        if level == LEVEL_SOFT:
+            return max(minimum, default // 2)
+        return minimum
+
+    def admit(self, stage):
+        """
+        Refuse new work at the hard limit (after trying to evict).
+
+        Raises:
+            MemoryBudgetExceeded: If RSS is still above the hard limit
+        """
+        if self.check(stage) != LEVEL_HARD:
+            return
+        with self._lock:
+            self._stats["rejected"] += 1
+        rss = rss_bytes() or 0
+        raise MemoryBudgetExceeded(
+            f"{stage} rejected: RSS {rss / MB:.0f} MB is above "
+            f"{self.hard_limit:.0%} of the {self.budget_bytes / MB:.0f} MB budget"
+        )
+
+    @contextmanager
+    def stage(self, name):
+        """Record RSS (and the tracemalloc peak, if tracing) across a block."""
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+        rss_before = rss_bytes()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            rss_after = rss_bytes()
+            record = {"elapsed_ms": (time.perf_counter() - start) * 1000}
+            if rss_before is not None and rss_after is not None:
+                record["rss_mb"] = rss_after / MB
+                record["rss_delta_mb"] = (rss_after - rss_before) / MB
+            if tracing:
+                record["traced_peak_mb"] = tracemalloc.get_traced_memory()[1] / MB
+            with self._lock:
+                self.stages[name] = record
+
+    def stats(self):
+        rss = rss_bytes()
+        with self._lock:
+            return {
+                "rss_mb": rss / MB if rss is not None else None,
+                "budget_mb": self.budget_bytes / MB,
+                "level": self.level(),
+                **self._stats,
+                "stages": {name: dict(r) for name, r in self.stages.items()},
+            }
+
+
+# Shared guard for every component in this process
+memory_guard = MemoryGuard()
+
+if TRACEMALLOC and not tracemalloc.is_tracing():
+    tracemalloc.start()
@@ -0,0 +1,159 @@
+"""
+Background Metric Computation for Med-GPT
+=========================================
+Small worker pool that scores answers (relevance, faithfulness, coverage)
+off the request path. The UI submits an answer as soon as it is stored
+and renders the metric strip once the scores arrive, so embedding work
+never delays the answer itself.
+
+Results are kept per content key (question, answer, source texts), so a
+resubmitted answer is never scored twice.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from memory_guard import memory_guard
+from pipeline_metrics import CACHE_LOOKUPS
+from service_client import remote_score, service_enabled
+from tracing import trace
+from ui_metrics import compute_all_metrics
+
+
+# ===============================
+# CONFIGURATION
+# ===============================
+
+METRIC_WORKERS = int(os.environ.get("MEDGPT_METRIC_WORKERS", "2"))
+
+# Completed results kept before the oldest are evicted
+MAX_RESULTS = 512
+
+
+def metrics_key(question, answer, sources):
+    """Content key identifying one metric computation."""
+    raw = json.dumps(
+        [question, answer, [chunk.get("text", "") for chunk in sources or []]]
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def score_answer(question, answer, sources, embedding_model):
+    """
+    Relevance, faithfulness and coverage for one answer.
+    A thin client (RAG service enabled, no local embedding model) has the
+    service score it.
+    """
+    if embedding_model is None and service_enabled():
+        return remote_score(question, answer, sources)
+    return compute_all_metrics(question, answer, sources, embedding_model)
+
+
+# ===============================
+# METRIC WORKER
+# ===============================
+
+
+class MetricWorker:
+    """
+    Thread pool computing answer metrics in the background.
+
+    Usage:
+        key = worker.submit(question, answer, sources, embedding_model)
+        metrics = worker.result(key)  # None until the scores are ready
+
+        # Already off the UI thread (e.g. a compare worker): score inline
+        metrics = worker.compute(question, answer, sources, embedding_model)
+    """
+
+    def __init__(self, max_workers=METRIC_WORKERS, max_results=MAX_RESULTS):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="medgpt-metrics"
+        )
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._results = OrderedDict()
+        self.max_results = max_results
+
+    def submit(self, question, answer, sources, embedding_model):
+        """
+        Queue an answer for scoring (no-op if already scored or queued).
+
+        Returns:
+            str: Content key to poll with result()
+        """
+        key = metrics_key(question, answer, sources)
+
+        with self._lock:
+            if key in self._results or key in self._pending:
+                CACHE_LOOKUPS.inc(cache="metrics", result="hit")
+                return key
+            self._pending.add(key)
+        CACHE_LOOKUPS.inc(cache="metrics", result="miss")
+
+        self._executor.submit(
+            self._run, key, question, answer, sources, embedding_model
+        )
+        return key
+
+    def _run(self, key, question, answer, sources, embedding_model):
+        with trace("metrics") as metric_trace:
+            try:
+                metrics = score_answer(question, answer, sources, embedding_model)
+            except Exception as e:
+                print(f"Error computing metrics in background: {e}")
+                metrics = {"relevance": 0.0, "faithfulness": 0.0, "coverage": 0.0}
+        metrics["elapsed_ms"] = metric_trace.duration_ms
+        metrics["timings"] = metric_trace.timings()
+
+        with self._lock:
+            self._pending.discard(key)
+            self._results[key] = metrics
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+        return metrics
+
+    def compute(self, question, answer, sources, embedding_model):
+        """
+        Score an answer on the calling thread, reusing a stored result.
+
+        Returns:
+            dict: {"relevance": float, "faithfulness": float, "coverage": float,
+                "elapsed_ms": float, "timings": {stage: ms}}
+        """
+        key = metrics_key(question, answer, sources)
+        metrics = self.result(key)
+        CACHE_LOOKUPS.inc(cache="metrics", result="miss" if metrics is None else "hit")
+        if metrics is None:
+            metrics = self._run(key, question, answer, sources, embedding_model)
+        return metrics
+
+    def result(self, key):
+        """Scores for a key, or None while they are still being computed."""
+        with self._lock:
+            metrics = self._results.get(key)
+            if metrics is not None:
+                self._results.move_to_end(key)
+            return metrics
+
+    def clear(self):
+        """Drop stored results (queued computations still complete)."""
+        with self._lock:
+            self._results.clear()
+
+    def pending(self, key):
+        with self._lock:
+            return key in self._pending
+
+    def stats(self):
+        with self._lock:
+            return {"pending": len(self._pending), "completed": len(self._results)}
+
+
+# Shared worker for every session in this process
+metric_worker = MetricWorker()
+memory_guard.register_evictor("metric_results", metric_worker.clear)
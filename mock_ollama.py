@@ -0,0 +1,482 @@
+"""
+Mock Ollama Server for Med-GPT
+==============================
+Local stand-in for the Ollama API for offline load and latency testing.
+
+Implements /api/generate (streaming and non-streaming, including the
+prompt-less model load used by the warm-up manager), /api/ps and
+/api/tags. Token rate, time-to-first-token, model load time, error
+injection and the concurrency limit are all configurable, so throughput
+and tail-latency regressions can be reproduced without a real Ollama
+install.
+
+Usage:
+    # Start the mock server
+    python mock_ollama.py serve --port 11435 --token-rate 40 --ttft 0.3
+
+    # Point Med-GPT at it
+    OLLAMA_URL=http://localhost:11435/api/generate streamlit run app.py
+
+    # Drive load through call_ollama() and report latency percentiles
+    python mock_ollama.py bench --url http://localhost:11435/api/generate \\
+        --requests 60 --concurrency 8
+
+    # Same, without the generation scheduler's admission limit
+    python mock_ollama.py bench --requests 60 --concurrency 8 --no-scheduler
+"""
+
+import argparse
+import json
+import random
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# ===============================
+# CONFIGURATION
+# ===============================
+
+DEFAULT_CONFIG = {
+    "token_rate": 25.0,  # tokens/sec after the first token
+    "ttft": 0.5,  # seconds of simulated prompt evaluation
+    "load_time": 2.0,  # seconds to "load" a model the first time it is used
+    "jitter": 0.1,  # +/- fraction applied to every delay
+    "error_rate": 0.0,  # fraction of requests answered with HTTP 500
+    "hang_rate": 0.0,  # fraction of requests that stall until the client gives up
+    "max_concurrency": 4,  # requests above this get HTTP 503
+    "max_tokens": 384,  # default num_predict
+    "models": ["phi", "tinyllama", "gemma:2b"],
+}
+
+CANNED_ANSWER = (
+    "According to the WHO guideline excerpts, severe malaria should be treated "
+    "with intravenous or intramuscular artesunate for at least 24 hours, followed "
+    "by a complete course of an artemisinin-based combination therapy once the "
+    "patient can tolerate oral medication. Supportive care, close monitoring of "
+    "blood glucose and prompt management of complications are also recommended."
+)
+
+
+# ===============================
+# MOCK SERVER
+# ===============================
+
+
+class MockOllamaState:
+    """Shared configuration, loaded-model set and concurrency counter."""
+
+    def __init__(self, config, seed=None):
+        self.config = config
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.loaded = {}  # model -> expiry time
+        self.counters = {"requests": 0, "errors": 0, "rejected": 0}
+
+    def delay(self, seconds):
+        jitter = self.config["jitter"]
+        with self.lock:
+            factor = 1 + self.random.uniform(-jitter, jitter)
+        return max(0.0, seconds * factor)
+
+    def roll(self, rate):
+        with self.lock:
+            return self.random.random() < rate
+
+
+def _ns(seconds):
+    return int(seconds * 1e9)
+
+
+def _keep_alive_seconds(value):
+    """Parse an Ollama keep_alive value ("5m", "30s", 300, -1)."""
+    if value is None:
+        return 300
+    if isinstance(value, (int, float)):
+        return float("inf") if value < 0 else float(value)
+    units = {"s": 1, "m": 60, "h": 3600}
+    if value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None  # set by make_server()
+
+    def setup(self):
+        super().setup()
+        # Flush every streamed token immediately
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_chunk(self, body):
+        data = (json.dumps(body) + "\n").encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    # ------------------------------------------------------------------
+    # Routes
+    # ------------------------------------------------------------------
+    def do_GET(self):
+        state = self.state
+        if self.path == "/api/ps":
+            now = time.time()
+            with state.lock:
+                loaded = [m for m, expiry in state.loaded.items() if expiry > now]
+            self._send_json(200, {"models": [{"name": m, "model": m} for m in loaded]})
+        elif self.path == "/api/tags":
+            models = [{"name": m, "model": m} for m in state.config["models"]]
+            self._send_json(200, {"models": models})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": "invalid JSON"})
+            return
+
+        state = self.state
+        with state.lock:
+            state.counters["requests"] += 1
+            if state.active >= state.config["max_concurrency"]:
+                state.counters["rejected"] += 1
+                busy = True
+            else:
+                state.active += 1
+                busy = False
+
+        if busy:
+            self._send_json(503, {"error": "server busy"})
+            return
+
+        try:
+            self._generate(payload)
+        finally:
+            with state.lock:
+                state.active -= 1
+
+    def _generate(self, payload):
+        state = self.state
+        config = state.config
+        model = payload.get("model", "")
+        prompt = payload.get("prompt")
+        start = time.monotonic()
+
+        if model not in config["models"]:
+            self._send_json(404, {"error": f"model '{model}' not found"})
+            return
+
+        if state.roll(config["error_rate"]):
+            with state.lock:
+                state.counters["errors"] += 1
+            self._send_json(500, {"error": "injected failure"})
+            return
+
+        if state.roll(config["hang_rate"]):
+            # Stall long enough for any sensible client timeout to fire
+            time.sleep(600)
+            return
+
+        # Simulated model load on first use (or after keep_alive expired)
+        now = time.time()
+        with state.lock:
+            resident = state.loaded.get(model, 0) > now
+        load_seconds = 0.0 if resident else state.delay(config["load_time"])
+        time.sleep(load_seconds)
+        keep_alive = _keep_alive_seconds(payload.get("keep_alive"))
+        with state.lock:
+            state.loaded[model] = time.time() + keep_alive
+
+        created_at = datetime.now(timezone.utc).isoformat()
+
+        # A prompt-less request only loads the model
+        if not prompt:
+            self._send_json(
+                200,
+                {
+                    "model": model,
+                    "created_at": created_at,
+                    "response": "",
+                    "done": True,
+                    "done_reason": "load",
+                    "load_duration": _ns(load_seconds),
+                },
+            )
+            return
+
+        options = payload.get("options") or {}
+        num_predict = options.get("num_predict", config["max_tokens"])
+        words = CANNED_ANSWER.split(" ")
+        tokens = [w + " " for w in words][: max(1, num_predict)]
+        prompt_eval_count = max(1, len(prompt.split()))
+
+        prompt_seconds = state.delay(config["ttft"])
+        time.sleep(prompt_seconds)
+
+        token_interval = 1.0 / config["token_rate"] if config["token_rate"] else 0.0
+        eval_start = time.monotonic()
+
+        def final_fields():
+            eval_seconds = time.monotonic() - eval_start
+            return {
+                "model": model,
+                "created_at": created_at,
+                "done": True,
+                "done_reason": "length" if len(tokens) < len(words) else "stop",
+                "total_duration": _ns(time.monotonic() - start),
+                "load_duration": _ns(load_seconds),
+                "prompt_eval_count": prompt_eval_count,
+                "prompt_eval_duration": _ns(prompt_seconds),
+                "eval_count": len(tokens),
+                "eval_duration": _ns(eval_seconds),
+            }
+
+        if payload.get("stream", True):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for i, token in enumerate(tokens):
+                    if i:
+                        time.sleep(state.delay(token_interval))
+                    self._send_chunk(
+                        {
+                            "model": model,
+                            "created_at": created_at,
+                            "response": token,
+                            "done": False,
+                        }
+                    )
+                self._send_chunk({"response": "", **final_fields()})
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # Client stopped reading (deadline or early exit)
+                self.close_connection = True
+        else:
+            time.sleep(sum(state.delay(token_interval) for _ in tokens[1:]))
+            self._send_json(200, {"response": "".join(tokens), **final_fields()})
+
+
+def make_server(host="127.0.0.1", port=11435, config=None, seed=None):
+    """
+    Build a mock Ollama server (not yet serving).
+
+    Returns:
+        ThreadingHTTPServer: call serve_forever() or run it on a thread
+    """
+    merged = dict(DEFAULT_CONFIG)
+    merged.update(config or {})
+
+    handler = type(
+        "ConfiguredMockOllamaHandler",
+        (MockOllamaHandler,),
+        {"state": MockOllamaState(merged, seed)},
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_background_server(host="127.0.0.1", port=0, config=None, seed=None):
+    """
+    Start a mock server on a daemon thread (port 0 picks a free port).
+
+    Returns:
+        tuple: (server, generate_url)
+    """
+    server = make_server(host, port, config, seed)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/api/generate"
+
+
+# ===============================
+# LOAD GENERATOR
+# ===============================
+
+
+def run_benchmark(
+    url,
+    num_requests=40,
+    concurrency=4,
+    models=None,
+    distinct=True,
+    use_scheduler=True,
+):
+    """
+    Fire generations through call_ollama() and report latency percentiles.
+
+    By default this measures the full client path, including the
+    generation scheduler, which admits at most MEDGPT_OLLAMA_CONCURRENCY
+    generations at once (host-wide); latency then includes queueing for a
+    slot. With use_scheduler=False every client thread gets its own slot,
+    so the numbers reflect the HTTP client and the server alone.
+
+    Args:
+        url: Ollama generate URL (mock or real)
+        num_requests: Total generations
+        concurrency: Client threads
+        models: Models to rotate through
+        distinct: Use a unique prompt per request (disables coalescing)
+        use_scheduler: Admit generations through the shared scheduler
+
+    Returns:
+        dict: throughput, failures, latency percentiles and wall time
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    import ingest_documents
+    from ingest_documents import call_ollama
+    from generation_scheduler import GenerationScheduler
+    from ollama_client import get_client_stats
+    from tracing import percentile
+
+    models = models or DEFAULT_CONFIG["models"]
+
+    def one(i):
+        prompt = f"Question {i if distinct else 0}: how is severe malaria treated?"
+        start = time.perf_counter()
+        result = call_ollama(prompt, model=models[i % len(models)], ollama_url=url)
+        return time.perf_counter() - start, result["ok"]
+
+    scheduler = ingest_documents.scheduler
+    if not use_scheduler:
+        ingest_documents.scheduler = GenerationScheduler(
+            max_concurrency=concurrency, batch_reserved_slots=0
+        )
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(one, range(num_requests)))
+    finally:
+        ingest_documents.scheduler = scheduler
+    wall = time.perf_counter() - start
+
+    latencies = [latency for latency, _ in outcomes]
+    failures = sum(1 for _, ok in outcomes if not ok)
+
+    def pct(p):
+        return percentile(latencies, p)
+
+    print("=" * 60)
+    print("Mock Ollama Benchmark")
+    print("=" * 60)
+    print(f"Requests: {num_requests}  Concurrency: {concurrency}")
+    if use_scheduler:
+        print(f"Scheduler: on ({scheduler.max_concurrency} generation slots)")
+    else:
+        print("Scheduler: off (one slot per client thread)")
+    print(f"Throughput: {num_requests / wall:.2f} req/s  Failures: {failures}")
+    print(f"Latency p50: {pct(50):.3f}s  p95: {pct(95):.3f}s  p99: {pct(99):.3f}s")
+    client = get_client_stats()
+    print(
+        f"Connections: {client['new_connections']} new, "
+        f"{client['reused_connections']} reused, {client['retries']} retries"
+    )
+
+    return {
+        "requests": num_requests,
+        "failures": failures,
+        "wall_s": wall,
+        "throughput": num_requests / wall,
+        "p50_s": pct(50),
+        "p95_s": pct(95),
+        "p99_s": pct(99),
+    }
+
+
+# ===============================
+# ENTRY POINT
+# ===============================
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Ollama server for Med-GPT")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve = sub.add_parser("serve", help="Run the mock server")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=11435)
+    serve.add_argument("--token-rate", type=float, default=DEFAULT_CONFIG["token_rate"])
+    serve.add_argument("--ttft", type=float, default=DEFAULT_CONFIG["ttft"])
+    serve.add_argument("--load-time", type=float, default=DEFAULT_CONFIG["load_time"])
+    serve.add_argument("--jitter", type=float, default=DEFAULT_CONFIG["jitter"])
+    serve.add_argument("--error-rate", type=float, default=DEFAULT_CONFIG["error_rate"])
+    serve.add_argument("--hang-rate", type=float, default=DEFAULT_CONFIG["hang_rate"])
+    serve.add_argument(
+        "--max-concurrency", type=int, default=DEFAULT_CONFIG["max_concurrency"]
+    )
+    serve.add_argument("--seed", type=int, default=None)
+
+    bench = sub.add_parser("bench", help="Run a load test through call_ollama()")
+    bench.add_argument("--url", default="http://127.0.0.1:11435/api/generate")
+    bench.add_argument("--requests", type=int, default=40)
+    bench.add_argument("--concurrency", type=int, default=4)
+    bench.add_argument(
+        "--same-prompt",
+        action="store_true",
+        help="Send identical prompts so coalescing can kick in",
+    )
+    bench.add_argument(
+        "--no-scheduler",
+        action="store_true",
+        help="Bypass the generation scheduler to measure the client and server alone",
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        config = {
+            "token_rate": args.token_rate,
+            "ttft": args.ttft,
+            "load_time": args.load_time,
+            "jitter": args.jitter,
+            "error_rate": args.error_rate,
+            "hang_rate": args.hang_rate,
+            "max_concurrency": args.max_concurrency,
+        }
+        server = make_server(args.host, args.port, config, args.seed)
+        print(f"Mock Ollama listening on http://{args.host}:{args.port}")
+        print(json.dumps(config, indent=2))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\nStopped.")
+    else:
+        run_benchmark(
+            args.url,
+            num_requests=args.requests,
+            concurrency=args.concurrency,
+            distinct=not args.same_prompt,
+            use_scheduler=not args.no_scheduler,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Per-Model Health Tracking and Circuit Breaker for Med-GPT
+=========================================================
+Tracks rolling error rate and time-to-first-token per Ollama model.
+
+When a model keeps failing or responding too slowly its breaker opens:
+requests stop waiting out timeouts against it and are routed to a
+configured faster fallback model instead. After a cool-down a single
+probe request is let through (half-open) to test whether it recovered.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+from tracing import percentile
+
+
+# ===============================
+# CONFIGURATION
+# ===============================
+
+# Faster model to answer when a model's breaker is open
+FALLBACK_MODELS = {"phi": "tinyllama", "gemma:2b": "tinyllama"}
+
+WINDOW_SIZE = 20  # most recent calls considered per model
+MIN_CALLS = 4  # calls needed before the breaker can trip
+ERROR_RATE_THRESHOLD = 0.5
+SLOW_CALL_SECONDS = float(os.environ.get("MEDGPT_SLOW_CALL_SECONDS", "15"))
+SLOW_RATE_THRESHOLD = 0.6
+OPEN_SECONDS = float(os.environ.get("MEDGPT_BREAKER_OPEN_SECONDS", "30"))
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    """Raised when neither a model nor its fallback is accepting requests."""
+
+
+# ===============================
+# HEALTH TRACKER
+# ===============================
+
+
+class _ModelHealth:
+    def __init__(self):
+        self.calls = deque(maxlen=WINDOW_SIZE)  # (ok, latency_seconds)
+        self.state = STATE_CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.probe_started_at = 0.0
+        self.trips = 0
+
+
+class HealthTracker:
+    """
+    Rolling health window and breaker state per model.
+
+    Usage:
+        model, fell_back = tracker.choose("phi")
+        ... generate with model ...
+        tracker.record(model, ok=True, latency=2.4)
+    """
+
+    def __init__(self, fallback_models=None):
+        self.fallback_models = dict(
+            FALLBACK_MODELS if fallback_models is None else fallback_models
+        )
+        self._lock = threading.Lock()
+        self._models = {}
+
+    def _health(self, model):
+        health = self._models.get(model)
+        if health is None:
+            health = self._models[model] = _ModelHealth()
+        return health
+
+    def allow(self, model):
+        """Whether a request may be sent to this model right now."""
+        with self._lock:
+            health = self._health(model)
+
+            if health.state == STATE_CLOSED:
+                return True
+
+            if health.state == STATE_OPEN:
+                if time.monotonic() - health.opened_at < OPEN_SECONDS:
+                    return False
+                health.state = STATE_HALF_OPEN
+                health.probe_in_flight = False
+
+            # Half-open: let exactly one probe through (a probe that never
+            # reported back, e.g. rejected by the scheduler, is replaced)
+            now = time.monotonic()
+            if health.probe_in_flight and now - health.probe_started_at < OPEN_SECONDS:
+                return False
+            health.probe_in_flight = True
+            health.probe_started_at = now
+            return True
+
+    def choose(self, model, allow_fallback=True):
+        """
+        Pick the model that should serve a request.
+
+        Args:
+            model: Requested model
+            allow_fallback: Route to the fallback model while the breaker
+                            is open (False: fail instead, e.g. evaluation)
+
+        Returns:
+            tuple: (model_to_use, fell_back)
+
+        Raises:
+            CircuitOpen: If the model and its fallback are both unavailable
+        """
+        if self.allow(model):
+            return model, False
+
+        fallback = self.fallback_models.get(model) if allow_fallback else None
+        if fallback and fallback != model and self.allow(fallback):
+            return fallback, True
+
+        raise CircuitOpen(f"{model} is unavailable (circuit open)")
+
+    def record(self, model, ok, latency):
+        """
+        Record the outcome of a request.
+
+        Args:
+            model: Model that served the request
+            ok: Whether it produced an answer
+            latency: Seconds until the first token (or until failure)
+        """
+        with self._lock:
+            health = self._health(model)
+            health.calls.append((ok, latency))
+
+            if health.state == STATE_HALF_OPEN:
+                health.probe_in_flight = False
+                if ok and latency < SLOW_CALL_SECONDS:
+                    health.state = STATE_CLOSED
+                    health.calls.clear()
+                else:
+                    self._trip(health)
+                return
+
+            if health.state == STATE_CLOSED and len(health.calls) >= MIN_CALLS:
+                error_rate, slow_rate = _rates(health.calls)
+                if (
+                    error_rate >= ERROR_RATE_THRESHOLD
+                    or slow_rate >= SLOW_RATE_THRESHOLD
+                ):
+                    self._trip(health)
+
+    def _trip(self, health):
+        health.state = STATE_OPEN
+        health.opened_at = time.monotonic()
+        health.trips += 1
+
+    def state(self, model):
+        with self._lock:
+            return self._health(model).state
+
+    def stats(self):
+        """Breaker state, error rate, slow rate and p50 latency per model."""
+        with self._lock:
+            stats = {}
+            for model, health in self._models.items():
+                error_rate, slow_rate = _rates(health.calls)
+                latencies = [latency for ok, latency in health.calls if ok]
+                stats[model] = {
+                    "state": health.state,
+                    "calls": len(health.calls),
+                    "error_rate": error_rate,
+                    "slow_rate": slow_rate,
+                    "p50_latency_s": percentile(latencies, 50),
+                    "trips": health.trips,
+                }
+            return stats
+
+
+def _rates(calls):
+    if not calls:
+        return 0.0, 0.0
+    errors = sum(1 for ok, _ in calls if not ok)
+    slow = sum(1 for ok, latency in calls if ok and latency >= SLOW_CALL_SECONDS)
+    return errors / len(calls), slow / len(calls)
+
+
+# Shared tracker for every Ollama generation in this process
+health_tracker = HealthTracker()
+
+
+def get_model_health():
+    """Breaker state and rolling health per model."""
+    return health_tracker.stats()
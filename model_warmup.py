@@ -0,0 +1,151 @@
+"""
+Ollama Model Warm-up Manager for Med-GPT
+========================================
+Preloads Ollama models in the background so the first question after
+startup, or after switching models, does not pay the model load time.
+
+Models are loaded with an explicit keep_alive so Ollama keeps them
+resident between questions. Load state is tracked per model and can be
+reconciled against Ollama's /api/ps listing of resident models.
+"""
+
+import threading
+import time
+
+import ollama_client
+
+
+# ===============================
+# CONFIGURATION
+# ===============================
+
+AVAILABLE_MODELS = ["phi", "tinyllama", "gemma:2b"]
+
+# Loading a model from disk can take far longer than a normal generation
+WARMUP_READ_TIMEOUT = 180
+
+STATE_COLD = "cold"
+STATE_LOADING = "loading"
+STATE_WARM = "warm"
+STATE_ERROR = "error"
+
+
+# ===============================
+# WARM-UP MANAGER
+# ===============================
+
+
+class WarmupManager:
+    """
+    Track and drive Ollama model loading.
+
+    Each model has a status dictionary:
+        state:     cold | loading | warm | error
+        load_ms:   Ollama-reported load time of the last warm-up
+        warmed_at: Unix time the model was last confirmed resident
+        error:     Last warm-up error message, if any
+    """
+
+    def __init__(self, ollama_url=None, keep_alive=None):
+        self.ollama_url = ollama_url or ollama_client.OLLAMA_URL
+        self.keep_alive = keep_alive or ollama_client.KEEP_ALIVE
+        self._lock = threading.Lock()
+        self._status = {}
+        self._last_refresh = 0.0
+
+    def status(self, model):
+        """Get a copy of the status dictionary for a model."""
+        with self._lock:
+            return dict(self._status.get(model, {"state": STATE_COLD}))
+
+    def statuses(self):
+        """Get status dictionaries for every tracked model."""
+        with self._lock:
+            return {model: dict(status) for model, status in self._status.items()}
+
+    def preload(self, models=None):
+        """Start background warm-up for every configured model."""
+        for model in models or AVAILABLE_MODELS:
+            self.warm(model)
+
+    def warm(self, model, background=True):
+        """
+        Load a model into Ollama memory.
+
+        Does nothing if the model is already warm or loading.
+
+        Args:
+            model: Ollama model name
+            background: Run the load on a daemon thread and return immediately
+        """
+        with self._lock:
+            state = self._status.get(model, {}).get("state", STATE_COLD)
+            if state in (STATE_LOADING, STATE_WARM):
+                return
+            self._status[model] = {"state": STATE_LOADING, "started_at": time.time()}
+
+        if background:
+            threading.Thread(
+                target=self._load, args=(model,), name=f"warmup-{model}", daemon=True
+            ).start()
+        else:
+            self._load(model)
+
+    def _load(self, model):
+        # A generate request without a prompt only loads the model
+        payload = {"model": model, "keep_alive": self.keep_alive}
+
+        try:
+            response, _ = ollama_client.post(
+                self.ollama_url,
+                payload,
+                timeout=(ollama_client.CONNECT_TIMEOUT, WARMUP_READ_TIMEOUT),
+            )
+            response.raise_for_status()
+            body = response.json()
+
+            status = {
+                "state": STATE_WARM,
+                "load_ms": body.get("load_duration", 0) / 1e6,
+                "warmed_at": time.time(),
+            }
+        except Exception as e:
+            status = {"state": STATE_ERROR, "error": str(e)}
+
+        with self._lock:
+            self._status[model] = status
+
+    def refresh(self, min_interval=0):
+        """
+        Reconcile tracked state with the models Ollama reports as resident.
+        Warm models that Ollama has since unloaded are marked cold.
+
+        Args:
+            min_interval: Skip the /api/ps call if the last refresh was
+                          less than this many seconds ago
+        """
+        now = time.time()
+        if now - self._last_refresh < min_interval:
+            return
+        self._last_refresh = now
+
+        try:
+            loaded = ollama_client.get(
+                ollama_client.api_url("/api/ps", self.ollama_url), timeout=(1, 2)
+            )
+        except Exception:
+            return
+
+        resident = {m.get("name") for m in loaded.get("models", [])}
+        resident |= {
+            name.split(":")[0] for name in resident if name.endswith(":latest")
+        }
+
+        with self._lock:
+            for model in resident:
+                status = self._status.setdefault(model, {})
+                if status.get("state") != STATE_WARM:
+                    status.update({"state": STATE_WARM, "warmed_at": time.time()})
+            for model, status in self._status.items():
+                if status.get("state") == STATE_WARM and model not in resident:
+                    status["state"] = STATE_COLD
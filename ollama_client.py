@@ -0,0 +1,376 @@
+"""
+Ollama HTTP Client for Med-GPT
+==============================
+Pooled keep-alive session layer shared by every call to the Ollama API.
+Connections are reused across generations, connection errors are retried
+with jittered backoff, and connect/read timeouts are configured separately.
+"""
+
+import json
+import os
+import random
+import socket
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError
+
+
+# ===============================
+# CONFIGURATION
+# ===============================
+
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434/api/generate")
+
+POOL_SIZE = int(os.environ.get("OLLAMA_POOL_SIZE", "8"))
+CONNECT_TIMEOUT = float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.environ.get("OLLAMA_READ_TIMEOUT", "30"))
+MAX_RETRIES = int(os.environ.get("OLLAMA_MAX_RETRIES", "2"))
+RETRY_BACKOFF = float(os.environ.get("OLLAMA_RETRY_BACKOFF", "0.25"))
+
+# How long Ollama keeps a model resident after each request
+KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+
+# TCP keep-alive so idle pooled sockets are not silently dropped
+KEEPALIVE_SOCKET_OPTIONS = HTTPConnection.default_socket_options + [
+    (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+]
+
+
+# ===============================
+# CONNECTION TELEMETRY
+# ===============================
+
+_call_state = threading.local()
+
+
+def _record_connect(duration):
+    """Accumulate connection setup time for the request running on this thread."""
+    _call_state.connect_time = getattr(_call_state, "connect_time", 0.0) + duration
+    _call_state.new_connections = getattr(_call_state, "new_connections", 0) + 1
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            # Failed attempts count too: their connect time was still spent
+            _record_connect(time.perf_counter() - start)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _record_connect(time.perf_counter() - start)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter with TCP keep-alive and per-connection setup timing."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["socket_options"] = KEEPALIVE_SOCKET_OPTIONS
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+_stats_lock = threading.Lock()
+_stats = {
+    "requests": 0,
+    "new_connections": 0,
+    "reused_connections": 0,
+    "connect_ms_total": 0.0,
+    "retries": 0,
+    "errors": 0,
+}
+_recent_calls = deque(maxlen=200)
+
+
+def _update_stats(telemetry, error=False):
+    with _stats_lock:
+        _stats["requests"] += 1
+        _stats["new_connections"] += telemetry["new_connections"]
+        if telemetry["new_connections"] == 0 and not error:
+            _stats["reused_connections"] += 1
+        _stats["connect_ms_total"] += telemetry["connect_ms"]
+        _stats["retries"] += telemetry["retries"]
+        if error:
+            _stats["errors"] += 1
+        _recent_calls.append(telemetry)
+
+
+def get_client_stats():
+    """
+    Get aggregated connection telemetry for the Ollama session.
+
+    Returns:
+        dict: Request/connection counters, average connect time per new
+              connection and the connect time saved by reusing connections.
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+
+    new = stats["new_connections"]
+    stats["avg_connect_ms"] = stats["connect_ms_total"] / new if new else 0.0
+    stats["connect_ms_saved"] = stats["avg_connect_ms"] * stats["reused_connections"]
+    return stats
+
+
+def get_recent_calls(limit=20):
+    """Get per-call telemetry for the most recent Ollama requests."""
+    with _stats_lock:
+        return list(_recent_calls)[-limit:]
+
+
+# ===============================
+# SESSION MANAGEMENT
+# ===============================
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _build_session(pool_size):
+    session = requests.Session()
+    # Retries are handled in post() so they can be jittered and counted
+    adapter = _PooledAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Connection": "keep-alive"})
+    return session
+
+
+def get_session():
+    """Get the module-level pooled session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session(POOL_SIZE)
+    return _session
+
+
+def configure_session(
+    pool_size=None,
+    connect_timeout=None,
+    read_timeout=None,
+    max_retries=None,
+    retry_backoff=None,
+):
+    """
+    Reconfigure the shared Ollama session.
+
+    Args:
+        pool_size: Maximum pooled keep-alive connections per host
+        connect_timeout: Seconds allowed to establish a connection
+        read_timeout: Seconds allowed between bytes of the response
+        max_retries: Retries on connection errors (not on read timeouts)
+        retry_backoff: Base delay in seconds for jittered exponential backoff
+    """
+    global _session, POOL_SIZE, CONNECT_TIMEOUT, READ_TIMEOUT
+    global MAX_RETRIES, RETRY_BACKOFF
+
+    with _session_lock:
+        if connect_timeout is not None:
+            CONNECT_TIMEOUT = connect_timeout
+        if read_timeout is not None:
+            READ_TIMEOUT = read_timeout
+        if max_retries is not None:
+            MAX_RETRIES = max_retries
+        if retry_backoff is not None:
+            RETRY_BACKOFF = retry_backoff
+        if pool_size is not None:
+            POOL_SIZE = pool_size
+            old_session, _session = _session, _build_session(pool_size)
+            if old_session is not None:
+                old_session.close()
+
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, RETRY_BACKOFF * (2**attempt))
+
+
+# ===============================
+# REQUESTS
+# ===============================
+
+
+def post(url, payload, timeout=None, stream=False):
+    """
+    POST a JSON payload to Ollama over the pooled session.
+
+    Errors raised before the request reached Ollama (connection refused,
+    connect timeout, DNS failure) are retried up to MAX_RETRIES times with
+    jittered backoff. Anything after that point (a reset once the body was
+    sent, read timeouts) is not retried, since Ollama may already be
+    generating and a retry would run the generation twice.
+
+    Args:
+        url: Full Ollama endpoint URL
+        payload: JSON-serialisable request body
+        timeout: (connect, read) tuple or single float; defaults to the
+                 configured CONNECT_TIMEOUT / READ_TIMEOUT
+        stream: Whether to stream the response body
+
+    Returns:
+        tuple: (requests.Response, telemetry dict)
+    """
+    if timeout is None:
+        timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+    session = get_session()
+    retries = 0
+    start = time.perf_counter()
+
+    # Connect time accumulates over every attempt of this call
+    _call_state.connect_time = 0.0
+    _call_state.new_connections = 0
+
+    while True:
+        try:
+            response = session.post(url, json=payload, timeout=timeout, stream=stream)
+            break
+        except requests.exceptions.ConnectionError as e:
+            if retries >= MAX_RETRIES or not failed_before_send(e):
+                _update_stats(_telemetry(start, retries), error=True)
+                raise
+            time.sleep(backoff_delay(retries))
+            retries += 1
+        except requests.exceptions.RequestException:
+            _update_stats(_telemetry(start, retries), error=True)
+            raise
+
+    telemetry = _telemetry(start, retries)
+    _update_stats(telemetry)
+    return response, telemetry
+
+
+def failed_before_send(error):
+    """
+    Whether a requests ConnectionError happened before the request was
+    sent (no connection could be established), so retrying it is safe.
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = error.args[0] if error.args else None
+    # requests wraps urllib3's MaxRetryError, whose reason is the cause
+    reason = getattr(reason, "reason", reason)
+    # NewConnectionError (refused, DNS failure) subclasses ConnectTimeoutError
+    return isinstance(reason, ConnectTimeoutError)
+
+
+def get(url, timeout=None):
+    """GET a JSON endpoint (e.g. /api/ps) over the pooled session."""
+    if timeout is None:
+        timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+    response = get_session().get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+def api_url(path, ollama_url=None):
+    """
+    Build an Ollama API URL from the configured generate endpoint.
+
+    Example:
+        api_url("/api/ps") -> "http://localhost:11434/api/ps"
+    """
+    base = (ollama_url or OLLAMA_URL).split("/api/")[0]
+    return base.rstrip("/") + path
+
+
+def _telemetry(start, retries):
+    new_connections = getattr(_call_state, "new_connections", 0)
+    return {
+        "connect_ms": getattr(_call_state, "connect_time", 0.0) * 1000,
+        "new_connections": new_connections,
+        "reused_connection": new_connections == 0,
+        "retries": retries,
+        "elapsed_ms": (time.perf_counter() - start) * 1000,
+    }
+
+
+def iter_stream(response):
+    """
+    Iterate over a streamed Ollama response.
+    Yields one parsed JSON object per line and closes the response
+    when the stream ends or the consumer stops early.
+    """
+    try:
+        for line in response.iter_lines():
+            if line:
+                yield json.loads(line)
+    finally:
+        response.close()
+
+
+# ===============================
+# GENERATION COUNTERS
+# ===============================
+
+_COUNTER_FIELDS = (
+    "prompt_eval_count",
+    "prompt_eval_duration",
+    "eval_count",
+    "eval_duration",
+    "load_duration",
+    "total_duration",
+)
+
+
+def generation_stats(chunk):
+    """
+    Per-request timing summary from Ollama's final response counters.
+
+    Durations in the response are nanoseconds; this converts them to
+    milliseconds and derives decode speed, prompt-eval cost and load time
+    so latency can be attributed to context size versus decode speed.
+
+    Args:
+        chunk: Final /api/generate response object (done=True)
+
+    Returns:
+        dict: Counters and derived rates, or {} if the response had none
+    """
+    if not chunk or not any(chunk.get(field) for field in _COUNTER_FIELDS):
+        return {}
+
+    prompt_tokens = chunk.get("prompt_eval_count", 0)
+    prompt_ms = chunk.get("prompt_eval_duration", 0) / 1e6
+    eval_tokens = chunk.get("eval_count", 0)
+    eval_ms = chunk.get("eval_duration", 0) / 1e6
+
+    return {
+        "prompt_tokens": prompt_tokens,
+        "prompt_eval_ms": prompt_ms,
+        "prompt_ms_per_token": prompt_ms / prompt_tokens if prompt_tokens else 0.0,
+        "eval_tokens": eval_tokens,
+        "eval_ms": eval_ms,
+        "tokens_per_sec": eval_tokens / (eval_ms / 1000) if eval_ms else 0.0,
+        "load_ms": chunk.get("load_duration", 0) / 1e6,
+        "total_ms": chunk.get("total_duration", 0) / 1e6,
+    }
@@ -0,0 +1,338 @@
+"""
+Prometheus Metrics for the Med-GPT RAG Pipeline
+===============================================
+Counters and histograms for queries, cache lookups, retrieval and
+generation latency, timeouts, fallbacks and answer confidence, exported
+in the Prometheus text format on a local HTTP endpoint.
+
+Updates on the hot path take no lock: every thread writes to its own
+shard of each metric, and shards are only summed when /metrics is
+scraped.
+
+Usage:
+    from pipeline_metrics import QUERIES, start_metrics_server
+    QUERIES.inc(model="phi", outcome="answered")
+    start_metrics_server()  # http://127.0.0.1:8601/metrics
+"""
+
+import bisect
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# ===============================
+# CONFIGURATION
+# ===============================
+
+METRICS_HOST = os.environ.get("MEDGPT_METRICS_HOST", "127.0.0.1")
+# Set MEDGPT_METRICS_PORT to 0 to disable the endpoint
+METRICS_PORT = int(os.environ.get("MEDGPT_METRICS_PORT", "8601"))
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 45, 90)
+CONFIDENCE_BUCKETS = (10, 20, 30, 40, 50, 60, 70, 80, 90, 100)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# ===============================
+# THREAD-SHARDED STORAGE
+# ===============================
+
+
+class _Shards:
+    """
+    One dict per writing thread. A thread only ever mutates its own
+    shard, so increments need no lock; the lock is taken once per thread
+    (to register its shard) and on collection.
+
+    Args:
+        merge: merge(total, key, value) folding one shard value in
+    """
+
+    def __init__(self, merge):
+        self._merge = merge
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._live = []  # (thread, shard)
+        self._retired = {}  # folded shards of threads that have exited
+
+    def get(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                # Fold here as well as on collection, so the list stays
+                # bounded even when nothing scrapes /metrics
+                self._fold_dead()
+                self._live.append((threading.current_thread(), shard))
+        return shard
+
+    def _fold_dead(self):
+        # Streamlit runs each rerun on a new thread; fold the shards of
+        # finished threads so the list does not grow without bound
+        live = []
+        for thread, shard in self._live:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                for key, value in shard.copy().items():
+                    self._merge(self._retired, key, value)
+        self._live = live
+
+    def collect(self):
+        """Merge every shard into one dict."""
+        with self._lock:
+            self._fold_dead()
+
+            total = {}
+            for key, value in self._retired.items():
+                self._merge(total, key, value)
+            for _, shard in self._live:
+                for key, value in shard.copy().items():
+                    self._merge(total, key, value)
+        return total
+
+
+# ===============================
+# METRIC TYPES
+# ===============================
+
+
+def _label_key(labelnames, labels):
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {sorted(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key)) + list(extra or [])
+    if not pairs:
+        return ""
+    escaped = (
+        name
+        + '="'
+        + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        + '"'
+        for name, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _merge_count(total, key, value):
+    total[key] = total.get(key, 0) + value
+
+
+def _merge_cell(total, key, cell):
+    counts, value_sum, count = cell[0][:], cell[1], cell[2]
+    if key in total:
+        merged = total[key]
+        counts = [a + b for a, b in zip(merged[0], counts)]
+        value_sum += merged[1]
+        count += merged[2]
+    total[key] = [counts, value_sum, count]
+
+
+def _format_value(value):
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._shards = _Shards(_merge_count)
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        shard = self._shards.get()
+        shard[key] = shard.get(key, 0) + amount
+
+    def values(self):
+        """{label values tuple: total} across all threads."""
+        return self._shards.collect()
+
+    def render(self):
+        lines = []
+        for key, value in sorted(self.values().items()):
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}{labels} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._shards = _Shards(_merge_cell)
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        shard = self._shards.get()
+        cell = shard.get(key)
+        if cell is None:
+            # [per-bucket counts (last is +Inf), sum, count]
+            cell = shard[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        cell[0][bisect.bisect_left(self.buckets, value)] += 1
+        cell[1] += value
+        cell[2] += 1
+
+    def values(self):
+        """{label values tuple: (bucket counts, sum, count)} across all threads."""
+        return self._shards.collect()
+
+    def render(self):
+        lines = []
+        for key, (counts, value_sum, count) in sorted(self.values().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                le = bound if bound == "+Inf" else _format_value(bound)
+                labels = _format_labels(self.labelnames, key, [("le", le)])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(value_sum)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+# ===============================
+# REGISTRY
+# ===============================
+
+
+class MetricsRegistry:
+    """Named metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """All metrics as a Prometheus text exposition document."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Shared registry for every component in this process
+registry = MetricsRegistry()
+
+
+# ===============================
+# PIPELINE METRICS
+# ===============================
+
+QUERIES = registry.counter(
+    "medgpt_queries_total",
+    "RAG queries by answering model and outcome "
+    "(answered, insufficient_context, partial, timeout, error).",
+    ["model", "outcome"],
+)
+CACHE_LOOKUPS = registry.counter(
+    "medgpt_cache_lookups_total",
+    "Cache lookups by cache and result (hit, miss).",
+    ["cache", "result"],
+)
+RETRIEVAL_SECONDS = registry.histogram(
+    "medgpt_retrieval_seconds",
+    "Query embedding plus vector search time.",
+)
+GENERATION_SECONDS = registry.histogram(
+    "medgpt_generation_seconds",
+    "Ollama generation time per answering model.",
+    ["model"],
+)
+TIME_TO_FIRST_TOKEN_SECONDS = registry.histogram(
+    "medgpt_time_to_first_token_seconds",
+    "Query start to first generated token per answering model.",
+    ["model"],
+)
+TIMEOUTS = registry.counter(
+    "medgpt_timeouts_total",
+    "Generations cut short or abandoned because the time budget ran out.",
+    ["model"],
+)
+FALLBACKS = registry.counter(
+    "medgpt_fallbacks_total",
+    "Fallback answers by reason (insufficient_context, model_fallback).",
+    ["reason"],
+)
+CONFIDENCE = registry.histogram(
+    "medgpt_answer_confidence",
+    "Answer confidence score (0-100).",
+    buckets=CONFIDENCE_BUCKETS,
+)
+
+
+# ===============================
+# HTTP ENDPOINT
+# ===============================
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        data = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    """
+    Serve /metrics on a daemon thread.
+
+    Returns:
+        ThreadingHTTPServer or None: None if disabled or the port is taken
+    """
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        print(f"Error starting metrics endpoint on {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name="medgpt-metrics-http", daemon=True
+    ).start()
+    return server
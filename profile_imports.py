@@ -0,0 +1,134 @@
+"""
+Import-Time Profile for Med-GPT Entry Points
+============================================
+Measures how long each entry point spends importing modules before it
+can do any work, using CPython's -X importtime in a fresh interpreter.
+
+Only the top-level import statements of each entry point are executed
+(app.py is a Streamlit script and cannot be imported outside Streamlit),
+so the numbers are the import cost alone.
+
+Usage:
+    python profile_imports.py
+    python profile_imports.py app.py --top 15
+"""
+
+import argparse
+import ast
+import subprocess
+import sys
+from pathlib import Path
+
+
+# ===============================
+# CONFIGURATION
+# ===============================
+
+ENTRY_POINTS = [
+    "app.py",
+    "rag_service.py",
+    "evaluate_models.py",
+    "ingest_documents.py",
+]
+
+
+def top_level_imports(path):
+    """Source of the module-level import statements in a file."""
+    source = Path(path).read_text(encoding="utf-8")
+    tree = ast.parse(source)
+    statements = [
+        ast.get_source_segment(source, node)
+        for node in tree.body
+        if isinstance(node, (ast.Import, ast.ImportFrom))
+    ]
+    return "\n".join(statements)
+
+
+def _importtime(code, cwd=None):
+    """Run code under -X importtime; return (process, {module: cumulative ms})."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        cwd=cwd,
+    )
+
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:") :].split("|")
+        # Top-level modules are the ones imported without indentation
+        if not name.startswith(" " * 2) and name.strip():
+            modules[name.strip()] = int(cumulative_us) / 1000
+    return proc, modules
+
+
+def profile_entry_point(path):
+    """
+    Import an entry point's dependencies under -X importtime.
+
+    Returns:
+        dict: total_ms, wall_ms, per-top-level-module cumulative ms, error
+    """
+    code = top_level_imports(path)
+    wrapper = (
+        "import time\n"
+        "_start = time.perf_counter()\n"
+        f"{code}\n"
+        "print(f'WALL_MS={(time.perf_counter() - _start) * 1000:.1f}')\n"
+    )
+
+    # Modules the interpreter imports at startup are not the entry point's
+    _, startup = _importtime("pass")
+    proc, modules = _importtime(wrapper, cwd=Path(path).resolve().parent)
+    modules = {name: ms for name, ms in modules.items() if name not in startup}
+
+    wall_ms = None
+    for line in proc.stdout.splitlines():
+        if line.startswith("WALL_MS="):
+            wall_ms = float(line.split("=", 1)[1])
+
+    error = None
+    if proc.returncode != 0:
+        error = proc.stderr.strip().splitlines()[-1] if proc.stderr else "failed"
+
+    return {
+        "total_ms": sum(modules.values()),
+        "wall_ms": wall_ms,
+        "modules": modules,
+        "error": error,
+    }
+
+
+# ===============================
+# ENTRY POINT
+# ===============================
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time profile of entry points")
+    parser.add_argument("entry_points", nargs="*", default=ENTRY_POINTS)
+    parser.add_argument("--top", type=int, default=10, help="Modules to list")
+    args = parser.parse_args()
+
+    for path in args.entry_points:
+        report = profile_entry_point(path)
+
+        print("=" * 60)
+        print(f"{path}")
+        print("=" * 60)
+        if report["error"]:
+            print(f"⚠️  Import failed: {report['error']}")
+        if report["wall_ms"] is not None:
+            print(f"Wall time: {report['wall_ms']:.1f} ms")
+        print(f"Cumulative top-level import time: {report['total_ms']:.1f} ms")
+
+        heaviest = sorted(report["modules"].items(), key=lambda x: -x[1])
+        for name, ms in heaviest[: args.top]:
+            print(f"  {ms:9.1f} ms  {name}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+On-Demand Profiling for Med-GPT
+===============================
+Profiles a sampled fraction of RAG queries, or a whole ingestion run,
+without code changes. Each profiled run writes to the profiles directory:
+
+    <name>-<timestamp>.prof            cProfile stats (pstats / snakeviz)
+    <name>-<timestamp>.collapsed       sampled stacks, one "a;b;c count"
+                                       line each (flamegraph.pl, speedscope)
+    <name>-<timestamp>.tracemalloc.txt top allocation sites
+    <name>-<timestamp>.snapshot        tracemalloc snapshot (Snapshot.load)
+
+Enable with environment variables:
+    MEDGPT_PROFILE=query             profile sampled queries
+    MEDGPT_PROFILE=ingest            profile ingestion runs
+    MEDGPT_PROFILE=query,ingest      both
+    MEDGPT_PROFILE_SAMPLE=0.05       fraction of queries profiled (default 0.1)
+    MEDGPT_PROFILE_DIR=profiles      output directory
+
+or run `python ingest_documents.py --profile`. When profiling is off,
+maybe_profile() costs one set lookup.
+
+A sampled query writes up to two profiles, each covering only work done
+by the pipeline itself:
+    query-retrieve-*    query embedding and vector search, on the
+                        caller's thread
+    query-generate-*    the upstream Ollama stream, on the singleflight
+                        thread that produces the tokens (mostly socket
+                        waits); token rendering in the UI is not included
+The two are sampled independently.
+"""
+
+import cProfile
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+
+
+# ===============================
+# CONFIGURATION
+# ===============================
+
+PROFILE_TARGETS = {
+    target.strip()
+    for target in os.environ.get("MEDGPT_PROFILE", "").split(",")
+    if target.strip()
+}
+PROFILE_SAMPLE = float(os.environ.get("MEDGPT_PROFILE_SAMPLE", "0.1"))
+PROFILE_DIR = Path(os.environ.get("MEDGPT_PROFILE_DIR", "profiles"))
+
+# Stack sampling interval for the collapsed-stack file
+SAMPLE_INTERVAL = 0.005
+
+# Frames kept per tracemalloc allocation and sites listed in the report
+TRACEMALLOC_FRAMES = 10
+TOP_ALLOCATIONS = 25
+
+# cProfile allows one active profiler per process; concurrent queries
+# that win the sampling draw are simply not profiled
+_active = threading.Lock()
+
+
+# ===============================
+# STACK SAMPLER
+# ===============================
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a background thread."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="medgpt-stack-sampler", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+# ===============================
+# PROFILED RUNS
+# ===============================
+
+
+@contextmanager
+def profile_run(name, output_dir=None):
+    """
+    Profile the enclosed block on the current thread.
+
+    Yields:
+        dict: Filled with the output paths when the block exits; empty if
+              another profile was already running
+    """
+    outputs = {}
+    if not _active.acquire(blocking=False):
+        yield outputs
+        return
+
+    output_dir = Path(output_dir or PROFILE_DIR)
+    stem = f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+
+    started_tracemalloc = not tracemalloc.is_tracing()
+    if started_tracemalloc:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    before = tracemalloc.take_snapshot()
+
+    sampler = StackSampler(threading.get_ident()).start()
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield outputs
+    finally:
+        profiler.disable()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        sampler.stop()
+        after = tracemalloc.take_snapshot()
+        if started_tracemalloc:
+            tracemalloc.stop()
+        try:
+            outputs.update(
+                _write_outputs(output_dir, stem, profiler, sampler, before, after)
+            )
+            print(f"Profiled {name} ({elapsed_ms:.0f} ms) -> {output_dir / stem}.*")
+        except OSError as e:
+            print(f"Error writing profile {stem}: {e}")
+        finally:
+            _active.release()
+
+
+def _write_outputs(output_dir, stem, profiler, sampler, before, after):
+    output_dir.mkdir(parents=True, exist_ok=True)
+    paths = {
+        "prof": output_dir / f"{stem}.prof",
+        "collapsed": output_dir / f"{stem}.collapsed",
+        "tracemalloc": output_dir / f"{stem}.tracemalloc.txt",
+        "snapshot": output_dir / f"{stem}.snapshot",
+    }
+
+    profiler.dump_stats(paths["prof"])
+    sampler.write(paths["collapsed"])
+    after.dump(str(paths["snapshot"]))
+
+    with open(paths["tracemalloc"], "w", encoding="utf-8") as f:
+        f.write("Allocation growth during the profiled run\n")
+        for stat in after.compare_to(before, "lineno")[:TOP_ALLOCATIONS]:
+            f.write(f"{stat}\n")
+        f.write("\nLargest live allocations at the end of the run\n")
+        for stat in after.statistics("lineno")[:TOP_ALLOCATIONS]:
+            f.write(f"{stat}\n")
+
+    return {kind: str(path) for kind, path in paths.items()}
+
+
+def maybe_profile(target, name=None):
+    """
+    profile_run() if profiling is enabled for this target and the run is
+    sampled (ingest runs are always sampled); otherwise a no-op context.
+    """
+    if target not in PROFILE_TARGETS:
+        return nullcontext({})
+    if target == "query" and random.random() >= PROFILE_SAMPLE:
+        return nullcontext({})
+    return profile_run(name or target)
@@ -0,0 +1,457 @@
+"""
+Headless RAG Query Service for Med-GPT
+======================================
+Standalone local HTTP service wrapping enhanced_rag_query() and the
+answer metrics, so other internal tools can query the RAG pipeline and
+it can be scaled separately from the Streamlit UI.
+
+One embedding model and ChromaDB collection are shared by every request.
+Queries run on a bounded worker pool; requests beyond the pool wait in a
+bounded queue and are turned away with 503 once the queue is full.
+
+Endpoints:
+    GET  /healthz   process is up
+    GET  /readyz    model and collection loaded (503 until then)
+    GET  /catalog   corpus catalog (documents, chunks, version)
+    GET  /stats     worker pool, Ollama queue, connection, memory and span
+                    latency counters
+    GET  /metrics   Prometheus text-format pipeline metrics
+    POST /query     {"query", "ollama_model", "top_k", "similarity_threshold",
+                     "budget_s", "priority", "metrics"} -> RAG result dict
+    POST /score     {"question", "answer", "retrieved_chunks"} -> metrics
+
+Interactive queries without a budget_s get DEFAULT_QUERY_BUDGET; compare
+and batch queries without one generate a full, fixed-length answer.
+
+Usage:
+    python rag_service.py --port 8600 --workers 4
+
+    # Streamlit as a thin client
+    MEDGPT_SERVICE_URL=http://localhost:8600 streamlit run app.py
+"""
+
+import argparse
+import json
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ingest_documents import enhanced_rag_query
+from rag_warmup import RagWarmup
+from ui_metrics import compute_all_metrics
+from deadline import Deadline, DEFAULT_QUERY_BUDGET
+from generation_scheduler import PRIORITY_RANK, PRIORITY_INTERACTIVE
+from generation_scheduler import get_scheduler_stats
+import ollama_client
+from ollama_client import configure_session, get_client_stats
+from corpus_catalog import catalog_from_collection, load_catalog
+from pipeline_metrics import CONTENT_TYPE, registry
+from memory_guard import memory_guard
+from tracing import get_span_stats
+
+
+# ===============================
+# CONFIGURATION
+# ===============================
+
+SERVICE_HOST = os.environ.get("MEDGPT_SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.environ.get("MEDGPT_SERVICE_PORT", "8600"))
+SERVICE_WORKERS = int(os.environ.get("MEDGPT_SERVICE_WORKERS", "4"))
+SERVICE_QUEUE = int(os.environ.get("MEDGPT_SERVICE_QUEUE", "32"))
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+# Extra seconds a handler waits beyond the query budget before giving up
+RESPONSE_GRACE = 10
+
+# Seconds a handler waits for a query that has no time budget
+UNBUDGETED_TIMEOUT = 300
+
+# Seconds a handler waits for a /score request
+SCORE_TIMEOUT = RESPONSE_GRACE * 6
+
+
+def query_timeout(budget_s, priority):
+    """
+    Seconds a /query handler waits for its result.
+
+    Interactive queries without a budget get DEFAULT_QUERY_BUDGET; compare
+    and batch queries without one run unbudgeted.
+    """
+    if budget_s is None and priority == PRIORITY_INTERACTIVE:
+        budget_s = DEFAULT_QUERY_BUDGET
+    if budget_s is None:
+        return UNBUDGETED_TIMEOUT
+    return budget_s + RESPONSE_GRACE
+
+
+# ===============================
+# REQUEST VALIDATION
+# ===============================
+
+
+def _number(request, field, convert, default, minimum=None):
+    value = request.get(field)
+    if value is None:
+        return default
+    try:
+        number = convert(value)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"'{field}' must be a number") from None
+    if isinstance(value, bool) or not math.isfinite(number):
+        raise ValueError(f"'{field}' must be a number")
+    if minimum is not None and number < minimum:
+        raise ValueError(f"'{field}' must be at least {minimum}")
+    return number
+
+
+def parse_query_request(request):
+    """
+    Validate a /query body and coerce its fields.
+
+    Returns:
+        dict: query, ollama_model, top_k, similarity_threshold, budget_s
+              (None when not given), priority and metrics
+
+    Raises:
+        ValueError: With a client-facing message if the body is invalid
+    """
+    if not isinstance(request, dict):
+        raise ValueError("request body must be a JSON object")
+    query = request.get("query")
+    if not isinstance(query, str) or not query.strip():
+        raise ValueError("'query' is required")
+    ollama_model = request.get("ollama_model", "phi")
+    if not isinstance(ollama_model, str) or not ollama_model:
+        raise ValueError("'ollama_model' must be a model name")
+    priority = request.get("priority", PRIORITY_INTERACTIVE)
+    if priority not in PRIORITY_RANK:
+        raise ValueError(f"unknown priority: {priority}")
+    metrics = request.get("metrics", True)
+    if not isinstance(metrics, bool):
+        raise ValueError("'metrics' must be true or false")
+
+    return {
+        "query": query,
+        "ollama_model": ollama_model,
+        "top_k": _number(request, "top_k", int, 7, minimum=1),
+        "similarity_threshold": _number(request, "similarity_threshold", float, 0.05),
+        "budget_s": _number(request, "budget_s", float, None, minimum=0),
+        "priority": priority,
+        "metrics": metrics,
+    }
+
+
+def parse_score_request(request):
+    """
+    Validate a /score body.
+
+    Raises:
+        ValueError: With a client-facing message if the body is invalid
+    """
+    if not isinstance(request, dict):
+        raise ValueError("request body must be a JSON object")
+    for field in ("question", "answer"):
+        if not isinstance(request.get(field, ""), str):
+            raise ValueError(f"'{field}' must be a string")
+    chunks = request.get("retrieved_chunks", [])
+    if not isinstance(chunks, list) or not all(isinstance(c, dict) for c in chunks):
+        raise ValueError("'retrieved_chunks' must be a list of chunk objects")
+    return {
+        "question": request.get("question", ""),
+        "answer": request.get("answer", ""),
+        "retrieved_chunks": chunks,
+    }
+
+
+# ===============================
+# SERVICE STATE
+# ===============================
+
+
+class RagService:
+    """
+    Shared model, collection and worker pool behind the HTTP handlers.
+    """
+
+    def __init__(self, workers=SERVICE_WORKERS, queue_size=SERVICE_QUEUE):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="medgpt-service"
+        )
+        # Admits requests running plus waiting; anything beyond gets 503
+        self._admission = threading.BoundedSemaphore(workers + queue_size)
+
+        self.model = None
+        self.collection = None
+        self.ready = False
+        self.load_error = None
+        self.warmup = RagWarmup(EMBEDDING_MODEL)
+
+        self._lock = threading.Lock()
+        self._stats = {"in_flight": 0, "completed": 0, "rejected": 0, "failed": 0}
+
+    def load(self):
+        """
+        Load the embedding model, open the collection and run one dummy
+        query (blocking). /readyz reports ready only after all three.
+        """
+        if self.warmup.start().wait():
+            self.model = self.warmup.model
+            self.collection = self.warmup.collection
+            self.ready = True
+            print(
+                f"✅ RAG service ready in "
+                f"{self.warmup.status()['elapsed_ms'] / 1000:.1f}s"
+            )
+        else:
+            self.load_error = self.warmup.error
+            print(f"❌ RAG service failed to load: {self.load_error}")
+
+    def submit(self, fn, *args, timeout=None):
+        """
+        Run fn on the worker pool and wait for its result.
+
+        Returns:
+            tuple: (result, None) or (None, (status, error_message))
+        """
+        if not self._admission.acquire(blocking=False):
+            with self._lock:
+                self._stats["rejected"] += 1
+            return None, (503, "service busy, request queue is full")
+
+        with self._lock:
+            self._stats["in_flight"] += 1
+
+        # The admission slot is held until the work itself finishes, even
+        # if this handler stops waiting for it
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(self._finished)
+
+        try:
+            result = future.result(timeout=timeout)
+        except FutureTimeout:
+            with self._lock:
+                self._stats["failed"] += 1
+            return None, (504, "query did not finish in time")
+        except Exception as e:
+            with self._lock:
+                self._stats["failed"] += 1
+            return None, (500, f"query failed: {e}")
+
+        with self._lock:
+            self._stats["completed"] += 1
+        return result, None
+
+    def _finished(self, future):
+        with self._lock:
+            self._stats["in_flight"] -= 1
+        self._admission.release()
+
+    def query(self, request):
+        """Answer a parse_query_request() body."""
+        budget_s = request["budget_s"]
+        deadline = Deadline(budget_s) if budget_s is not None else None
+        memory_guard.check("query")
+        result = enhanced_rag_query(
+            self.collection,
+            request["query"],
+            self.model,
+            top_k=request["top_k"],
+            similarity_threshold=request["similarity_threshold"],
+            ollama_model=request["ollama_model"],
+            deadline=deadline,
+            priority=request["priority"],
+        )
+        if request["metrics"]:
+            result["metrics"] = compute_all_metrics(
+                request["query"],
+                result.get("answer", ""),
+                result.get("retrieved_chunks", []),
+                self.model,
+            )
+        return result
+
+    def score(self, request):
+        """Score a parse_score_request() body."""
+        return compute_all_metrics(
+            request["question"],
+            request["answer"],
+            request["retrieved_chunks"],
+            self.model,
+        )
+
+    def catalog(self):
+        return load_catalog() or catalog_from_collection(self.collection)
+
+    def stats(self):
+        with self._lock:
+            pool = dict(self._stats)
+        pool.update({"workers": self.workers, "queue_size": self.queue_size})
+        return {
+            "pool": pool,
+            "ollama_queue": get_scheduler_stats(),
+            "ollama_connections": get_client_stats(),
+            "memory": memory_guard.stats(),
+            "spans": get_span_stats(),
+        }
+
+
+# ===============================
+# HTTP HANDLER
+# ===============================
+
+
+class RagServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    service = None  # set by make_server()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body, default=float).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status, message):
+        headers = {"Retry-After": "2"} if status == 503 else None
+        self._send_json(status, {"error": message}, headers)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        service = self.service
+
+        if self.path == "/healthz":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/metrics":
+            data = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        elif self.path == "/readyz":
+            warmup = service.warmup.status()
+            if service.ready:
+                self._send_json(200, {"status": "ready", "warmup": warmup})
+            else:
+                self._send_json(
+                    503,
+                    {
+                        "status": "loading",
+                        "error": service.load_error,
+                        "warmup": warmup,
+                    },
+                )
+        elif not service.ready:
+            self._send_error(503, "service is still loading")
+        elif self.path == "/catalog":
+            self._send_json(200, service.catalog())
+        elif self.path == "/stats":
+            self._send_json(200, service.stats())
+        else:
+            self._send_error(404, "not found")
+
+    def do_POST(self):
+        service = self.service
+
+        try:
+            request = self._read_json()
+        except ValueError:
+            # Also covers a bad Content-Length and undecodable bytes
+            self._send_error(400, "invalid JSON")
+            return
+
+        if self.path not in ("/query", "/score"):
+            self._send_error(404, "not found")
+            return
+
+        if not service.ready:
+            self._send_error(503, "service is still loading")
+            return
+
+        try:
+            if self.path == "/query":
+                request = parse_query_request(request)
+            else:
+                request = parse_score_request(request)
+        except ValueError as e:
+            self._send_error(400, str(e))
+            return
+
+        if self.path == "/query":
+            timeout = query_timeout(request["budget_s"], request["priority"])
+            result, error = service.submit(service.query, request, timeout=timeout)
+        else:
+            result, error = service.submit(
+                service.score, request, timeout=SCORE_TIMEOUT
+            )
+
+        if error:
+            self._send_error(*error)
+        else:
+            self._send_json(200, result)
+
+
+def make_server(host=SERVICE_HOST, port=SERVICE_PORT, service=None):
+    """
+    Build the HTTP server (not yet serving) around a RagService.
+
+    Returns:
+        ThreadingHTTPServer: call serve_forever() or run it on a thread
+    """
+    handler = type(
+        "ConfiguredRagServiceHandler",
+        (RagServiceHandler,),
+        {"service": service or RagService()},
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+# ===============================
+# ENTRY POINT
+# ===============================
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Med-GPT headless RAG service")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS)
+    parser.add_argument("--queue-size", type=int, default=SERVICE_QUEUE)
+    args = parser.parse_args()
+
+    # Every worker may hold an Ollama connection at the same time
+    if args.workers > ollama_client.POOL_SIZE:
+        configure_session(pool_size=args.workers)
+
+    service = RagService(workers=args.workers, queue_size=args.queue_size)
+    server = make_server(args.host, args.port, service)
+
+    # Serve /healthz and /readyz while the model loads
+    threading.Thread(target=service.load, daemon=True).start()
+
+    print(f"🩺 Med-GPT RAG service on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopped.")
+
+
+if __name__ == "__main__":
+    main()
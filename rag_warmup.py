@@ -0,0 +1,122 @@
+"""
+RAG Readiness Warm-Up for Med-GPT
+=================================
+Loads the embedding model, opens the ChromaDB collection and runs one
+dummy retrieval on a background thread, so the UI (or the RAG service)
+can start serving immediately and report when the first real query
+will be fast.
+
+Heavy libraries (sentence_transformers, chromadb) are only imported on
+this thread, keeping them off the critical path of page rendering.
+"""
+
+import threading
+import time
+
+
+# ===============================
+# CONFIGURATION
+# ===============================
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+WARMUP_QUERY = "What is the recommended treatment for severe malaria?"
+
+STATE_LOADING = "loading"
+STATE_READY = "ready"
+STATE_ERROR = "error"
+
+
+# ===============================
+# WARM-UP
+# ===============================
+
+
+class RagWarmup:
+    """
+    Background loader for the embedding model and collection.
+
+    Usage:
+        warmup = RagWarmup().start()
+        if warmup.wait(timeout=0):
+            model, collection = warmup.model, warmup.collection
+    """
+
+    def __init__(self, embedding_model=EMBEDDING_MODEL):
+        self.embedding_model = embedding_model
+        self.model = None
+        self.collection = None
+        self.state = STATE_LOADING
+        self.error = None
+        self.stages = {}  # stage -> milliseconds
+        self._ready = threading.Event()
+        self._thread = None
+        self._started_at = None
+
+    def start(self):
+        """Start loading on a daemon thread (idempotent)."""
+        if self._thread is None:
+            self._started_at = time.perf_counter()
+            self._thread = threading.Thread(
+                target=self._run, name="medgpt-rag-warmup", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def _stage(self, name, fn):
+        start = time.perf_counter()
+        result = fn()
+        self.stages[name] = (time.perf_counter() - start) * 1000
+        return result
+
+    def _run(self):
+        try:
+            from sentence_transformers import SentenceTransformer
+            from ingest_documents import initialize_vector_store
+
+            model = self._stage(
+                "load_model", lambda: SentenceTransformer(self.embedding_model)
+            )
+            _, collection = self._stage("open_collection", initialize_vector_store)
+
+            # One dummy query pays for lazy initialisation (tokenizer,
+            # HNSW index load) before a user is waiting on it
+            embedding = self._stage(
+                "encode", lambda: model.encode([WARMUP_QUERY])[0].tolist()
+            )
+            if collection.count():
+                self._stage(
+                    "query",
+                    lambda: collection.query(query_embeddings=[embedding], n_results=1),
+                )
+
+            self.model, self.collection = model, collection
+            self.state = STATE_READY
+        except Exception as e:
+            self.error = str(e)
+            self.state = STATE_ERROR
+            print(f"Error warming up RAG components: {e}")
+        finally:
+            self.stages["total"] = (time.perf_counter() - self._started_at) * 1000
+            self._ready.set()
+
+    def ready(self):
+        return self.state == STATE_READY
+
+    def wait(self, timeout=None):
+        """Block until warm-up finishes; True if it succeeded."""
+        self._ready.wait(timeout)
+        return self.ready()
+
+    def status(self):
+        """State, error and per-stage timings in milliseconds."""
+        elapsed = (
+            (time.perf_counter() - self._started_at) * 1000
+            if self._started_at is not None
+            else 0.0
+        )
+        return {
+            "state": self.state,
+            "error": self.error,
+            "elapsed_ms": self.stages.get("total", elapsed),
+            "stages": dict(self.stages),
+        }
@@ -0,0 +1,123 @@
+"""
+RAG Service Client for Med-GPT
+==============================
+Thin HTTP client for rag_service.py. When MEDGPT_SERVICE_URL is set the
+Streamlit app sends queries and scoring here instead of loading the
+embedding model and collection itself.
+"""
+
+import os
+
+import requests
+
+from rag_service import SCORE_TIMEOUT, query_timeout
+
+
+# ===============================
+# CONFIGURATION
+# ===============================
+
+SERVICE_URL = os.environ.get("MEDGPT_SERVICE_URL", "").rstrip("/")
+
+CONNECT_TIMEOUT = 3.05
+
+# Seconds allowed on top of the service's own timeout for the response
+# to make it back, so the service always answers (or 504s) first
+RESPONSE_MARGIN = 5
+
+_session = requests.Session()
+
+
+def service_enabled():
+    return bool(SERVICE_URL)
+
+
+def _get(path, timeout=10):
+    response = _session.get(f"{SERVICE_URL}{path}", timeout=(CONNECT_TIMEOUT, timeout))
+    response.raise_for_status()
+    return response.json()
+
+
+def _post(path, payload, timeout):
+    response = _session.post(
+        f"{SERVICE_URL}{path}", json=payload, timeout=(CONNECT_TIMEOUT, timeout)
+    )
+    if response.status_code >= 400:
+        try:
+            message = response.json().get("error", response.reason)
+        except ValueError:
+            message = response.reason
+        raise RuntimeError(f"RAG service error {response.status_code}: {message}")
+    return response.json()
+
+
+# ===============================
+# API
+# ===============================
+
+
+def is_ready():
+    """Whether the service has loaded its model and collection."""
+    try:
+        _get("/readyz", timeout=2)
+        return True
+    except requests.exceptions.RequestException:
+        return False
+
+
+def remote_rag_query(
+    query,
+    ollama_model="phi",
+    top_k=7,
+    similarity_threshold=0.05,
+    budget_s=None,
+    priority="interactive",
+    metrics=True,
+):
+    """
+    Run enhanced_rag_query() on the service.
+
+    Returns:
+        dict: Same keys as enhanced_rag_query(), plus "metrics" when requested
+
+    Raises:
+        RuntimeError: If the service rejects or fails the request
+    """
+    payload = {
+        "query": query,
+        "ollama_model": ollama_model,
+        "top_k": top_k,
+        "similarity_threshold": similarity_threshold,
+        "priority": priority,
+        "metrics": metrics,
+    }
+    if budget_s is not None:
+        payload["budget_s"] = budget_s
+
+    timeout = query_timeout(budget_s, priority) + RESPONSE_MARGIN
+    return _post("/query", payload, timeout)
+
+
+def remote_score(question, answer, retrieved_chunks):
+    """Relevance, faithfulness and coverage computed by the service."""
+    return _post(
+        "/score",
+        {"question": question, "answer": answer, "retrieved_chunks": retrieved_chunks},
+        timeout=SCORE_TIMEOUT + RESPONSE_MARGIN,
+    )
+
+
+def remote_catalog():
+    """Corpus catalog reported by the service."""
+    return _get("/catalog")
+
+
+def remote_rag_query_stream(query, deadline=None, **kwargs):
+    """
+    remote_rag_query() shaped like enhanced_rag_query_stream() events.
+    The service answers in one response, so only the result event is
+    yielded.
+    """
+    budget_s = deadline.remaining() if deadline is not None else None
+    result = remote_rag_query(query, budget_s=budget_s, **kwargs)
+    yield {"type": "result", "result": result}
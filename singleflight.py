@@ -0,0 +1,175 @@
+"""
+Request Coalescing for Med-GPT
+==============================
+Single-flight layer in front of the Ollama client. Identical
+(model, prompt, options) generations that are already in flight share one
+upstream request, and the result (or token stream) is fanned out to every
+waiter.
+"""
+
+import hashlib
+import json
+import threading
+
+
+def make_key(model, prompt, options=None, ollama_url=None):
+    """Content key identifying a generation request."""
+    raw = json.dumps([model, prompt, options or {}, ollama_url], sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    """One upstream generation and the state shared with its waiters."""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.tokens = []
+        self.result = None
+        self.error = None
+        self.done = False
+        self.info = {}
+        self.waiters = 1
+
+
+class SingleFlight:
+    """
+    Deduplicate concurrent identical calls.
+
+    Usage:
+        flights = SingleFlight()
+        text = flights.do(key, lambda: call_upstream())
+
+        for token in flights.stream(key, lambda info: stream_upstream(info)):
+            ...
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._streams = {}
+        self._stats = {"leaders": 0, "coalesced": 0}
+
+    # ------------------------------------------------------------------
+    # Blocking calls
+    # ------------------------------------------------------------------
+    def do(self, key, fn):
+        """
+        Run fn() once per key at a time.
+        Callers arriving while it runs wait for and share its result.
+        """
+        with self._lock:
+            flight = self._calls.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._calls[key] = _Flight()
+                self._stats["leaders"] += 1
+            else:
+                flight.waiters += 1
+                self._stats["coalesced"] += 1
+
+        if leader:
+            try:
+                flight.result = fn()
+            except Exception as e:
+                flight.error = e
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                with flight.cond:
+                    flight.done = True
+                    flight.cond.notify_all()
+        else:
+            with flight.cond:
+                flight.cond.wait_for(lambda: flight.done)
+
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    # ------------------------------------------------------------------
+    # Streaming calls
+    # ------------------------------------------------------------------
+    def stream(self, key, factory, info=None):
+        """
+        Share one token stream per key.
+
+        The upstream generator factory(flight_info) runs on a background
+        thread so it completes even if the first subscriber stops early.
+        Every subscriber, including the first, replays the tokens
+        produced so far and then follows the live stream.
+
+        Args:
+            key: Content key for the request
+            factory: Callable taking an info dict and returning a token
+                     generator
+            info: Optional dict updated with the upstream info when the
+                  stream ends, plus coalesced=True for followers
+        """
+        with self._lock:
+            flight = self._streams.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._streams[key] = _Flight()
+                self._stats["leaders"] += 1
+            else:
+                flight.waiters += 1
+                self._stats["coalesced"] += 1
+
+        if leader:
+            threading.Thread(
+                target=self._run_stream,
+                args=(key, flight, factory),
+                name="singleflight-stream",
+                daemon=True,
+            ).start()
+
+        index = 0
+        while True:
+            with flight.cond:
+                flight.cond.wait_for(lambda: flight.done or len(flight.tokens) > index)
+                pending = flight.tokens[index:]
+                finished = flight.done
+            index += len(pending)
+
+            for token in pending:
+                yield token
+
+            if finished and index >= len(flight.tokens):
+                break
+
+        if info is not None:
+            info.update(flight.info)
+            info["coalesced"] = not leader
+        if flight.error is not None:
+            raise flight.error
+
+    def _run_stream(self, key, flight, factory):
+        try:
+            for token in factory(flight.info):
+                with flight.cond:
+                    flight.tokens.append(token)
+                    flight.cond.notify_all()
+        except Exception as e:
+            flight.error = e
+        finally:
+            with self._lock:
+                self._streams.pop(key, None)
+            with flight.cond:
+                flight.done = True
+                flight.cond.notify_all()
+
+    def stats(self):
+        """Counters for leaders (upstream calls) and coalesced waiters."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls) + len(self._streams)
+        return stats
+
+
+# Shared instance for Ollama generations
+generation_flights = SingleFlight()
+
+
+def get_coalescing_stats():
+    """Coalescing counters for Ollama generations in this process."""
+    return generation_flights.stats()
@@ -0,0 +1,59 @@
+"""
+Shared fixtures for the Med-GPT tests.
+Tests run offline against mock_ollama.py; no real Ollama, embedding model
+or ChromaDB store is needed.
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Keep the host-wide generation slots of a running Med-GPT out of the tests
+os.environ["MEDGPT_SLOT_DIR"] = tempfile.mkdtemp(prefix="medgpt-test-slots-")
+
+import mock_ollama  # noqa: E402
+
+
+class StubEncoder:
+    """Deterministic bag-of-words encoder standing in for SentenceTransformer."""
+
+    dims = 16
+
+    def encode(self, texts):
+        vectors = np.zeros((len(texts), self.dims))
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                bucket = hashlib.sha256(word.encode("utf-8")).digest()[0]
+                vectors[row, bucket % self.dims] += 1.0
+        return vectors
+
+
+@pytest.fixture
+def stub_encoder():
+    return StubEncoder()
+
+
+@pytest.fixture
+def mock_server():
+    """Start a fast mock Ollama; yields a function taking config overrides."""
+    servers = []
+
+    def start(**config):
+        merged = {"token_rate": 500.0, "ttft": 0.01, "load_time": 0.0, "jitter": 0.0}
+        merged.update(config)
+        server, url = mock_ollama.start_background_server(config=merged, seed=0)
+        servers.append(server)
+        return url
+
+    yield start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
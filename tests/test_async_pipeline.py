@@ -0,0 +1,174 @@
+import asyncio
+import time
+
+import pytest
+
+import async_pipeline
+import deadline as deadline_module
+import ingest_documents
+from async_pipeline import (
+    acquire_slot,
+    async_enhanced_rag_query,
+    async_generate_within_deadline,
+    close_async_client,
+    run_rag_queries,
+)
+from deadline import Deadline
+from generation_scheduler import PRIORITY_RANK, GenerationScheduler
+from mock_ollama import CANNED_ANSWER
+from model_health import MIN_CALLS, HealthTracker
+
+
+class QueryCollection:
+    """Stand-in for collection.query() returning two close chunks."""
+
+    def query(self, query_embeddings, n_results):
+        return {
+            "documents": [["Treat severe malaria with artesunate.", "Use bed nets."]],
+            "metadatas": [
+                [
+                    {"document_name": "who.pdf", "chunk_index": 0},
+                    {"document_name": "who.pdf", "chunk_index": 1},
+                ]
+            ],
+            "distances": [[0.1, 0.2]],
+        }
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(deadline_module, "_decode_rates", {})
+    monkeypatch.setattr(deadline_module, "_prompt_latencies", {})
+    monkeypatch.setattr(
+        async_pipeline, "scheduler", GenerationScheduler(max_concurrency=4)
+    )
+
+
+def _run(coro):
+    async def main():
+        try:
+            return await coro
+        finally:
+            await close_async_client()
+
+    return asyncio.run(main())
+
+
+def test_async_query_returns_the_sync_result(mock_server, stub_encoder):
+    url = mock_server()
+
+    result = _run(
+        async_enhanced_rag_query(
+            QueryCollection(),
+            "How is severe malaria treated?",
+            stub_encoder,
+            deadline=Deadline(30),
+            ollama_url=url,
+        )
+    )
+
+    assert result["answer"] == CANNED_ANSWER
+    assert result["error"] is None and not result["partial"]
+    assert result["answered_by"] == "phi"
+    assert {"encode", "retrieve", "generate"} <= set(result["timings"])
+    assert result["trace_id"]
+    assert async_pipeline.scheduler.stats()["active"] == 0
+
+
+def test_concurrent_queries_overlap_on_one_loop(mock_server, stub_encoder):
+    url = mock_server(ttft=0.4, max_concurrency=8)
+    jobs = [(f"Question {i} about malaria?", "phi") for i in range(4)]
+
+    start = time.perf_counter()
+    results = run_rag_queries(
+        QueryCollection(),
+        stub_encoder,
+        jobs,
+        concurrency=4,
+        deadline=Deadline(30),
+        ollama_url=url,
+    )
+    wall = time.perf_counter() - start
+
+    # Serially the four time-to-first-token waits alone take 1.6s
+    assert wall < 1.2
+    assert [result["answer"] for result in results] == [CANNED_ANSWER] * 4
+    assert len({result["trace_id"] for result in results}) == 4
+
+
+def test_deadline_cuts_the_async_stream_short(mock_server, stub_encoder):
+    url = mock_server(token_rate=20.0)
+
+    result = _run(
+        async_enhanced_rag_query(
+            QueryCollection(),
+            "Severe malaria?",
+            stub_encoder,
+            deadline=Deadline(1.0),
+            ollama_url=url,
+        )
+    )
+
+    assert result["partial"] and result["error"] is None
+    assert CANNED_ANSWER.startswith(result["answer"])
+
+
+def test_open_circuit_fails_instead_of_falling_back(monkeypatch, mock_server):
+    tracker = HealthTracker({"phi": "tinyllama"})
+    for _ in range(MIN_CALLS):
+        tracker.record("phi", ok=False, latency=1.0)
+    monkeypatch.setattr(ingest_documents, "health_tracker", tracker)
+    info = {}
+
+    async def generate():
+        return [
+            token
+            async for token in async_generate_within_deadline(
+                "Q", "phi", None, mock_server(), info, allow_fallback=False
+            )
+        ]
+
+    assert _run(generate()) == []
+    assert "circuit open" in info["error"]
+
+
+def test_rejected_generation_reports_an_error(monkeypatch, mock_server):
+    full = {priority: 0 for priority in PRIORITY_RANK}
+    monkeypatch.setattr(
+        async_pipeline,
+        "scheduler",
+        GenerationScheduler(max_concurrency=1, max_queue_depth=full),
+    )
+    info = {}
+
+    async def generate():
+        return [
+            token
+            async for token in async_generate_within_deadline(
+                "Q", "phi", None, mock_server(), info
+            )
+        ]
+
+    assert _run(generate()) == []
+    assert info["error"].startswith("Error: Ollama is busy")
+
+
+def test_cancelled_waiter_does_not_leak_its_slot():
+    scheduler = async_pipeline.scheduler
+    scheduler.configure(max_concurrency=1)
+    scheduler.acquire()
+
+    async def cancel_waiter():
+        waiter = asyncio.ensure_future(acquire_slot(timeout=5))
+        await asyncio.sleep(0.1)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        # The waiter thread is granted the slot now and must hand it back
+        scheduler.release()
+        await asyncio.sleep(0.2)
+
+    asyncio.run(cancel_waiter())
+
+    assert scheduler.stats()["active"] == 0
+    assert scheduler.acquire(timeout=0.1) < 0.1
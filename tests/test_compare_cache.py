@@ -0,0 +1,35 @@
+import compare_cache as compare_cache_module
+from compare_cache import CompareCache, compare_key
+
+
+def test_key_depends_on_corpus_and_retrieval_settings():
+    key = compare_key("What treats malaria?", "phi", "v1", top_k=7)
+
+    assert key == compare_key(" What treats malaria? ", "phi", "v1", top_k=7)
+    assert key != compare_key("What treats malaria?", "phi", "v2", top_k=7)
+    assert key != compare_key("What treats malaria?", "phi", "v1", top_k=3)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = CompareCache(max_entries=2)
+    cache.put("a", {"answer": "A"})
+    cache.put("b", {"answer": "B"})
+    assert cache.get("a") is not None
+
+    cache.put("c", {"answer": "C"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entries_are_misses(monkeypatch):
+    cache = CompareCache(ttl_seconds=10)
+    now = [1000.0]
+    monkeypatch.setattr(compare_cache_module.time, "time", lambda: now[0])
+    cache.put("a", {"answer": "A"})
+
+    now[0] += 11
+
+    assert cache.get("a") is None
+    assert cache.stats() == {"hits": 0, "misses": 1, "evictions": 0, "entries": 0}
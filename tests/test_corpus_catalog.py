@@ -0,0 +1,149 @@
+import pytest
+
+from corpus_catalog import (
+    catalog_from_collection,
+    corpus_version,
+    document_entry,
+    file_sha256,
+    load_catalog,
+    update_catalog,
+)
+from ingest_documents import index_documents
+
+
+class FakeCollection:
+    name = "medical_docs"
+
+    def __init__(self, metadatas):
+        self.metadatas = metadatas
+
+    def count(self):
+        return len(self.metadatas)
+
+    def get(self, include=None):
+        return {"metadatas": self.metadatas}
+
+
+class StoreCollection:
+    """In-memory stand-in for the ChromaDB calls made by store_embeddings."""
+
+    name = "medical_docs"
+
+    def __init__(self):
+        self.records = {}
+
+    def count(self):
+        return len(self.records)
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        for chunk_id, text, metadata in zip(ids, documents, metadatas):
+            self.records[chunk_id] = (text, metadata)
+
+    def get(self, where=None, include=None):
+        matches = [
+            (chunk_id, metadata)
+            for chunk_id, (_, metadata) in self.records.items()
+            if where is None
+            or all(metadata.get(field) == value for field, value in where.items())
+        ]
+        return {
+            "ids": [chunk_id for chunk_id, _ in matches],
+            "metadatas": [metadata for _, metadata in matches],
+        }
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            del self.records[chunk_id]
+
+
+def _ingest(collection, pdf, texts, persist_directory):
+    chunks = [
+        {
+            "document_name": pdf.name,
+            "chunk_index": index,
+            "chunk_text": text,
+            "embedding_vector": [0.0],
+        }
+        for index, text in enumerate(texts)
+    ]
+    entries = {pdf.name: document_entry(pdf, pages=1, chunks=len(chunks))}
+    return index_documents(
+        collection, chunks, entries, persist_directory=persist_directory
+    )
+
+
+def test_reingesting_a_revised_document_replaces_its_chunks(tmp_path):
+    pdf = tmp_path / "who.pdf"
+    collection = StoreCollection()
+
+    pdf.write_bytes(b"%PDF-1.4 guideline")
+    first = _ingest(collection, pdf, ["old 0", "old 1", "old 2"], tmp_path)
+
+    pdf.write_bytes(b"%PDF-1.4 revised guideline")
+    revised = _ingest(collection, pdf, ["new 0", "new 1"], tmp_path)
+
+    texts = sorted(text for text, _ in collection.records.values())
+    assert texts == ["new 0", "new 1"]
+    assert revised["total_chunks"] == 2
+    assert revised["documents"]["who.pdf"]["sha256"] == file_sha256(pdf)
+    assert revised["version"] != first["version"]
+
+
+def test_catalog_is_unchanged_when_storing_fails(tmp_path):
+    pdf = tmp_path / "who.pdf"
+    collection = StoreCollection()
+    pdf.write_bytes(b"%PDF-1.4 guideline")
+    first = _ingest(collection, pdf, ["old 0"], tmp_path)
+
+    def failing_upsert(**kwargs):
+        raise RuntimeError("disk full")
+
+    collection.upsert = failing_upsert
+    pdf.write_bytes(b"%PDF-1.4 revised guideline")
+    with pytest.raises(RuntimeError):
+        _ingest(collection, pdf, ["new 0"], tmp_path)
+
+    assert load_catalog(tmp_path)["version"] == first["version"]
+
+
+def test_update_catalog_versions_the_corpus(tmp_path):
+    pdf = tmp_path / "who.pdf"
+    pdf.write_bytes(b"%PDF-1.4 guideline")
+    collection = FakeCollection([{"document_name": "who.pdf"}] * 3)
+
+    catalog = update_catalog(
+        {"who.pdf": document_entry(pdf, pages=2, chunks=3)},
+        collection,
+        "all-MiniLM-L6-v2",
+        persist_directory=tmp_path,
+    )
+
+    assert load_catalog(tmp_path)["version"] == catalog["version"]
+    assert catalog["total_chunks"] == 3
+
+    pdf.write_bytes(b"%PDF-1.4 revised guideline")
+    revised = update_catalog(
+        {"who.pdf": document_entry(pdf, pages=2, chunks=3)},
+        collection,
+        "all-MiniLM-L6-v2",
+        persist_directory=tmp_path,
+    )
+    assert revised["version"] != catalog["version"]
+
+
+def test_version_ignores_document_order():
+    a = {"sha256": "1", "chunks": 2}
+    b = {"sha256": "2", "chunks": 5}
+
+    assert corpus_version({"a": a, "b": b}) == corpus_version({"b": b, "a": a})
+
+
+def test_catalog_from_collection_counts_chunks():
+    collection = FakeCollection(
+        [{"document_name": "a.pdf"}, {"document_name": "a.pdf"}, None]
+    )
+
+    catalog = catalog_from_collection(collection)
+
+    assert catalog["documents"] == {"a.pdf": {"chunks": 2}}
+    assert catalog["version"] == "medical_docs:3"
@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+
+import deadline as deadline_module
+from deadline import MIN_PREDICT, Deadline, plan_generation
+from generation_scheduler import PRIORITY_BATCH
+import ingest_documents
+from ingest_documents import GENERATION_OPTIONS, generate_within_deadline
+
+
+@pytest.fixture(autouse=True)
+def fresh_rates(monkeypatch):
+    monkeypatch.setattr(deadline_module, "_decode_rates", {})
+    monkeypatch.setattr(deadline_module, "_prompt_latencies", {})
+
+
+def test_plan_generation_shrinks_to_the_budget():
+    num_predict, read_timeout = plan_generation(Deadline(4), "phi")
+
+    assert num_predict == MIN_PREDICT
+    assert read_timeout <= 4
+
+
+def test_plan_generation_caps_at_max_tokens():
+    deadline_module.record_generation("phi", 1000, 1.0, 0.1)
+
+    num_predict, _ = plan_generation(Deadline(60), "phi", max_tokens=200)
+
+    assert num_predict == 200
+
+
+def test_generation_without_deadline_uses_fixed_options(mock_server):
+    url = mock_server()
+    info = {}
+
+    answer = "".join(
+        generate_within_deadline(
+            "What treats malaria?", "phi", None, url, info, PRIORITY_BATCH
+        )
+    )
+
+    assert info["num_predict"] == GENERATION_OPTIONS["num_predict"]
+    assert not info.get("partial")
+    assert answer and not answer.startswith("Error")
+
+
+def test_generation_with_deadline_is_sized_to_it(mock_server):
+    url = mock_server()
+    info = {}
+
+    list(
+        generate_within_deadline("What treats malaria?", "phi", Deadline(4), url, info)
+    )
+
+    assert info["num_predict"] == MIN_PREDICT
+
+
+def test_coalesced_generation_records_one_rate_sample(mock_server, monkeypatch):
+    url = mock_server(ttft=0.3)
+    samples = []
+    monkeypatch.setattr(
+        ingest_documents, "record_generation", lambda *args: samples.append(args)
+    )
+    infos = [{}, {}]
+
+    def generate(info):
+        list(generate_within_deadline("What treats malaria?", "phi", None, url, info))
+
+    threads = [threading.Thread(target=generate, args=(info,)) for info in infos]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(info["coalesced"] for info in infos) == [False, True]
+    assert len(samples) == 1
@@ -0,0 +1,119 @@
+import pytest
+
+import evaluate_models
+from eval_cache import EvalCache, cache_components, cache_key
+
+OPTIONS = {"ollama": {"num_predict": 384, "temperature": 0.2}, "top_k": 7}
+
+
+def _components(**overrides):
+    args = {
+        "question": "What treats malaria?",
+        "model": "phi",
+        "generation_options": OPTIONS,
+        "prompt_hash": "p1",
+        "corpus_version": "c1",
+    }
+    args.update(overrides)
+    return cache_components(**args)
+
+
+def _result(**overrides):
+    result = {
+        "model": "phi",
+        "question": "What treats malaria?",
+        "answered_by": "phi",
+        "partial": False,
+        "num_predict": 384,
+        "answer": "Artesunate.",
+        "error": False,
+    }
+    result.update(overrides)
+    return result
+
+
+def test_key_ignores_question_whitespace():
+    assert cache_key(_components()) == cache_key(
+        _components(question="  What treats malaria?\n")
+    )
+
+
+@pytest.mark.parametrize(
+    "overrides",
+    [
+        {"question": "What prevents malaria?"},
+        {"model": "tinyllama"},
+        {"generation_options": {**OPTIONS, "ollama": {"num_predict": 128}}},
+        {"prompt_hash": "p2"},
+        {"corpus_version": "c2"},
+    ],
+)
+def test_key_changes_with_every_component(overrides):
+    assert cache_key(_components(**overrides)) != cache_key(_components())
+
+
+def test_put_then_get_round_trip(tmp_path):
+    cache = EvalCache(tmp_path)
+    components = _components()
+
+    assert cache.get(components) is None
+    key = cache.put(components, _result())
+
+    assert cache.get(components)["answer"] == "Artesunate."
+    assert cache.get(_components(corpus_version="c2")) is None
+    assert [entry["key"] for entry in cache.entries()] == [key]
+    assert cache.invalidate(lambda entry: entry["components"]["model"] == "phi") == 1
+    assert cache.get(components) is None
+
+
+def test_unreadable_entry_is_a_miss(tmp_path):
+    cache = EvalCache(tmp_path)
+    components = _components()
+    key = cache.put(components, _result())
+    (tmp_path / key[:2] / f"{key}.json").write_text("{not json")
+
+    assert cache.get(components) is None
+
+
+@pytest.mark.parametrize(
+    "overrides, cacheable",
+    [
+        ({}, True),
+        ({"error": True}, False),
+        ({"partial": True}, False),
+        ({"answered_by": "tinyllama"}, False),
+        ({"num_predict": 96}, False),
+    ],
+)
+def test_only_complete_answers_are_cacheable(overrides, cacheable):
+    assert (
+        evaluate_models.is_cacheable_cell(_result(**overrides), _components())
+        is cacheable
+    )
+
+
+def test_run_cells_caches_only_complete_answers(monkeypatch, tmp_path):
+    cache = EvalCache(tmp_path)
+    monkeypatch.setattr(evaluate_models, "eval_cache", cache)
+    results = {
+        "phi": _result(),
+        "tinyllama": _result(model="tinyllama", answered_by="tinyllama", error=True),
+    }
+    monkeypatch.setattr(
+        evaluate_models,
+        "evaluate_cell",
+        lambda model, question, retrieval, embedding_model: {
+            **results[model],
+            "relevance_score": 0.5,
+            "faithfulness_score": 0.5,
+            "coverage_score": 0.5,
+        },
+    )
+    question = "What treats malaria?"
+    cells = [("phi", question), ("tinyllama", question)]
+    keys = {cell: _components(model=cell[0]) for cell in cells}
+
+    evaluate_models.run_cells(cells, {question: {}}, None, 1, cache_keys=keys)
+
+    assert cache.get(keys[cells[0]]) is not None
+    assert cache.get(keys[cells[1]]) is None
@@ -0,0 +1,168 @@
+import json
+import threading
+import time
+
+import evaluate_models
+import ingest_documents
+from model_health import MIN_CALLS, HealthTracker
+from ui_metrics import compute_all_metrics
+from generation_scheduler import (
+    PRIORITY_BATCH,
+    PRIORITY_RANK,
+    GenerationScheduler,
+    SharedSlots,
+)
+
+
+def _result(model, question, error=False):
+    return {
+        "model": model,
+        "question": question,
+        "answer": "A",
+        "relevance_score": 0.5,
+        "faithfulness_score": 0.5,
+        "coverage_score": 0.5,
+        "error": error,
+    }
+
+
+def test_load_results_log_keeps_last_entry_and_drops_torn_line(tmp_path):
+    log_path = tmp_path / "evaluation_log.jsonl"
+    lines = [
+        json.dumps(_result("phi", "Q1", error=True)),
+        json.dumps(_result("phi", "Q1")),
+        json.dumps(_result("tinyllama", "Q1")),
+    ]
+    log_path.write_text("\n".join(lines) + '\n{"model": "phi", "quest')
+
+    completed = evaluate_models.load_results_log(log_path)
+
+    assert set(completed) == {("phi", "Q1"), ("tinyllama", "Q1")}
+    assert completed[("phi", "Q1")]["error"] is False
+    assert log_path.read_text().endswith("\n")
+
+    evaluate_models.append_result(log_path, _result("phi", "Q2"), threading.Lock())
+    assert ("phi", "Q2") in evaluate_models.load_results_log(log_path)
+
+
+def test_load_results_log_without_a_log(tmp_path):
+    assert evaluate_models.load_results_log(tmp_path / "missing.jsonl") == {}
+
+
+def test_rejected_stream_reports_error_instead_of_tokens(monkeypatch, mock_server):
+    url = mock_server()
+    full = {priority: 0 for priority in PRIORITY_RANK}
+    monkeypatch.setattr(
+        ingest_documents, "scheduler", GenerationScheduler(max_queue_depth=full)
+    )
+    info = {}
+
+    tokens = list(
+        ingest_documents.call_ollama_stream(
+            "What treats malaria?", "phi", url, info=info, priority=PRIORITY_BATCH
+        )
+    )
+
+    assert tokens == []
+    assert info["error"].startswith("Error: Ollama is busy")
+
+
+def test_generation_error_fails_the_cell(monkeypatch):
+    def failing_generation(prompt, model, deadline, info=None, **kwargs):
+        info["error"] = "Error: Ollama is busy, batch request not admitted (full)."
+        return iter(())
+
+    monkeypatch.setattr(
+        ingest_documents, "generate_within_deadline", failing_generation
+    )
+    chunk = {
+        "document_name": "who.pdf",
+        "chunk_index": 0,
+        "text": "t",
+        "similarity": 0.9,
+    }
+    retrieval = {"chunks": [chunk], "retrieval_ms": 1.0, "error": None}
+
+    result = evaluate_models.evaluate_cell("phi", "Q1", retrieval, embedding_model=None)
+
+    assert result["error"] is True
+    assert "Ollama is busy" in result["answer"]
+    assert result["relevance_score"] == 0.0
+
+
+def test_run_cells_overlaps_batch_generations(monkeypatch, tmp_path):
+    # A default process scheduler lets one batch generation through
+    process_scheduler = GenerationScheduler(
+        max_concurrency=2, shared=SharedSlots(tmp_path, 4, reserved=1)
+    )
+    monkeypatch.setattr(evaluate_models, "scheduler", process_scheduler)
+    lock = threading.Lock()
+    in_flight = [0]
+    peak = [0]
+
+    def generating_cell(model, question, retrieval, embedding_model):
+        with process_scheduler.slot(PRIORITY_BATCH):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.2)
+            with lock:
+                in_flight[0] -= 1
+        return _result(model, question)
+
+    monkeypatch.setattr(evaluate_models, "evaluate_cell", generating_cell)
+    cells = [("phi", "Q1"), ("tinyllama", "Q1"), ("gemma:2b", "Q1")]
+
+    results = evaluate_models.run_cells(cells, {"Q1": {}}, None, concurrency=3)
+
+    assert peak[0] == 3
+    assert not any(result["error"] for result in results)
+
+
+def test_open_circuit_fails_the_cell_instead_of_falling_back(monkeypatch):
+    tracker = HealthTracker({"phi": "tinyllama"})
+    for _ in range(MIN_CALLS):
+        tracker.record("phi", ok=False, latency=1.0)
+    monkeypatch.setattr(ingest_documents, "health_tracker", tracker)
+    retrieval = {"chunks": [], "retrieval_ms": 1.0, "error": None}
+
+    result = evaluate_models.evaluate_cell("phi", "Q1", retrieval, embedding_model=None)
+
+    assert result["error"] is True
+    assert "circuit open" in result["answer"]
+
+
+def test_cell_scores_match_the_ui_metrics(monkeypatch, stub_encoder):
+    question = "What is the first-line treatment for severe malaria?"
+    answer = "Severe malaria is treated with intravenous artesunate for 24 hours."
+    chunks = [
+        {
+            "document_name": "who.pdf",
+            "chunk_index": index,
+            "text": text,
+            "similarity": 0.9,
+        }
+        for index, text in enumerate(
+            [
+                "Treat severe malaria with intravenous artesunate for 24 hours.",
+                "Bed nets reduce transmission in endemic areas.",
+            ]
+        )
+    ]
+    monkeypatch.setattr(
+        evaluate_models,
+        "answer_from_chunks",
+        lambda question, chunks, **kwargs: {
+            "answer": answer,
+            "retrieved_chunks": chunks,
+            "error": None,
+        },
+    )
+    retrieval = {"chunks": chunks, "retrieval_ms": 1.0, "error": None}
+
+    result = evaluate_models.evaluate_cell("phi", question, retrieval, stub_encoder)
+    expected = compute_all_metrics(question, answer, chunks, stub_encoder)
+
+    assert result["relevance_score"] == expected["relevance"]
+    assert result["faithfulness_score"] == expected["faithfulness"]
+    assert result["coverage_score"] == expected["coverage"]
@@ -0,0 +1,149 @@
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from generation_scheduler import (
+    PRIORITY_BATCH,
+    PRIORITY_COMPARE,
+    PRIORITY_INTERACTIVE,
+    GenerationScheduler,
+    SchedulerRejected,
+    SharedSlots,
+)
+
+
+def _queue(scheduler, priority, admitted):
+    def run():
+        with scheduler.slot(priority):
+            admitted.append(priority)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def _wait_for_depth(scheduler, priority, depth):
+    for _ in range(500):
+        if scheduler.stats()["classes"][priority]["queue_depth"] == depth:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"{priority} queue never reached {depth}")
+
+
+def test_waiters_are_admitted_by_priority():
+    scheduler = GenerationScheduler(max_concurrency=1, batch_reserved_slots=0)
+    admitted = []
+    scheduler.acquire(PRIORITY_INTERACTIVE)
+
+    threads = []
+    for priority in (PRIORITY_BATCH, PRIORITY_COMPARE, PRIORITY_INTERACTIVE):
+        threads.append(_queue(scheduler, priority, admitted))
+        _wait_for_depth(scheduler, priority, 1)
+    scheduler.release()
+    for thread in threads:
+        thread.join(5)
+
+    assert admitted == [PRIORITY_INTERACTIVE, PRIORITY_COMPARE, PRIORITY_BATCH]
+    assert scheduler.stats()["active"] == 0
+
+
+def test_full_class_queue_is_rejected():
+    scheduler = GenerationScheduler(
+        max_concurrency=1, max_queue_depth={"interactive": 1, "compare": 1, "batch": 0}
+    )
+
+    with pytest.raises(SchedulerRejected, match="queue is full"):
+        scheduler.acquire(PRIORITY_BATCH)
+    assert scheduler.stats()["classes"][PRIORITY_BATCH]["rejected"] == 1
+
+
+def test_wait_beyond_timeout_is_rejected():
+    scheduler = GenerationScheduler(max_concurrency=1)
+    scheduler.acquire(PRIORITY_INTERACTIVE)
+
+    with pytest.raises(SchedulerRejected, match="without a slot"):
+        scheduler.acquire(PRIORITY_COMPARE, timeout=0.05)
+
+    stats = scheduler.stats()
+    assert stats["active"] == 1
+    assert stats["classes"][PRIORITY_COMPARE]["queue_depth"] == 0
+
+
+def test_batch_never_takes_the_reserved_slot():
+    scheduler = GenerationScheduler(max_concurrency=2, batch_reserved_slots=1)
+    assert scheduler.slot_limit(PRIORITY_BATCH) == 1
+    scheduler.acquire(PRIORITY_BATCH)
+
+    with pytest.raises(SchedulerRejected):
+        scheduler.acquire(PRIORITY_BATCH, timeout=0.05)
+    assert scheduler.acquire(PRIORITY_INTERACTIVE, timeout=0.05) < 0.05
+
+
+def test_unknown_priority_is_an_error():
+    with pytest.raises(ValueError):
+        GenerationScheduler().acquire("urgent")
+
+
+def _process_scheduler(slot_dir, count=2):
+    """A scheduler as another Med-GPT process on the same host would build it."""
+    return GenerationScheduler(
+        max_concurrency=count, shared=SharedSlots(slot_dir, count, reserved=1)
+    )
+
+
+def test_shared_slots_bound_generations_across_schedulers(tmp_path):
+    ui = _process_scheduler(tmp_path)
+    service = _process_scheduler(tmp_path)
+    ui.acquire(PRIORITY_INTERACTIVE)
+    service.acquire(PRIORITY_INTERACTIVE)
+
+    with pytest.raises(SchedulerRejected, match="shared slot"):
+        ui.acquire(PRIORITY_INTERACTIVE, timeout=0.1)
+    assert ui.stats()["active"] == 1
+
+    service.release(PRIORITY_INTERACTIVE)
+    assert ui.acquire(PRIORITY_INTERACTIVE, timeout=1) < 1
+
+
+def test_batch_in_another_process_never_takes_the_reserved_slot(tmp_path):
+    evaluation = GenerationScheduler(
+        max_concurrency=4,
+        batch_reserved_slots=0,
+        shared=SharedSlots(tmp_path, 2, reserved=1),
+    )
+    ui = _process_scheduler(tmp_path)
+    evaluation.acquire(PRIORITY_BATCH)
+
+    with pytest.raises(SchedulerRejected):
+        evaluation.acquire(PRIORITY_BATCH, timeout=0.1)
+    assert ui.acquire(PRIORITY_INTERACTIVE, timeout=0.1) < 0.1
+
+
+def test_slot_held_by_another_process_is_freed_when_it_exits(tmp_path):
+    holder = subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            "import sys; from generation_scheduler import SharedSlots; "
+            f"slots = SharedSlots({str(tmp_path)!r}, 1); "
+            "slots.try_acquire('interactive'); print('held', flush=True); "
+            "sys.stdin.read()",
+        ],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+        cwd=str(Path(__file__).resolve().parent.parent),
+    )
+    try:
+        assert holder.stdout.readline().strip() == "held"
+        slots = SharedSlots(tmp_path, 1)
+        assert not slots.try_acquire(PRIORITY_INTERACTIVE)
+    finally:
+        holder.stdin.close()
+        holder.wait(5)
+
+    assert slots.acquire(PRIORITY_INTERACTIVE, timeout=1)
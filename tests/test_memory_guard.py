@@ -0,0 +1,82 @@
+import pytest
+
+import memory_guard as memory_guard_module
+from memory_guard import (
+    LEVEL_HARD,
+    LEVEL_OK,
+    LEVEL_SOFT,
+    MB,
+    MemoryBudgetExceeded,
+    MemoryGuard,
+)
+
+
+@pytest.fixture
+def rss(monkeypatch):
+    current = {"mb": 100}
+    monkeypatch.setattr(memory_guard_module, "rss_bytes", lambda: current["mb"] * MB)
+    monkeypatch.setattr(memory_guard_module, "EVICT_INTERVAL", 0.0)
+    return current
+
+
+def test_no_budget_only_monitors(rss):
+    guard = MemoryGuard(budget_mb=0)
+    rss["mb"] = 10_000
+
+    assert guard.check() == LEVEL_OK
+    assert guard.batch_size(64) == 64
+    guard.admit("ingest")
+
+
+def test_soft_limit_evicts_and_halves_batches(rss):
+    guard = MemoryGuard(budget_mb=1000, soft_limit=0.8, hard_limit=0.95)
+    evicted = []
+    guard.register_evictor("cache", lambda: evicted.append(1))
+    rss["mb"] = 850
+
+    assert guard.batch_size(64) == 32
+    assert guard.level() == LEVEL_SOFT
+    assert evicted
+    guard.admit("ingest")
+
+
+def test_hard_limit_rejects_new_work(rss):
+    guard = MemoryGuard(budget_mb=1000, soft_limit=0.8, hard_limit=0.95)
+    rss["mb"] = 990
+
+    assert guard.level() == LEVEL_HARD
+    assert guard.batch_size(64, minimum=4) == 4
+    with pytest.raises(MemoryBudgetExceeded):
+        guard.admit("ingest")
+    assert guard.stats()["rejected"] == 1
+
+
+def test_eviction_frees_enough_to_admit(rss):
+    guard = MemoryGuard(budget_mb=1000, soft_limit=0.8, hard_limit=0.95)
+    rss["mb"] = 990
+    guard.register_evictor("cache", lambda: rss.update(mb=500))
+
+    guard.admit("ingest")
+    assert guard.level() == LEVEL_OK
+
+
+def test_failing_evictor_does_not_stop_the_others(rss):
+    guard = MemoryGuard(budget_mb=1000)
+    evicted = []
+
+    def broken():
+        raise RuntimeError("boom")
+
+    guard.register_evictor("broken", broken)
+    guard.register_evictor("cache", lambda: evicted.append(1))
+    guard.evict()
+
+    assert evicted == [1]
+
+
+def test_stage_records_rss(rss):
+    guard = MemoryGuard(budget_mb=1000)
+    with guard.stage("embed"):
+        rss["mb"] = 150
+
+    assert guard.stages["embed"]["rss_delta_mb"] == 50
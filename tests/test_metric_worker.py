@@ -0,0 +1,83 @@
+import threading
+
+import pytest
+
+import metric_worker as metric_worker_module
+from metric_worker import MetricWorker
+
+
+@pytest.fixture
+def scoring(monkeypatch):
+    calls = []
+    release = threading.Event()
+
+    def fake_metrics(question, answer, sources, embedding_model):
+        calls.append(answer)
+        release.wait(5)
+        return {"relevance": 0.9, "faithfulness": 0.8, "coverage": 0.7}
+
+    monkeypatch.setattr(metric_worker_module, "compute_all_metrics", fake_metrics)
+    return calls, release
+
+
+def _wait_for(worker, key):
+    for _ in range(500):
+        if worker.result(key) is not None:
+            return worker.result(key)
+        threading.Event().wait(0.01)
+    raise AssertionError("metrics never arrived")
+
+
+def test_pending_until_scored_and_scored_once(scoring):
+    calls, release = scoring
+    worker = MetricWorker(max_workers=1)
+
+    key = worker.submit("Q", "A", [], None)
+    assert worker.submit("Q", "A", [], None) == key
+    assert worker.result(key) is None and worker.pending(key)
+
+    release.set()
+    assert _wait_for(worker, key)["relevance"] == 0.9
+    assert not worker.pending(key)
+    assert calls == ["A"]
+
+
+def test_dropped_result_can_be_resubmitted(scoring):
+    calls, release = scoring
+    release.set()
+    worker = MetricWorker(max_workers=1)
+    key = worker.submit("Q", "A", [], None)
+    _wait_for(worker, key)
+
+    worker.clear()
+    assert worker.result(key) is None and not worker.pending(key)
+
+    assert worker.submit("Q", "A", [], None) == key
+    assert _wait_for(worker, key)["coverage"] == 0.7
+    assert calls == ["A", "A"]
+
+
+def test_oldest_results_are_evicted(scoring):
+    _, release = scoring
+    release.set()
+    worker = MetricWorker(max_workers=1, max_results=1)
+    first = worker.submit("Q", "A1", [], None)
+    _wait_for(worker, first)
+    second = worker.submit("Q", "A2", [], None)
+    _wait_for(worker, second)
+
+    assert worker.result(first) is None
+
+
+def test_thin_client_scores_through_the_service(monkeypatch):
+    remote = {"relevance": 0.5, "faithfulness": 0.4, "coverage": 0.3}
+    monkeypatch.setattr(metric_worker_module, "service_enabled", lambda: True)
+    monkeypatch.setattr(
+        metric_worker_module, "remote_score", lambda question, answer, sources: remote
+    )
+    worker = MetricWorker(max_workers=1)
+
+    metrics = worker.compute("malaria?", "artesunate", [], None)
+
+    assert metrics["relevance"] == 0.5
+    assert metrics["coverage"] == 0.3
@@ -0,0 +1,21 @@
+import ingest_documents
+import mock_ollama
+from generation_scheduler import GenerationScheduler
+
+
+def test_bench_without_scheduler_runs_every_client_at_once(mock_server, monkeypatch):
+    url = mock_server(ttft=0.3, max_concurrency=8)
+    monkeypatch.setattr(
+        ingest_documents, "scheduler", GenerationScheduler(max_concurrency=2)
+    )
+
+    throttled = mock_ollama.run_benchmark(url, num_requests=4, concurrency=4)
+    unthrottled = mock_ollama.run_benchmark(
+        url, num_requests=4, concurrency=4, use_scheduler=False
+    )
+
+    # Two scheduler slots serve four requests in two waves
+    assert throttled["wall_s"] >= 0.6
+    assert unthrottled["wall_s"] < 0.55
+    assert throttled["failures"] == unthrottled["failures"] == 0
+    assert ingest_documents.scheduler.max_concurrency == 2
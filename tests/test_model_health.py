@@ -0,0 +1,80 @@
+import pytest
+
+import model_health
+from model_health import (
+    MIN_CALLS,
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    CircuitOpen,
+    HealthTracker,
+)
+
+
+def _trip(tracker, model="phi"):
+    for _ in range(MIN_CALLS):
+        tracker.record(model, ok=False, latency=1.0)
+
+
+def test_breaker_opens_after_repeated_errors():
+    tracker = HealthTracker()
+    for _ in range(MIN_CALLS - 1):
+        tracker.record("phi", ok=False, latency=1.0)
+    assert tracker.state("phi") == STATE_CLOSED
+
+    tracker.record("phi", ok=False, latency=1.0)
+
+    assert tracker.state("phi") == STATE_OPEN
+    assert tracker.stats()["phi"]["trips"] == 1
+
+
+def test_breaker_opens_on_slow_calls():
+    tracker = HealthTracker()
+    for _ in range(MIN_CALLS):
+        tracker.record("phi", ok=True, latency=model_health.SLOW_CALL_SECONDS + 1)
+
+    assert tracker.state("phi") == STATE_OPEN
+
+
+def test_open_breaker_routes_to_fallback():
+    tracker = HealthTracker({"phi": "tinyllama"})
+    _trip(tracker)
+
+    assert tracker.choose("phi") == ("tinyllama", True)
+
+
+def test_open_breaker_without_fallback_fails():
+    tracker = HealthTracker({"phi": "tinyllama"})
+    _trip(tracker)
+
+    with pytest.raises(CircuitOpen):
+        tracker.choose("phi", allow_fallback=False)
+
+
+def test_half_open_probe_closes_or_reopens(monkeypatch):
+    tracker = HealthTracker({})
+    _trip(tracker)
+    monkeypatch.setattr(model_health, "OPEN_SECONDS", 0.0)
+
+    # One probe at a time after the cool-down
+    assert tracker.choose("phi") == ("phi", False)
+    assert tracker.state("phi") == STATE_HALF_OPEN
+
+    tracker.record("phi", ok=False, latency=1.0)
+    assert tracker.state("phi") == STATE_OPEN
+
+    assert tracker.allow("phi")
+    tracker.record("phi", ok=True, latency=1.0)
+    assert tracker.state("phi") == STATE_CLOSED
+    assert tracker.stats()["phi"]["calls"] == 0
+
+
+def test_half_open_admits_a_single_probe(monkeypatch):
+    tracker = HealthTracker({})
+    _trip(tracker)
+    monkeypatch.setattr(model_health, "OPEN_SECONDS", 0.0)
+    assert tracker.allow("phi")
+
+    monkeypatch.setattr(model_health, "OPEN_SECONDS", 60.0)
+
+    assert not tracker.allow("phi")
@@ -0,0 +1,50 @@
+import time
+
+from model_warmup import (
+    STATE_COLD,
+    STATE_ERROR,
+    STATE_LOADING,
+    STATE_WARM,
+    WarmupManager,
+)
+
+
+def _wait_for_state(manager, model, state):
+    for _ in range(500):
+        if manager.status(model)["state"] == state:
+            return manager.status(model)
+        time.sleep(0.01)
+    raise AssertionError(f"{model} never became {state}")
+
+
+def test_model_goes_from_cold_through_loading_to_warm(mock_server):
+    manager = WarmupManager(mock_server(load_time=0.3))
+    assert manager.status("phi")["state"] == STATE_COLD
+
+    manager.warm("phi")
+
+    assert manager.status("phi")["state"] == STATE_LOADING
+    status = _wait_for_state(manager, "phi", STATE_WARM)
+    assert status["load_ms"] >= 250
+
+
+def test_unknown_model_ends_in_error(mock_server):
+    manager = WarmupManager(mock_server())
+
+    manager.warm("llama-unknown", background=False)
+
+    status = manager.status("llama-unknown")
+    assert status["state"] == STATE_ERROR
+    assert "404" in status["error"]
+
+
+def test_refresh_marks_unloaded_models_cold(mock_server):
+    manager = WarmupManager(mock_server(), keep_alive="0.2s")
+    manager.warm("phi", background=False)
+    manager.refresh()
+    assert manager.status("phi")["state"] == STATE_WARM
+
+    time.sleep(0.3)
+    manager.refresh()
+
+    assert manager.status("phi")["state"] == STATE_COLD
@@ -0,0 +1,76 @@
+import socket
+import struct
+import threading
+
+import pytest
+import requests
+
+import ollama_client
+
+
+@pytest.fixture(autouse=True)
+def fast_retries():
+    saved = ollama_client.MAX_RETRIES, ollama_client.RETRY_BACKOFF
+    ollama_client.configure_session(max_retries=2, retry_backoff=0.0)
+    yield
+    ollama_client.configure_session(max_retries=saved[0], retry_backoff=saved[1])
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_connection_refused_is_retried():
+    url = f"http://127.0.0.1:{_free_port()}/api/generate"
+    before = ollama_client.get_client_stats()["retries"]
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        ollama_client.post(url, {"model": "phi", "prompt": "hi"})
+
+    assert ollama_client.get_client_stats()["retries"] - before == 2
+
+
+def test_reset_after_request_sent_is_not_retried():
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    connections = []
+
+    def serve():
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            connections.append(conn)
+            conn.recv(65536)
+            # Abort with RST once the request has been read
+            conn.setsockopt(
+                socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0)
+            )
+            conn.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    url = f"http://127.0.0.1:{listener.getsockname()[1]}/api/generate"
+
+    try:
+        with pytest.raises(requests.exceptions.ConnectionError) as error:
+            ollama_client.post(url, {"model": "phi", "prompt": "hi"})
+    finally:
+        listener.close()
+
+    assert not ollama_client.failed_before_send(error.value)
+    assert len(connections) == 1
+
+
+def test_post_reuses_pooled_connection(mock_server):
+    url = mock_server()
+    payload = {"model": "phi", "prompt": "hi", "stream": False}
+
+    ollama_client.post(url, payload)
+    _, telemetry = ollama_client.post(url, payload)
+
+    assert telemetry["reused_connection"]
+    assert telemetry["retries"] == 0
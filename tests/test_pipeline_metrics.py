@@ -0,0 +1,38 @@
+import threading
+
+from pipeline_metrics import Counter, Histogram
+
+
+def _in_thread(fn):
+    thread = threading.Thread(target=fn)
+    thread.start()
+    thread.join()
+
+
+def test_counter_sums_across_threads():
+    counter = Counter("test_total", "Test counter.", ["model"])
+    for _ in range(5):
+        _in_thread(lambda: counter.inc(model="phi"))
+    counter.inc(2, model="tinyllama")
+
+    assert counter.values() == {("phi",): 5, ("tinyllama",): 2}
+
+
+def test_dead_thread_shards_are_folded_without_scrapes():
+    counter = Counter("test_total", "Test counter.", ["model"])
+    for _ in range(50):
+        _in_thread(lambda: counter.inc(model="phi"))
+
+    # Only the last exited thread's shard is still listed
+    assert len(counter._shards._live) <= 1
+    assert counter.values() == {("phi",): 50}
+
+
+def test_histogram_merges_buckets_across_threads():
+    histogram = Histogram("test_seconds", "Test histogram.", buckets=(1, 5))
+    _in_thread(lambda: histogram.observe(0.5))
+    _in_thread(lambda: histogram.observe(3))
+    histogram.observe(10)
+
+    assert histogram.values() == {(): [[1, 1, 1], 13.5, 3]}
+    assert 'test_seconds_bucket{le="5"} 2' in histogram.render()
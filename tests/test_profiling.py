@@ -0,0 +1,34 @@
+import ingest_documents
+import profiling
+
+
+def test_query_generation_is_profiled_on_the_producer_thread(
+    monkeypatch, tmp_path, mock_server
+):
+    url = mock_server()
+    monkeypatch.setattr(profiling, "PROFILE_TARGETS", {"query"})
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE", 1.0)
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+
+    tokens = list(
+        ingest_documents.call_ollama_stream("Profile this prompt", "phi", url)
+    )
+
+    assert tokens
+    collapsed = list(tmp_path.glob("query-generate-*.collapsed"))
+    assert len(collapsed) == 1
+    assert list(tmp_path.glob("query-generate-*.prof"))
+    # Only the producer thread is sampled, never the consuming test
+    stacks = collapsed[0].read_text()
+    assert "test_query_generation_is_profiled" not in stacks
+
+
+def test_maybe_profile_is_a_no_op_when_disabled(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILE_TARGETS", set())
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+
+    with profiling.maybe_profile("query") as outputs:
+        pass
+
+    assert outputs == {}
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,97 @@
+import threading
+
+import pytest
+import requests
+
+from rag_service import RagService, make_server, parse_query_request
+from tracing import span
+
+
+class EchoService(RagService):
+    """Ready service that returns the parsed request instead of querying."""
+
+    def __init__(self):
+        super().__init__(workers=1, queue_size=1)
+        self.ready = True
+
+    def query(self, request):
+        return request
+
+
+@pytest.fixture
+def service_url():
+    service = EchoService()
+    server = make_server("127.0.0.1", 0, service)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+    service.executor.shutdown()
+
+
+def test_parse_query_request_coerces_numbers():
+    request = parse_query_request(
+        {"query": "malaria?", "top_k": "3", "budget_s": "12.5"}
+    )
+
+    assert request["top_k"] == 3
+    assert request["budget_s"] == 12.5
+    assert request["similarity_threshold"] == 0.05
+    assert request["priority"] == "interactive"
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        ["not", "an", "object"],
+        {"query": ""},
+        {"query": "malaria?", "top_k": "many"},
+        {"query": "malaria?", "top_k": 0},
+        {"query": "malaria?", "budget_s": "soon"},
+        {"query": "malaria?", "budget_s": -1},
+        {"query": "malaria?", "similarity_threshold": None, "budget_s": "nan"},
+        {"query": "malaria?", "priority": "urgent"},
+        {"query": "malaria?", "metrics": "yes"},
+    ],
+)
+def test_invalid_query_bodies_are_rejected_with_400(service_url, body):
+    response = requests.post(f"{service_url}/query", json=body, timeout=5)
+
+    assert response.status_code == 400
+    assert response.json()["error"]
+
+
+def test_invalid_json_is_rejected_with_400(service_url):
+    response = requests.post(f"{service_url}/query", data=b"{not json", timeout=5)
+
+    assert response.status_code == 400
+
+
+def test_invalid_score_body_is_rejected_with_400(service_url):
+    response = requests.post(
+        f"{service_url}/score", json={"retrieved_chunks": "text"}, timeout=5
+    )
+
+    assert response.status_code == 400
+
+
+def test_valid_query_reaches_the_service(service_url):
+    response = requests.post(
+        f"{service_url}/query",
+        json={"query": "malaria?", "top_k": 5, "priority": "batch"},
+        timeout=5,
+    )
+
+    assert response.status_code == 200
+    assert response.json()["top_k"] == 5
+    assert response.json()["budget_s"] is None
+
+
+def test_stats_include_span_latencies(service_url):
+    with span("test-stats-span"):
+        pass
+
+    response = requests.get(f"{service_url}/stats", timeout=5)
+
+    assert response.status_code == 200
+    assert response.json()["spans"]["test-stats-span"]["count"] >= 1
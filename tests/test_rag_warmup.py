@@ -0,0 +1,72 @@
+import sys
+import threading
+import types
+
+import pytest
+
+import ingest_documents
+from rag_warmup import STATE_ERROR, STATE_LOADING, STATE_READY, RagWarmup
+
+
+class WarmCollection:
+    def __init__(self):
+        self.queries = 0
+
+    def count(self):
+        return 1
+
+    def query(self, query_embeddings, n_results):
+        self.queries += 1
+        return {"documents": [[]], "metadatas": [[]], "distances": [[]]}
+
+
+@pytest.fixture
+def loading(monkeypatch, stub_encoder):
+    """Fake embedding library whose model load blocks until released."""
+    release = threading.Event()
+
+    def load_model(name):
+        release.wait(5)
+        return stub_encoder
+
+    monkeypatch.setitem(
+        sys.modules,
+        "sentence_transformers",
+        types.SimpleNamespace(SentenceTransformer=load_model),
+    )
+    return release
+
+
+def test_warmup_goes_from_loading_to_ready(monkeypatch, loading, stub_encoder):
+    collection = WarmCollection()
+    monkeypatch.setattr(
+        ingest_documents, "initialize_vector_store", lambda: (None, collection)
+    )
+
+    warmup = RagWarmup().start()
+    assert warmup.status()["state"] == STATE_LOADING
+    assert not warmup.wait(timeout=0.05)
+
+    loading.set()
+
+    assert warmup.wait(timeout=5)
+    status = warmup.status()
+    assert status["state"] == STATE_READY
+    assert set(status["stages"]) >= {"load_model", "open_collection", "encode"}
+    assert warmup.model is stub_encoder and warmup.collection is collection
+    assert collection.queries == 1
+
+
+def test_warmup_failure_ends_in_error(monkeypatch, loading):
+    def broken_store():
+        raise RuntimeError("chroma_db is locked")
+
+    monkeypatch.setattr(ingest_documents, "initialize_vector_store", broken_store)
+    loading.set()
+
+    warmup = RagWarmup().start()
+
+    assert not warmup.wait(timeout=5)
+    assert warmup.status()["state"] == STATE_ERROR
+    assert warmup.status()["error"] == "chroma_db is locked"
+    assert warmup.model is None
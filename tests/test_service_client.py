@@ -0,0 +1,39 @@
+import pytest
+
+import service_client
+from rag_service import SCORE_TIMEOUT, UNBUDGETED_TIMEOUT, query_timeout
+
+
+@pytest.fixture
+def posted(monkeypatch):
+    calls = []
+
+    def fake_post(path, payload, timeout):
+        calls.append((path, timeout))
+        return {}
+
+    monkeypatch.setattr(service_client, "_post", fake_post)
+    return calls
+
+
+@pytest.mark.parametrize(
+    "budget_s, priority",
+    [(None, "interactive"), (None, "batch"), (12.0, "compare")],
+)
+def test_query_timeout_outlasts_the_service(posted, budget_s, priority):
+    service_client.remote_rag_query("malaria?", budget_s=budget_s, priority=priority)
+
+    _, timeout = posted[0]
+    assert timeout > query_timeout(budget_s, priority)
+
+
+def test_unbudgeted_query_waits_for_the_service_timeout(posted):
+    service_client.remote_rag_query("malaria?", priority="batch")
+
+    assert posted[0][1] > UNBUDGETED_TIMEOUT
+
+
+def test_score_timeout_outlasts_the_service(posted):
+    service_client.remote_score("malaria?", "artesunate", [])
+
+    assert posted[0] == ("/score", SCORE_TIMEOUT + service_client.RESPONSE_MARGIN)
@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight, make_key
+
+
+def _run_threads(count, target):
+    results = [None] * count
+    threads = [
+        threading.Thread(target=lambda i=i: results.__setitem__(i, target()))
+        for i in range(count)
+    ]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def test_make_key_depends_on_every_field():
+    key = make_key("phi", "prompt", {"num_predict": 384}, "http://a")
+
+    assert key == make_key("phi", "prompt", {"num_predict": 384}, "http://a")
+    assert key != make_key("tinyllama", "prompt", {"num_predict": 384}, "http://a")
+    assert key != make_key("phi", "prompt", {"num_predict": 96}, "http://a")
+    assert key != make_key("phi", "prompt", {"num_predict": 384}, "http://b")
+
+
+def test_concurrent_calls_share_one_upstream_call():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def upstream():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    threads, results = _run_threads(5, lambda: flights.do("k", upstream))
+    while flights.stats()["coalesced"] < 4:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == ["answer"] * 5
+    assert calls == [1]
+    assert flights.stats() == {"leaders": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_upstream_error_reaches_every_waiter():
+    flights = SingleFlight()
+
+    def upstream():
+        raise RuntimeError("Ollama down")
+
+    with pytest.raises(RuntimeError, match="Ollama down"):
+        flights.do("k", upstream)
+    # The failed flight is not reused
+    assert flights.do("k", lambda: "recovered") == "recovered"
+
+
+def test_stream_fans_out_to_late_subscribers():
+    flights = SingleFlight()
+    first_token_sent = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def upstream(info):
+        calls.append(1)
+        yield "Artesunate"
+        first_token_sent.set()
+        release.wait(5)
+        yield " IV"
+        info["done"] = True
+
+    leader_info = {}
+    leader = flights.stream("k", upstream, info=leader_info)
+    assert next(leader) == "Artesunate"
+    first_token_sent.wait(5)
+
+    follower_info = {}
+    follower = flights.stream("k", upstream, info=follower_info)
+    release.set()
+
+    assert list(follower) == ["Artesunate", " IV"]
+    assert list(leader) == [" IV"]
+    assert calls == [1]
+    assert leader_info == {"done": True, "coalesced": False}
+    assert follower_info == {"done": True, "coalesced": True}
+
+
+def test_stream_completes_after_the_leader_stops_reading():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def upstream(info):
+        yield "a"
+        release.wait(5)
+        yield "b"
+
+    leader = flights.stream("k", upstream)
+    assert next(leader) == "a"
+    follower = flights.stream("k", upstream)
+    leader.close()
+    release.set()
+
+    assert list(follower) == ["a", "b"]
@@ -0,0 +1,83 @@
+import pytest
+
+import deadline as deadline_module
+from deadline import Deadline
+from ingest_documents import call_ollama_stream, enhanced_rag_query_stream
+from mock_ollama import CANNED_ANSWER
+
+
+class QueryCollection:
+    """Stand-in for collection.query() returning two close chunks."""
+
+    def query(self, query_embeddings, n_results):
+        return {
+            "documents": [["Treat severe malaria with artesunate.", "Use bed nets."]],
+            "metadatas": [
+                [
+                    {"document_name": "who.pdf", "chunk_index": 0},
+                    {"document_name": "who.pdf", "chunk_index": 1},
+                ]
+            ],
+            "distances": [[0.1, 0.2]],
+        }
+
+
+@pytest.fixture(autouse=True)
+def fresh_rates(monkeypatch):
+    monkeypatch.setattr(deadline_module, "_decode_rates", {})
+    monkeypatch.setattr(deadline_module, "_prompt_latencies", {})
+
+
+def _query(url, stub_encoder, budget_s, question="How is severe malaria treated?"):
+    return list(
+        enhanced_rag_query_stream(
+            QueryCollection(),
+            question,
+            stub_encoder,
+            ollama_model="phi",
+            deadline=Deadline(budget_s),
+            ollama_url=url,
+        )
+    )
+
+
+def test_stream_yields_tokens_in_order(mock_server):
+    url = mock_server()
+    info = {}
+
+    tokens = list(call_ollama_stream("What treats malaria?", "phi", url, info=info))
+
+    assert "".join(tokens) == CANNED_ANSWER + " "
+    assert info["done"] and info["error"] is None
+
+
+def test_query_stream_ends_with_the_result(mock_server, stub_encoder):
+    url = mock_server()
+
+    events = _query(url, stub_encoder, budget_s=30)
+
+    assert [event["type"] for event in events[:-1]] == ["token"] * (len(events) - 1)
+    assert events[-1]["type"] == "result"
+    result = events[-1]["result"]
+    streamed = "".join(event["text"] for event in events[:-1])
+    assert CANNED_ANSWER.startswith(streamed.strip())
+    assert result["answer"] == streamed.strip()
+    assert not result["partial"] and result["error"] is None
+
+
+def test_deadline_cuts_the_stream_short_but_still_ends_with_the_result(
+    mock_server, stub_encoder
+):
+    url = mock_server(token_rate=20.0)
+
+    events = _query(url, stub_encoder, budget_s=1.0, question="Severe malaria?")
+
+    assert events[-1]["type"] == "result"
+    assert all(event["type"] == "token" for event in events[:-1])
+    result = events[-1]["result"]
+    streamed = "".join(event["text"] for event in events[:-1])
+    assert result["partial"]
+    assert result["error"] is None
+    assert 0 < len(events) - 1 < result["num_predict"]
+    assert result["answer"] == streamed.strip()
+    assert CANNED_ANSWER.startswith(streamed.strip())
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from generation_scheduler import GenerationScheduler
+from model_health import HealthTracker
+from tracing import percentile, span, trace
+
+
+@pytest.mark.parametrize(
+    "values, pct, expected",
+    [
+        ([], 50, 0.0),
+        ([7], 95, 7),
+        ([3, 1, 2], 50, 2),
+        ([4, 1, 3, 2], 0, 1),
+        ([4, 1, 3, 2], 100, 4),
+        (list(range(1, 101)), 95, 95),
+    ],
+)
+def test_percentile(values, pct, expected):
+    assert percentile(values, pct) == expected
+
+
+def test_scheduler_and_health_use_the_shared_percentile():
+    scheduler = GenerationScheduler(max_concurrency=1)
+    for _ in range(3):
+        with scheduler.slot("interactive"):
+            pass
+    waits = scheduler.stats()["classes"]["interactive"]
+    assert waits["p50_wait_ms"] <= waits["p95_wait_ms"]
+
+    tracker = HealthTracker()
+    for latency in (3.0, 1.0, 2.0, 4.0):
+        tracker.record("phi", ok=True, latency=latency)
+    assert tracker.stats()["phi"]["p50_latency_s"] == percentile(
+        [3.0, 1.0, 2.0, 4.0], 50
+    )
+
+
+def test_trace_records_span_timings():
+    with trace("unit") as query_trace:
+        with span("encode"):
+            pass
+
+    assert "encode" in query_trace.timings()
+
+
+def test_concurrent_tasks_keep_separate_traces():
+    async def query(name):
+        with trace(name) as query_trace:
+            await asyncio.sleep(0.01)
+            with span("step-" + name):
+                await asyncio.sleep(0.01)
+        return query_trace
+
+    async def main():
+        return await asyncio.gather(query("a"), query("b"))
+
+    first, second = asyncio.run(main())
+
+    assert [record["name"] for record in first.spans] == ["step-a"]
+    assert [record["name"] for record in second.spans] == ["step-b"]
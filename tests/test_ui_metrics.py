@@ -0,0 +1,54 @@
+import pytest
+
+from ui_metrics import (
+    compute_all_metrics,
+    compute_answer_relevance,
+    compute_context_coverage,
+    compute_faithfulness,
+)
+
+
+def _chunk(text):
+    return {"document_name": "who.pdf", "chunk_index": 0, "text": text}
+
+
+QUESTION = "What is the first-line treatment for severe malaria?"
+ANSWER = "Severe malaria is treated with intravenous artesunate for 24 hours."
+
+CHUNK_SETS = [
+    [],
+    [_chunk("Treat severe malaria with intravenous artesunate for 24 hours.")],
+    [
+        _chunk("Treat severe malaria with intravenous artesunate for 24 hours."),
+        _chunk("Bed nets reduce transmission in endemic areas."),
+        _chunk(""),
+        _chunk("Severe malaria is treated with intravenous artesunate."),
+    ],
+]
+
+
+@pytest.mark.parametrize("chunks", CHUNK_SETS)
+@pytest.mark.parametrize("threshold", [0.3, 0.65, 0.9])
+def test_all_metrics_match_the_individual_metrics(stub_encoder, chunks, threshold):
+    combined = compute_all_metrics(QUESTION, ANSWER, chunks, stub_encoder, threshold)
+
+    assert combined["relevance"] == pytest.approx(
+        compute_answer_relevance(QUESTION, ANSWER, stub_encoder)
+    )
+    assert combined["faithfulness"] == pytest.approx(
+        compute_faithfulness(ANSWER, chunks, stub_encoder)
+    )
+    assert combined["coverage"] == pytest.approx(
+        compute_context_coverage(ANSWER, chunks, stub_encoder, threshold)
+    )
+
+
+def test_short_answers_score_zero_everywhere(stub_encoder):
+    chunks = CHUNK_SETS[1]
+
+    assert compute_all_metrics(QUESTION, "Yes.", chunks, stub_encoder) == {
+        "relevance": 0.0,
+        "faithfulness": 0.0,
+        "coverage": 0.0,
+    }
+    assert compute_answer_relevance(QUESTION, "Yes.", stub_encoder) == 0.0
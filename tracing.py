@@ -0,0 +1,214 @@
+"""
+Lightweight Query Tracing for Med-GPT
+=====================================
+Span instrumentation for the RAG pipeline. A trace groups the spans of
+one query (encode, retrieve, generate, metrics, ...); each finished trace
+is appended as one JSON line to a rotating trace log, and its per-stage
+durations are returned in the RAG result dictionary.
+
+Usage:
+    with trace("rag_query", model="phi") as query_trace:
+        with span("encode"):
+            ...
+    query_trace.timings()  # {"encode": 12.3, ...} in milliseconds
+
+A span opened outside any trace is logged as a trace of its own.
+
+The active trace is tracked per thread and per asyncio task, so
+concurrent queries on one event loop do not mix their spans.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+
+
+# ===============================
+# CONFIGURATION
+# ===============================
+
+# Set MEDGPT_TRACE_LOG to an empty string to disable the trace log
+TRACE_LOG = os.environ.get("MEDGPT_TRACE_LOG", "logs/traces.jsonl")
+TRACE_LOG_MAX_BYTES = int(os.environ.get("MEDGPT_TRACE_LOG_MAX_BYTES", "5000000"))
+TRACE_LOG_BACKUPS = 3
+
+# Recent durations kept per span name for process-wide percentiles
+RECENT_SPANS = 500
+
+
+# ===============================
+# TRACE LOG
+# ===============================
+
+_logger = logging.getLogger("medgpt.trace")
+_logger.propagate = False
+_logger_lock = threading.Lock()
+
+
+def _trace_logger():
+    """Attach the rotating JSONL handler on first use."""
+    if not TRACE_LOG:
+        return None
+    if not _logger.handlers:
+        with _logger_lock:
+            if not _logger.handlers:
+                try:
+                    os.makedirs(os.path.dirname(TRACE_LOG) or ".", exist_ok=True)
+                    handler = RotatingFileHandler(
+                        TRACE_LOG,
+                        maxBytes=TRACE_LOG_MAX_BYTES,
+                        backupCount=TRACE_LOG_BACKUPS,
+                        encoding="utf-8",
+                    )
+                except OSError as e:
+                    print(f"Error opening trace log {TRACE_LOG}: {e}")
+                    return None
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                _logger.addHandler(handler)
+                _logger.setLevel(logging.INFO)
+    return _logger
+
+
+# ===============================
+# TRACES AND SPANS
+# ===============================
+
+# Stack of open traces; a new thread starts empty, asyncio tasks copy it
+_stack = contextvars.ContextVar("medgpt_trace_stack", default=())
+
+_recent_lock = threading.Lock()
+_recent = defaultdict(lambda: deque(maxlen=RECENT_SPANS))
+
+
+class Trace:
+    """Spans recorded for one query."""
+
+    def __init__(self, name, **attrs):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs = attrs
+        self.spans = []
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self._start = time.perf_counter()
+        self.duration_ms = None
+
+    def offset_ms(self):
+        return (time.perf_counter() - self._start) * 1000
+
+    def timings(self):
+        """Total milliseconds per span name (repeated spans are summed)."""
+        totals = {}
+        for record in self.spans:
+            totals[record["name"]] = totals.get(record["name"], 0.0) + record.get(
+                "duration_ms", 0.0
+            )
+        return totals
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "attrs": self.attrs,
+            "spans": self.spans,
+        }
+
+
+def current_trace():
+    """The trace active on this thread or asyncio task, or None."""
+    stack = _stack.get()
+    return stack[-1] if stack else None
+
+
+@contextmanager
+def trace(name, **attrs):
+    """Start a trace on this thread or task; it is logged when the block exits."""
+    new_trace = Trace(name, **attrs)
+    _stack.set(_stack.get() + (new_trace,))
+    try:
+        yield new_trace
+    finally:
+        new_trace.duration_ms = new_trace.offset_ms()
+        _stack.set(tuple(t for t in _stack.get() if t is not new_trace))
+        _record_duration(name, new_trace.duration_ms)
+        _write(new_trace)
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Time a stage of the current trace.
+    Yields the span record, which callers may annotate.
+    """
+    active = current_trace()
+    if active is None:
+        with trace(name, **attrs):
+            with span(name, **attrs) as record:
+                yield record
+        return
+
+    record = {"name": name, "start_ms": active.offset_ms()}
+    if attrs:
+        record["attrs"] = attrs
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record["error"] = type(e).__name__
+        raise
+    finally:
+        record["duration_ms"] = (time.perf_counter() - start) * 1000
+        active.spans.append(record)
+        _record_duration(name, record["duration_ms"])
+
+
+def _record_duration(name, duration_ms):
+    with _recent_lock:
+        _recent[name].append(duration_ms)
+
+
+def _write(finished):
+    logger = _trace_logger()
+    if logger is None:
+        return
+    try:
+        logger.info(json.dumps(finished.to_dict(), default=str))
+    except Exception as e:
+        print(f"Error writing trace: {e}")
+
+
+# ===============================
+# STATISTICS
+# ===============================
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (0.0 if empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def get_span_stats():
+    """Process-wide p50/p95 and count per span name over recent spans."""
+    with _recent_lock:
+        snapshot = {name: list(values) for name, values in _recent.items()}
+    return {
+        name: {
+            "count": len(values),
+            "p50_ms": percentile(values, 50),
+            "p95_ms": percentile(values, 95),
+        }
+        for name, values in snapshot.items()
+    }
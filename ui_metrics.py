@@ -4,7 +4,14 @@ Evaluation Metrics for Med-GPT UI
 Reusable metric functions for computing answer quality scores.
 """
 
-from sklearn.metrics.pairwise import cosine_similarity
+from tracing import span
+
+
+def cosine_similarity(a, b):
+    """sklearn's cosine_similarity, imported on first use to keep startup fast."""
+    from sklearn.metrics.pairwise import cosine_similarity as sk_cosine_similarity
+
+    return sk_cosine_similarity(a, b)
 
 
 def compute_answer_relevance(question, answer, embedding_model):
@@ -23,12 +30,13 @@ def compute_answer_relevance(question, answer, embedding_model):
         if not answer or len(answer.strip()) < 10:
             return 0.0
 
-        question_emb = embedding_model.encode([question])[0]
-        answer_emb = embedding_model.encode([answer])[0]
+        with span("metrics.relevance"):
+            question_emb = embedding_model.encode([question])[0]
+            answer_emb = embedding_model.encode([answer])[0]
 
-        similarity = cosine_similarity(
-            question_emb.reshape(1, -1), answer_emb.reshape(1, -1)
-        )[0][0]
+            similarity = cosine_similarity(
+                question_emb.reshape(1, -1), answer_emb.reshape(1, -1)
+            )[0][0]
 
         return float(similarity)
     except Exception as e:
@@ -61,12 +69,13 @@ def compute_faithfulness(answer, retrieved_chunks, embedding_model):
         if not context:
             return 0.0
 
-        answer_emb = embedding_model.encode([answer])[0]
-        context_emb = embedding_model.encode([context])[0]
+        with span("metrics.faithfulness"):
+            answer_emb = embedding_model.encode([answer])[0]
+            context_emb = embedding_model.encode([context])[0]
 
-        similarity = cosine_similarity(
-            answer_emb.reshape(1, -1), context_emb.reshape(1, -1)
-        )[0][0]
+            similarity = cosine_similarity(
+                answer_emb.reshape(1, -1), context_emb.reshape(1, -1)
+            )[0][0]
 
         return float(similarity)
     except Exception as e:
@@ -112,32 +121,33 @@ def compute_context_coverage(answer, retrieved_chunks, embedding_model, threshol
         if not retrieved_chunks:
             return 0.0
 
-        # Embed the answer once
-        answer_emb = embedding_model.encode([answer])[0]
+        with span("metrics.coverage", chunks=len(retrieved_chunks)):
+            # Embed the answer once
+            answer_emb = embedding_model.encode([answer])[0]
 
-        # Count how many chunks are semantically reflected in the answer
-        used_chunks = 0
+            # Count how many chunks are semantically reflected in the answer
+            used_chunks = 0
 
-        for chunk in retrieved_chunks:
-            chunk_text = chunk.get("text", "")
+            for chunk in retrieved_chunks:
+                chunk_text = chunk.get("text", "")
 
-            if not chunk_text:
-                continue
+                if not chunk_text:
+                    continue
 
-            # Embed the chunk
-            chunk_emb = embedding_model.encode([chunk_text])[0]
+                # Embed the chunk
+                chunk_emb = embedding_model.encode([chunk_text])[0]
 
-            # Compute similarity
-            similarity = cosine_similarity(
-                answer_emb.reshape(1, -1), chunk_emb.reshape(1, -1)
-            )[0][0]
+                # Compute similarity
+                similarity = cosine_similarity(
+                    answer_emb.reshape(1, -1), chunk_emb.reshape(1, -1)
+                )[0][0]
 
-            # Check if chunk is "used" (exceeds threshold)
-            if similarity >= threshold:
-                used_chunks += 1
+                # Check if chunk is "used" (exceeds threshold)
+                if similarity >= threshold:
+                    used_chunks += 1
 
-        # Calculate coverage ratio
-        coverage = used_chunks / len(retrieved_chunks)
+            # Calculate coverage ratio
+            coverage = used_chunks / len(retrieved_chunks)
 
         return float(coverage)
 
@@ -146,6 +156,90 @@ def compute_context_coverage(answer, retrieved_chunks, embedding_model, threshol
         return 0.0
 
 
+def compute_all_metrics(
+    question, answer, retrieved_chunks, embedding_model, threshold=0.65
+):
+    """
+    Compute relevance, faithfulness and context coverage in a single pass.
+
+    Returns the same values as compute_answer_relevance(),
+    compute_faithfulness() and compute_context_coverage(), but every
+    distinct text (question, answer, joined context, each chunk) is
+    encoded once in one batch and all scores come from one cosine
+    similarity product against the answer embedding.
+
+    Args:
+        question: User question string
+        answer: Generated answer string
+        retrieved_chunks: List of retrieved chunk dictionaries
+        embedding_model: SentenceTransformer model
+        threshold: Coverage similarity threshold (default: 0.65)
+
+    Returns:
+        dict: {"relevance": float, "faithfulness": float, "coverage": float}
+    """
+    scores = {"relevance": 0.0, "faithfulness": 0.0, "coverage": 0.0}
+
+    try:
+        if not answer or len(answer.strip()) < 10:
+            return scores
+
+        # Deduplicate texts so each is embedded only once
+        texts = []
+        positions = {}
+
+        def position(text):
+            if text not in positions:
+                positions[text] = len(texts)
+                texts.append(text)
+            return positions[text]
+
+        answer_pos = position(answer)
+        question_pos = position(question)
+
+        context_pos = None
+        chunk_positions = []
+        if retrieved_chunks:
+            try:
+                context = " ".join([chunk["text"] for chunk in retrieved_chunks])
+            except (KeyError, TypeError) as e:
+                print(f"Error computing faithfulness: {e}")
+                context = ""
+            if context:
+                context_pos = position(context)
+
+            for chunk in retrieved_chunks:
+                chunk_text = chunk.get("text", "")
+                if chunk_text:
+                    chunk_positions.append(position(chunk_text))
+
+        with span("metrics.encode", texts=len(texts)):
+            embeddings = embedding_model.encode(texts)
+
+        # One row: cosine similarity of the answer against every text
+        with span("metrics.similarity"):
+            similarities = cosine_similarity(
+                embeddings[answer_pos].reshape(1, -1), embeddings
+            )[0]
+
+        scores["relevance"] = float(similarities[question_pos])
+
+        if context_pos is not None:
+            scores["faithfulness"] = float(similarities[context_pos])
+
+        if retrieved_chunks:
+            used_chunks = sum(
+                1 for pos in chunk_positions if similarities[pos] >= threshold
+            )
+            scores["coverage"] = float(used_chunks / len(retrieved_chunks))
+
+        return scores
+
+    except Exception as e:
+        print(f"Error computing metrics: {e}")
+        return {"relevance": 0.0, "faithfulness": 0.0, "coverage": 0.0}
+
+
 def get_coverage_badge(score):
     """
     Get coverage badge emoji and text based on coverage score.